@@ -0,0 +1,57 @@
+"""
+Device opens and time of a 10-control update through Camera.update_controls, and of a
+reset after that update through Camera.reset_all_controls.
+
+Run from the CameraManagerService directory:
+    python -m benchmarks.controls_bench
+"""
+import time
+from unittest.mock import patch
+from src.camera import Camera
+from . import fake_device
+
+UPDATE = {
+    "brightness": 10, "contrast": 40, "saturation": 70, "hue": 5, "gamma": 120,
+    "gain": 10, "sharpness": 4, "backlight_compensation": 0, "power_line_frequency": 2,
+    "white_balance_automatic": False,
+}
+ROUNDS = 20
+
+
+def main():
+    paths, names = fake_device.fake_device_paths(1)
+    with patch("src.v4l2_wrapper.Device", fake_device.FakeDevice), \
+         patch("src.v4l2_wrapper._query_flags", fake_device.query_flags), \
+         patch("src.device_session.Device", fake_device.FakeDevice):
+        camera = Camera("cam1", paths[0], names[0])
+        camera.session.close()
+
+        fake_device.reset_stats()
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            failed = camera.update_controls(UPDATE)
+            assert not failed, failed
+        elapsed = (time.perf_counter() - start) / ROUNDS
+        ioctls = fake_device.stats["ioctls"] / ROUNDS
+        opens = fake_device.stats["opens"]
+
+        reset_elapsed = 0.0
+        fake_device.reset_stats()
+        for _ in range(ROUNDS):
+            assert not camera.update_controls({"brightness": 10, "white_balance_automatic": False})
+            ioctls_before = fake_device.stats["ioctls"]
+            start = time.perf_counter()
+            failed = camera.reset_all_controls()
+            reset_elapsed += time.perf_counter() - start
+            reset_ioctls = fake_device.stats["ioctls"] - ioctls_before
+            assert not failed, failed
+        camera.close()
+
+    print(f"{len(UPDATE)}-control update: {elapsed * 1000:8.1f} ms, "
+          f"{ioctls:.0f} ioctls per update, "
+          f"{opens} device open(s) in {ROUNDS} updates")
+    print(f"reset of 2 changed controls: {reset_elapsed / ROUNDS * 1000:8.1f} ms, {reset_ioctls} ioctls per reset")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Startup discovery time of the CameraManager with a cold and a warm capability cache.
+
+Run from the CameraManagerService directory:
+    python -m benchmarks.discovery_bench
+"""
+import time
+import tempfile
+from unittest.mock import patch
+from src.manager import CameraManager
+from . import fake_device
+
+CAMERA_COUNT = 4
+
+
+def _discover() -> float:
+    fake_device.reset_stats()
+    start = time.perf_counter()
+    CameraManager()
+    return time.perf_counter() - start
+
+
+def main():
+    paths, names = fake_device.fake_device_paths(CAMERA_COUNT)
+    with tempfile.TemporaryDirectory() as state_dir, \
+         patch("src.persistence.STATE_DIR", state_dir), \
+         patch("src.v4l2_wrapper.Device", fake_device.FakeDevice), \
+         patch("src.v4l2_wrapper._query_flags", fake_device.query_flags), \
+         patch("src.device_session.Device", fake_device.FakeDevice), \
+         patch("src.manager.get_device_paths_and_names", return_value=(paths, names)):
+
+        cold = _discover()
+        cold_ioctls = fake_device.stats["ioctls"]
+        warm = _discover()
+        warm_ioctls = fake_device.stats["ioctls"]
+
+    print(f"{CAMERA_COUNT} cameras, {fake_device.IOCTL_LATENCY * 1000:.1f} ms per ioctl")
+    print(f"cold cache: {cold * 1000:8.1f} ms  ({cold_ioctls} ioctls)")
+    print(f"warm cache: {warm * 1000:8.1f} ms  ({warm_ioctls} ioctls)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+In-memory stand-in for linuxpy's Device, used by the benchmarks.
+
+Every simulated ioctl (open, control read/write, frame size enumeration) sleeps for
+IOCTL_LATENCY seconds, which roughly matches a UVC camera behind a USB hub on the CM5.
+The control set mirrors the stereo USB cameras used by the baby monitor, including the
+auto/manual pairs that toggle the INACTIVE flag on their dependent controls.
+"""
+import time
+import threading
+from types import SimpleNamespace
+from typing import Dict, List
+from linuxpy.video.device import MenuControl, IntegerControl, BooleanControl
+
+IOCTL_LATENCY = 0.001
+INACTIVE = 0x10
+
+stats = {"opens": 0, "ioctls": 0}
+_stats_lock = threading.Lock()
+
+
+def _ioctl():
+    with _stats_lock:
+        stats["ioctls"] += 1
+    time.sleep(IOCTL_LATENCY)
+
+
+def reset_stats():
+    with _stats_lock:
+        stats["opens"] = 0
+        stats["ioctls"] = 0
+
+
+class _FakeControlMixin:
+    """Replaces the linuxpy ioctl paths of a control with an in-memory value."""
+    def _setup(self, device, cid, name, default, flags=0):
+        self.device = device
+        self.id = cid
+        self.name = name
+        self._config_name = None
+        self._default = default
+        self._flags = flags
+        self.device.state.setdefault(name, default)
+
+    @property
+    def flags(self):
+        _ioctl()
+        return self._flags | self.device.inactive_flags(self.name)
+
+    @property
+    def default(self):
+        _ioctl()
+        return self._default
+
+    @property
+    def value(self):
+        _ioctl()
+        return self.device.state[self.name]
+
+    @value.setter
+    def value(self, value):
+        _ioctl()
+        if self.device.inactive_flags(self.name):
+            raise AttributeError(f"{self.name} is not writeable: inactive")
+        self.device.state[self.name] = value
+
+    def set_to_default(self):
+        self.value = self.default
+
+
+class FakeIntegerControl(_FakeControlMixin, IntegerControl):
+    def __init__(self, device, cid, name, default, minimum, maximum, step=1, flags=0):
+        self._setup(device, cid, name, default, flags)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.step = step
+
+
+class FakeBooleanControl(_FakeControlMixin, BooleanControl):
+    def __init__(self, device, cid, name, default, flags=0):
+        self._setup(device, cid, name, default, flags)
+        self.minimum = 0
+        self.maximum = 1
+        self.step = 1
+
+
+class FakeMenuControl(_FakeControlMixin, MenuControl):
+    def __init__(self, device, cid, name, default, options: Dict[int, str], flags=0):
+        self._setup(device, cid, name, default, flags)
+        self.data = dict(options)
+        self.minimum = min(options)
+        self.maximum = max(options)
+        self.step = 1
+
+
+class _FakeControls(dict):
+    """Keyed by control id like linuxpy, with lookup by config name as a fallback."""
+    def __missing__(self, key):
+        for control in self.values():
+            if control.config_name == key:
+                return control
+        raise KeyError(key)
+
+
+# Shared state per device path, so values survive across open/close like real hardware
+_device_states: Dict[str, Dict[str, object]] = {}
+
+
+class FakeDevice:
+    """Drop-in replacement for linuxpy.video.device.Device."""
+    def __init__(self, device_path: str):
+        self.path = device_path
+        self.state = _device_states.setdefault(device_path, {})
+        self.controls = None
+        self.info = None
+        self.closed = True
+
+    def open(self):
+        with _stats_lock:
+            stats["opens"] += 1
+        _ioctl()
+        self.controls = _FakeControls()
+        for control in _build_controls(self):
+            self.controls[control.id] = control
+        self.info = SimpleNamespace(
+            driver="uvcvideo",
+            card="3D USB Camera: 3D USB Camera",
+            bus_info=f"usb-xhci-hcd.1-{self.path.rsplit(':', 2)[-2] if ':' in self.path else '1'}",
+            frame_sizes=_frame_sizes(),
+        )
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def inactive_flags(self, control_name: str) -> int:
+        if control_name == "Exposure Time, Absolute" and self.state.get("Auto Exposure") == 3:
+            return INACTIVE
+        if control_name == "White Balance Temperature" and self.state.get("White Balance, Automatic"):
+            return INACTIVE
+        return 0
+
+
+def _build_controls(device: FakeDevice) -> List[object]:
+    return [
+        FakeIntegerControl(device, 0x00980900, "Brightness", 0, -64, 64, flags=0x20),
+        FakeIntegerControl(device, 0x00980901, "Contrast", 32, 0, 64, flags=0x20),
+        FakeIntegerControl(device, 0x00980902, "Saturation", 64, 0, 128, flags=0x20),
+        FakeIntegerControl(device, 0x00980903, "Hue", 0, -40, 40, flags=0x20),
+        FakeBooleanControl(device, 0x0098090c, "White Balance, Automatic", True),
+        FakeIntegerControl(device, 0x00980910, "Gamma", 100, 72, 500, flags=0x20),
+        FakeIntegerControl(device, 0x00980913, "Gain", 0, 0, 100, flags=0x20),
+        FakeMenuControl(device, 0x00980918, "Power Line Frequency", 1,
+                        {0: "Disabled", 1: "50 Hz", 2: "60 Hz"}),
+        FakeIntegerControl(device, 0x0098091a, "White Balance Temperature", 4600, 2800, 6500, step=1, flags=0x20),
+        FakeIntegerControl(device, 0x0098091b, "Sharpness", 3, 0, 6, flags=0x20),
+        FakeIntegerControl(device, 0x0098091c, "Backlight Compensation", 1, 0, 2, flags=0x20),
+        FakeMenuControl(device, 0x009a0901, "Auto Exposure", 3, {1: "Manual Mode", 3: "Aperture Priority Mode"}),
+        FakeIntegerControl(device, 0x009a0902, "Exposure Time, Absolute", 157, 1, 5000, flags=0x20),
+        FakeBooleanControl(device, 0x009a0903, "Exposure, Dynamic Framerate", False),
+    ]
+
+
+def _frame_sizes():
+    """Lazily enumerated like VIDIOC_ENUM_FRAMESIZES/FRAMEINTERVALS, one ioctl per entry."""
+    modes = [
+        ("MJPEG", 3840, 1080, [60, 30, 15, 10, 5]),
+        ("MJPEG", 2560, 720, [60, 30, 15, 10, 5]),
+        ("MJPEG", 1280, 480, [60, 30, 15, 10, 5]),
+        ("YUYV", 3840, 1080, [1]),
+        ("YUYV", 2560, 720, [5]),
+        ("YUYV", 1280, 480, [10, 5]),
+    ]
+    for pixel_format, width, height, fps_list in modes:
+        for fps in fps_list:
+            _ioctl()
+            yield SimpleNamespace(
+                pixel_format=SimpleNamespace(name=pixel_format),
+                width=width,
+                height=height,
+                max_fps=fps,
+            )
+
+
+def fake_device_paths(count: int = 4):
+    """Returns (paths, names) shaped like get_device_paths_and_names."""
+    names = [f"platform-xhci-hcd.1-usb-0:1.{i}:1.0-video-index0" for i in range(1, count + 1)]
+    paths = [f"/dev/v4l/by-path/{name}" for name in names]
+    return paths, names
+
+
+def query_flags(cam, control) -> int:
+    """Replacement for v4l2_wrapper._query_flags, the fake controls compute their flags on access."""
+    return control.flags
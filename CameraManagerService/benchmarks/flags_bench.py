@@ -0,0 +1,35 @@
+"""
+Time to decode V4L2 control flags with the IntFlag enum (the old behaviour) versus the
+precomputed table behind decode_flags.
+
+Run from the CameraManagerService directory:
+    python -m benchmarks.flags_bench
+"""
+import time
+from src.v4l2_wrapper import V4L2ControlFlags, decode_flags
+
+FLAG_VALUES = list(range(0x100)) * 200
+
+
+def _enum_flag_names(flag_value: int):
+    return [flag.name.lower() for flag in V4L2ControlFlags if flag in V4L2ControlFlags(flag_value)]
+
+
+def main():
+    start = time.perf_counter()
+    for flag_value in FLAG_VALUES:
+        _enum_flag_names(flag_value)
+    enum_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for flag_value in FLAG_VALUES:
+        decode_flags(flag_value).names
+    table_time = time.perf_counter() - start
+
+    print(f"enum decoding:  {enum_time / len(FLAG_VALUES) * 1e6:8.3f} us per control")
+    print(f"table decoding: {table_time / len(FLAG_VALUES) * 1e6:8.3f} us per control "
+          f"({enum_time / table_time:.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
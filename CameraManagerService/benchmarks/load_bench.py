@@ -0,0 +1,76 @@
+"""
+Latency percentiles of the configuration API under concurrent clients.
+
+Every client loops over the cameras and mixes cached reads (GET /{cam_id}), live control
+reads (GET /{cam_id}/controls) and control updates (PUT /{cam_id}/controls). Device I/O runs
+on one worker thread per camera and concurrent live reads of a camera share one device query.
+
+Run from the CameraManagerService directory:
+    python -m benchmarks.load_bench
+"""
+import time
+import asyncio
+import tempfile
+from collections import defaultdict
+from typing import Dict, List
+from unittest.mock import patch
+import httpx
+from src.config_api import app
+from . import fake_device
+
+CAMERA_COUNT = 4
+CLIENTS = 32
+REQUESTS_PER_CLIENT = 30
+
+
+async def _client(client: httpx.AsyncClient, index: int, latencies: Dict[str, List[float]]):
+    for i in range(REQUESTS_PER_CLIENT):
+        cam_id = f"cam{(index + i) % CAMERA_COUNT + 1}"
+        kind = ("GET /{cam_id}", "GET /{cam_id}/controls", "PUT /{cam_id}/controls")[(index + i) % 3]
+        start = time.perf_counter()
+        if kind.startswith("PUT"):
+            response = await client.put(f"/{cam_id}/controls",
+                                        json={"cam_id": cam_id, "controls": {"brightness": i % 10}})
+        else:
+            response = await client.get(kind.split(" ")[1].replace("{cam_id}", cam_id))
+        latencies[kind].append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def _run() -> Dict[str, List[float]]:
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            fake_device.reset_stats()
+            start = time.perf_counter()
+            await asyncio.gather(*(_client(client, i, latencies) for i in range(CLIENTS)))
+            elapsed = time.perf_counter() - start
+    total = sum(len(samples) for samples in latencies.values())
+    print(f"{CLIENTS} clients, {CAMERA_COUNT} cameras: {total / elapsed:.1f} req/s, "
+          f"{fake_device.stats['ioctls']} ioctls")
+    return latencies
+
+
+def main():
+    paths, names = fake_device.fake_device_paths(CAMERA_COUNT)
+    with tempfile.TemporaryDirectory() as state_dir, \
+         patch("src.persistence.STATE_DIR", state_dir), \
+         patch("src.v4l2_wrapper.Device", fake_device.FakeDevice), \
+         patch("src.v4l2_wrapper._query_flags", fake_device.query_flags), \
+         patch("src.device_session.Device", fake_device.FakeDevice), \
+         patch("src.manager.get_device_paths_and_names", return_value=(paths, names)):
+        latencies = asyncio.run(_run())
+
+    print(f"{'endpoint':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for kind, samples in sorted(latencies.items()):
+        print(f"{kind:<24}" + "".join(f"{_percentile(samples, p) * 1000:10.1f}" for p in (0.5, 0.95, 0.99)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Requests/sec of the configuration API with a fresh CameraManager per request (the old
+behaviour) versus the process-lifetime registry created in the app lifespan.
+
+Run from the CameraManagerService directory:
+    python -m benchmarks.registry_bench
+"""
+import time
+import tempfile
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from src.config_api import app, get_camera_manager
+from src.manager import CameraManager
+from . import fake_device
+
+CAMERA_COUNT = 4
+REQUESTS = 200
+
+
+def _run(client: TestClient, requests: int) -> float:
+    start = time.perf_counter()
+    for i in range(requests):
+        response = client.get(f"/cam{i % CAMERA_COUNT + 1}")
+        assert response.status_code == 200
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    paths, names = fake_device.fake_device_paths(CAMERA_COUNT)
+    with tempfile.TemporaryDirectory() as state_dir, \
+         patch("src.persistence.STATE_DIR", state_dir), \
+         patch("src.v4l2_wrapper.Device", fake_device.FakeDevice), \
+         patch("src.v4l2_wrapper._query_flags", fake_device.query_flags), \
+         patch("src.device_session.Device", fake_device.FakeDevice), \
+         patch("src.manager.get_device_paths_and_names", return_value=(paths, names)):
+
+        with TestClient(app) as client:
+            # Old behaviour: every request rediscovered all cameras
+            app.dependency_overrides[get_camera_manager] = lambda: CameraManager()
+            fake_device.reset_stats()
+            before = _run(client, REQUESTS // 20)
+            opens_before = fake_device.stats["opens"] / (REQUESTS // 20)
+            app.dependency_overrides.clear()
+
+            fake_device.reset_stats()
+            after = _run(client, REQUESTS)
+            opens_after = fake_device.stats["opens"] / REQUESTS
+
+    print(f"per-request discovery: {before:10.1f} req/s  ({opens_before:.1f} device opens/request)")
+    print(f"lifespan registry:     {after:10.1f} req/s  ({opens_after:.1f} device opens/request)")
+    print(f"speedup:               {after / before:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Device writes and ioctls of a slider drag (brightness updates every 5 ms for one second),
+written one by one through Camera.update_controls versus through the coalescing WriteQueue.
+
+Run from the CameraManagerService directory:
+    python -m benchmarks.slider_bench
+"""
+import time
+import asyncio
+from unittest.mock import patch
+from src.camera import Camera
+from . import fake_device
+
+UPDATES = 200
+UPDATE_INTERVAL = 0.005
+
+
+async def _drag(submit):
+    writes = []
+    for value in range(UPDATES):
+        writes.append(asyncio.ensure_future(submit({"brightness": value % 64})))
+        await asyncio.sleep(UPDATE_INTERVAL)
+    for failed in await asyncio.gather(*writes):
+        assert not failed, failed
+
+
+def _measure(camera: Camera, submit) -> str:
+    camera.update_controls.reset_mock()
+    fake_device.reset_stats()
+    start = time.perf_counter()
+    asyncio.run(_drag(submit))
+    elapsed = time.perf_counter() - start
+    return (f"{camera.update_controls.call_count:4d} device writes, {fake_device.stats['ioctls']:5d} ioctls, "
+            f"settled after {elapsed * 1000:7.1f} ms")
+
+
+def main():
+    paths, names = fake_device.fake_device_paths(1)
+    with patch("src.v4l2_wrapper.Device", fake_device.FakeDevice), \
+         patch("src.v4l2_wrapper._query_flags", fake_device.query_flags), \
+         patch("src.device_session.Device", fake_device.FakeDevice):
+        camera = Camera("cam1", paths[0], names[0])
+        # Count the writes that reach the device
+        update_controls = camera.update_controls
+        with patch.object(camera, "update_controls", wraps=update_controls):
+            direct = _measure(camera, lambda controls: camera.executor.run(camera.update_controls, controls))
+            queued = _measure(camera, camera.write_queue.submit)
+        camera.close()
+
+    print(f"{UPDATES} slider updates")
+    print(f"direct:      {direct}")
+    print(f"write queue: {queued}")
+
+
+if __name__ == "__main__":
+    main()
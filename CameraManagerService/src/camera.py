@@ -1,47 +1,129 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import logging
+import threading
+from .capability_cache import CapabilityCache
+from .device_session import DeviceSession
+from .device_executor import DeviceExecutor
+from .write_queue import WriteQueue
+from .format_index import FormatIndex
+from .control_model import ControlMetadata, ControlValue, compose_controls
+from .snapshot import JsonSnapshot, render_json
 from .v4l2_wrapper import(
     get_supported_formats,
-    get_controls,
-    default_all_controls,
-    set_control
+    read_control_metadata,
+    read_control_values,
+    reset_controls,
+    set_controls,
+    refresh_controls
 )
 
 logger = logging.getLogger("Camera")
 
+# Controls that are driven by the camera or can't be written, these aren't saved in presets
+_NOT_RESTORABLE_FLAGS = frozenset(("disabled", "read_only", "inactive", "volatile"))
+
 class Camera:
     """Represents a single V4L2 camera device."""
-    def __init__(self, cam_id: str, device_path: str, device_name: str):
+    def __init__(self, cam_id: str, device_path: str, device_name: str, capability_cache: Optional[CapabilityCache] = None):
         self.id : str = cam_id
         self.path : str = device_path
         self.name : str = device_name
-        self.controls : Dict[str, Any] = get_controls(device_path)
-        self.formats : Dict[str, Dict[str, List[int]]] = get_supported_formats(device_path)
+        # One shared descriptor for all device access, closed when the camera is idle
+        self.session : DeviceSession = DeviceSession(device_path)
+        with self.session:
+            # The metadata is read once, afterwards only the values are re-read
+            self.control_metadata : Dict[str, ControlMetadata] = read_control_metadata(self.session)
+            self.control_values : Dict[str, ControlValue] = read_control_values(self.session)
+            self.formats : Dict[str, Dict[str, List[int]]] = get_supported_formats(self.session, capability_cache)
+        self.format_index : FormatIndex = FormatIndex(self.formats)
+        self._controls : Optional[Dict[str, Any]] = None
+        self._snapshot : Optional[JsonSnapshot] = None
+        # Serializes device access when several requests target the same camera
+        self._lock = threading.Lock()
+        # Worker thread of the async API for this camera's device I/O
+        self.executor : DeviceExecutor = DeviceExecutor(cam_id)
+        # Coalesces the control writes of the API, runs them on the executor
+        self.write_queue : WriteQueue = WriteQueue(self)
+
 
+    @property
+    def controls(self) -> Dict[str, Any]:
+        """The API representation of the controls, composed when first needed after the values changed."""
+        controls = self._controls
+        if controls is None:
+            controls = compose_controls(self.control_metadata, self.control_values)
+            self._controls = controls
+        return controls
 
     def get_data(self) -> Dict[str, Any]:
         """Fetches the camera's current controls and formats from the device."""
         camera_data = {
             "id": self.id,
+            "name": self.name,
             "path": self.path,
             "controls": self.controls,
             "formats": self.formats
         }
         return camera_data
+
+    def get_snapshot(self) -> JsonSnapshot:
+        """Returns get_data() rendered as JSON, only re-rendered after the control values changed."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = render_json(self.get_data())
+            self._snapshot = snapshot
+        return snapshot
     
+    def read_controls(self) -> Dict[str, Any]:
+        """Re-reads the current control values from the device."""
+        with self._lock:
+            with self.session:
+                self._set_values(read_control_values(self.session))
+        return self.controls
+
     def reset_all_controls(self) -> List[str]:
-        """Reset all of the control values."""
-        failed_to_set = default_all_controls(self.path)
-        self.controls = get_controls(self.path)
+        """
+        Reset all of the control values.
+        Only the controls that differ from their default are written, and only what they affect is read back.
+        """
+        with self._lock:
+            with self.session:
+                failed_to_set, written = reset_controls(self.session, self.control_metadata, self.control_values)
+                self._set_values(refresh_controls(self.session, written, self.control_values))
         return failed_to_set
 
 
     def update_controls(self, new_control : Dict[str, Any]) -> List[str]:
-        """Update the controls given in the 'new_control' dict."""
-        failed_to_set : List[str] = []
-        for control_name, control_value in new_control.items():
-            if set_control(self.path, control_name, control_value) is False:
-                failed_to_set.append(control_name)
-                
-        self.controls = get_controls(self.path)
-        return failed_to_set
\ No newline at end of file
+        """
+        Update the controls given in the 'new_control' dict.
+        Only the written controls and the ones they can affect are read back.
+        """
+        with self._lock:
+            with self.session:
+                results = set_controls(self.session, new_control)
+                self._set_values(refresh_controls(self.session, new_control.keys(), self.control_values))
+        return [control_name for control_name, was_set in results.items() if not was_set]
+
+    def get_control_values(self) -> Dict[str, Any]:
+        """Returns the current value of every writable control, e.g. to save them as a preset."""
+        return {control_name: state.value for control_name, state in self.control_values.items()
+                if not _NOT_RESTORABLE_FLAGS.intersection(state.flags)}
+
+    def apply_controls(self, controls: Dict[str, Any]) -> List[str]:
+        """Writes only the controls whose value differs from the current one, e.g. to apply a preset."""
+        control_values = self.control_values
+        changed = {control_name: value for control_name, value in controls.items()
+                   if control_name not in control_values or control_values[control_name].value != value}
+        if not changed:
+            return []
+        return self.update_controls(changed)
+
+    def close(self):
+        """Releases the device, called when the camera is removed."""
+        self.executor.shutdown()
+        self.session.close()
+
+    def _set_values(self, control_values: Dict[str, ControlValue]):
+        self.control_values = control_values
+        self._controls = None
+        self._snapshot = None
\ No newline at end of file
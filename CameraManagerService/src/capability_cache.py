@@ -0,0 +1,31 @@
+import threading
+from typing import Dict, List, Optional
+from . import persistence
+
+CAPABILITY_CACHE_FILE = "capabilities.json"
+
+
+class CapabilityCache:
+    """
+    Persistent cache of the supported formats table of each camera.
+    Entries are stored per by-path device name together with the device identity (driver, card, bus info),
+    if a different device shows up on the same port its entry is invalidated and enumerated again.
+    """
+    def __init__(self, file_path: Optional[str] = None):
+        self.file_path: str = file_path or persistence.state_path(CAPABILITY_CACHE_FILE)
+        self._entries: Dict[str, Dict] = persistence.load_json(self.file_path, {})
+        self._lock = threading.Lock()
+
+    def get(self, device_name: str, identity: List[str]) -> Optional[Dict[str, Dict[str, List[int]]]]:
+        """Returns the cached formats of a device, or None if it's unknown or its identity changed."""
+        with self._lock:
+            entry = self._entries.get(device_name)
+            if entry is None or entry.get("identity") != list(identity):
+                return None
+            return entry["formats"]
+
+    def put(self, device_name: str, identity: List[str], formats: Dict[str, Dict[str, List[int]]]):
+        """Stores the formats of a device and saves the cache."""
+        with self._lock:
+            self._entries[device_name] = {"identity": list(identity), "formats": formats}
+            persistence.save_json(self.file_path, self._entries)
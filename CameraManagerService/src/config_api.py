@@ -1,52 +1,120 @@
 import logging
-from fastapi import FastAPI, HTTPException, Depends, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from .manager import CameraManager
+from .presets import PresetStore
+from .hotplug import HotplugWatcher
+from .snapshot import JsonSnapshot, etag_matches
 from .log_config import setup_logging
 
 setup_logging()
 logger = logging.getLogger("CameraConfigAPI")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Discovers the cameras once at startup, requests are then served from memory.
+    The hotplug watcher keeps the registry up to date when cameras are (un)plugged.
+    """
+    app.state.camera_manager = CameraManager()
+    app.state.preset_store = PresetStore()
+    logger.info(f"Camera registry ready with {len(app.state.camera_manager.cameras)} camera(s)")
+    watcher = HotplugWatcher(app.state.camera_manager)
+    watcher.start()
+    try:
+        yield
+    finally:
+        watcher.stop()
+
+
 # python3 -m uvicorn src.config_api:app --host 127.0.0.1 --port 8000
 app = FastAPI(
     title="Camera Configuration API",
-    description="An API to discover and configure V4L2 cameras."
+    description="An API to discover and configure V4L2 cameras.",
+    lifespan=lifespan
 )
 
 class ControlData(BaseModel):
     cam_id: str
     controls: Dict[str, Any]
 
-def get_camera_manager():
-    """FastAPI dependency to get a single CameraManager instance."""
-    manager = CameraManager()
-    yield manager
+class ModeData(BaseModel):
+    pixel_format: str
+    width: int
+    height: int
+    fps: int
+
+class PresetData(BaseModel):
+    name: str
+    controls: Dict[str, Any]
+
+class PresetSave(BaseModel):
+    # The current control values are saved when no controls are given
+    controls: Dict[str, Any] = {}
+
+def get_camera_manager(request: Request) -> CameraManager:
+    """FastAPI dependency to get the process-lifetime CameraManager instance."""
+    return request.app.state.camera_manager
+
+
+def get_preset_store(request: Request) -> PresetStore:
+    """FastAPI dependency to get the preset store."""
+    return request.app.state.preset_store
+
+
+def snapshot_response(snapshot: JsonSnapshot, request: Request) -> Response:
+    """Serves a pre-rendered JSON body, or 304 if the client already has this version."""
+    headers = {"ETag": snapshot.etag}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
 
 
 @app.get("/", summary="List connected cameras", response_model=List[Dict[str, Any]])
-def list_cameras(manager: CameraManager = Depends(get_camera_manager)):
-    """Discovers and lists all connected cameras with their full capabilities."""
-    return manager.get_all_cameras()
+async def list_cameras(request: Request, manager: CameraManager = Depends(get_camera_manager)):
+    """Lists all connected cameras with their full capabilities."""
+    return snapshot_response(manager.get_all_cameras_snapshot(), request)
+
+
+@app.post("/rescan", summary="Rediscover the connected cameras", response_model=List[Dict[str, Any]])
+async def rescan_cameras(manager: CameraManager = Depends(get_camera_manager)):
+    """Rescans the V4L2 devices and returns the refreshed camera list, always in full."""
+    await run_in_threadpool(manager.discover_cameras)
+    snapshot = manager.get_all_cameras_snapshot()
+    return Response(content=snapshot.body, media_type="application/json", headers={"ETag": snapshot.etag})
+
+
+@app.get("/discovery/errors", summary="Cameras that failed to set up", response_model=Dict[str, str])
+async def get_discovery_errors(manager: CameraManager = Depends(get_camera_manager)):
+    """Returns the errors of the cameras that couldn't be set up in the last discovery, by camera ID."""
+    return manager.discovery_errors
 
 
 @app.get("/{cam_id}", summary="Get all info for a specific camera", response_model=Dict[str, Any])
-def get_camera_data(cam_id: str, manager: CameraManager = Depends(get_camera_manager)):
+async def get_camera_data(cam_id: str, request: Request, manager: CameraManager = Depends(get_camera_manager)):
     """Returns the full details for a single camera by its short ID."""
-    camera = manager.get_camera_by_id(cam_id)
-    if not camera:
-        raise HTTPException(status_code=404, detail=f"Camera with ID '{cam_id}' not found.")
-    return camera.get_data()
+    camera = get_camera_or_404(manager, cam_id)
+    return snapshot_response(camera.get_snapshot(), request)
+
+
+@app.get("/{cam_id}/controls", summary="Read the current controls from the device", response_model=ControlData)
+async def read_camera_controls(cam_id: str, manager: CameraManager = Depends(get_camera_manager)):
+    """Re-reads the control values from the device, concurrent requests for the same camera share one read."""
+    camera = get_camera_or_404(manager, cam_id)
+    controls = await camera.executor.coalesce("read_controls", camera.read_controls)
+    return {"cam_id": cam_id, "controls": controls}
 
 
 @app.put("/{cam_id}/reset", summary="Resets all controls to default values", response_model=ControlData)
-def reset_camera(cam_id: str, manager: CameraManager = Depends(get_camera_manager)):
+async def reset_camera(cam_id: str, manager: CameraManager = Depends(get_camera_manager)):
     """Finds a camera by its ID and resets its controls to their default values."""
-    camera = manager.get_camera_by_id(cam_id)
-    if not camera:
-        raise HTTPException(status_code=404, detail=f"Camera with ID '{cam_id}' not found.")
+    camera = get_camera_or_404(manager, cam_id)
     
-    failed_to_reset = camera.reset_all_controls()
+    failed_to_reset = await camera.executor.run(camera.reset_all_controls)
     
     if failed_to_reset:
         raise HTTPException(status_code=500, detail=f"Failed to reset controls: {failed_to_reset}")
@@ -55,18 +123,94 @@ def reset_camera(cam_id: str, manager: CameraManager = Depends(get_camera_manage
 
 
 @app.put("/{cam_id}/controls", summary="Change the controls of a specific camera", response_model=ControlData)
-def update_camera_controls(cam_id: str, control_update: ControlData, manager: CameraManager = Depends(get_camera_manager)):
-    """Update the given camera's control values"""
-    camera = manager.get_camera_by_id(cam_id)
-    if not camera:
-        raise HTTPException(status_code=404, detail=f"Camera with ID '{cam_id}' not found.")
+async def update_camera_controls(cam_id: str, control_update: ControlData, manager: CameraManager = Depends(get_camera_manager)):
+    """Update the given camera's control values, writes that arrive in quick succession are coalesced."""
+    camera = get_camera_or_404(manager, cam_id)
     
     if not control_update.controls:
         raise HTTPException(status_code=400, detail="No controls specified for update.")
     
-    failed_to_update = camera.update_controls(control_update.controls)
+    failed_to_update = await camera.write_queue.submit(control_update.controls)
     
     if failed_to_update:
         raise HTTPException(status_code=500, detail=f"These controls couldn't be updated: {failed_to_update}")
     else:
-        return {"cam_id": cam_id, "controls": camera.controls}
\ No newline at end of file
+        return {"cam_id": cam_id, "controls": camera.controls}
+
+
+@app.get("/{cam_id}/modes", summary="List the supported modes of a camera", response_model=List[ModeData])
+async def list_modes(cam_id: str, pixel_format: Optional[str] = None, manager: CameraManager = Depends(get_camera_manager)):
+    """Returns the supported format, resolution and fps combinations, largest resolution and highest fps first."""
+    camera = get_camera_or_404(manager, cam_id)
+    return [mode._asdict() for mode in camera.format_index.modes(pixel_format)]
+
+
+@app.get("/{cam_id}/modes/best", summary="Find the best mode for the given limits", response_model=ModeData)
+async def get_best_mode(cam_id: str, pixel_format: Optional[str] = None, min_fps: int = 0,
+                        max_width: Optional[int] = None, max_height: Optional[int] = None,
+                        manager: CameraManager = Depends(get_camera_manager)):
+    """Returns the largest mode with at least 'min_fps' that fits in 'max_width' x 'max_height', e.g. MJPEG at 30 fps."""
+    camera = get_camera_or_404(manager, cam_id)
+    mode = camera.format_index.best_mode(pixel_format, min_fps, max_width, max_height)
+    if mode is None:
+        raise HTTPException(status_code=404, detail="No supported mode matches the request.")
+    return mode._asdict()
+
+
+@app.get("/{cam_id}/presets", summary="List the presets of a camera", response_model=Dict[str, Dict[str, Any]])
+async def list_presets(cam_id: str, manager: CameraManager = Depends(get_camera_manager),
+                       presets: PresetStore = Depends(get_preset_store)):
+    """Returns the saved presets of a camera by name."""
+    get_camera_or_404(manager, cam_id)
+    return presets.list(cam_id)
+
+
+@app.put("/{cam_id}/presets/{name}", summary="Save a preset", response_model=PresetData)
+async def save_preset(cam_id: str, name: str, preset: PresetSave, manager: CameraManager = Depends(get_camera_manager),
+                      presets: PresetStore = Depends(get_preset_store)):
+    """Saves the given control values as a preset, or the camera's current values if none are given."""
+    camera = get_camera_or_404(manager, cam_id)
+    controls = preset.controls or camera.get_control_values()
+    
+    unknown_controls = [control_name for control_name in controls if control_name not in camera.control_metadata]
+    if unknown_controls:
+        raise HTTPException(status_code=400, detail=f"Unknown controls: {unknown_controls}")
+    
+    await run_in_threadpool(presets.save, cam_id, name, controls)
+    return {"name": name, "controls": controls}
+
+
+@app.post("/{cam_id}/presets/{name}/apply", summary="Apply a preset", response_model=ControlData)
+async def apply_preset(cam_id: str, name: str, manager: CameraManager = Depends(get_camera_manager),
+                       presets: PresetStore = Depends(get_preset_store)):
+    """Writes the controls of a preset that differ from the current values, in a single device session."""
+    camera = get_camera_or_404(manager, cam_id)
+    controls = presets.get(cam_id, name)
+    if controls is None:
+        raise HTTPException(status_code=404, detail=f"Preset '{name}' not found for camera '{cam_id}'.")
+    
+    failed_to_update = await camera.executor.run(camera.apply_controls, controls)
+    
+    if failed_to_update:
+        raise HTTPException(status_code=500, detail=f"These controls couldn't be updated: {failed_to_update}")
+    else:
+        return {"cam_id": cam_id, "controls": camera.controls}
+
+
+@app.delete("/{cam_id}/presets/{name}", summary="Delete a preset", response_model=PresetData)
+async def delete_preset(cam_id: str, name: str, manager: CameraManager = Depends(get_camera_manager),
+                        presets: PresetStore = Depends(get_preset_store)):
+    """Deletes a preset and returns its control values."""
+    get_camera_or_404(manager, cam_id)
+    controls = await run_in_threadpool(presets.delete, cam_id, name)
+    if controls is None:
+        raise HTTPException(status_code=404, detail=f"Preset '{name}' not found for camera '{cam_id}'.")
+    return {"name": name, "controls": controls}
+
+
+def get_camera_or_404(manager: CameraManager, cam_id: str):
+    """Finds a camera by its ID or raises a 404 error."""
+    camera = manager.get_camera_by_id(cam_id)
+    if not camera:
+        raise HTTPException(status_code=404, detail=f"Camera with ID '{cam_id}' not found.")
+    return camera
\ No newline at end of file
@@ -0,0 +1,49 @@
+from typing import Dict, Any, NamedTuple, Optional, Tuple
+
+
+class ControlMetadata:
+    """
+    The properties of a control that don't change while the camera is connected.
+    Read once per device, the API fields are precomputed so composing a control only adds the value and flags.
+    """
+    __slots__ = ("name", "type", "default", "min", "max", "step", "menu", "_extra_fields")
+
+    def __init__(self, name: str, control_type: str, default: Any,
+                 minimum: Optional[int] = None, maximum: Optional[int] = None, step: Optional[int] = None,
+                 menu: Optional[Dict[int, str]] = None):
+        extra_fields: Dict[str, Any] = {}
+        if minimum is not None:
+            extra_fields = {"min": minimum, "max": maximum, "step": step}
+        elif menu is not None:
+            extra_fields = {"menu": menu}
+
+        for slot, value in (("name", name), ("type", control_type), ("default", default), ("min", minimum),
+                            ("max", maximum), ("step", step), ("menu", menu), ("_extra_fields", extra_fields)):
+            object.__setattr__(self, slot, value)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __repr__(self):
+        return f"<ControlMetadata {self.name} type={self.type} default={self.default}>"
+
+    def compose(self, state: "ControlValue") -> Dict[str, Any]:
+        """Returns the API representation of the control with the given runtime state."""
+        return {
+            "value": state.value,
+            "default": self.default,
+            "type": self.type,
+            "flags": state.flags,
+            **self._extra_fields
+        }
+
+
+class ControlValue(NamedTuple):
+    """The runtime state of a control."""
+    value: Any
+    flags: Tuple[str, ...]
+
+
+def compose_controls(metadata: Dict[str, ControlMetadata], values: Dict[str, ControlValue]) -> Dict[str, Any]:
+    """Builds the API control dict from the static metadata and the current values."""
+    return {name: metadata[name].compose(state) for name, state in values.items() if name in metadata}
@@ -0,0 +1,38 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable
+
+
+class DeviceExecutor:
+    """
+    Runs the blocking device I/O of one camera for the async API.
+    Every camera has its own worker thread, so calls are serialized per device but run in parallel across devices,
+    and a slow camera never occupies the threads of the others.
+    """
+    def __init__(self, name: str):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"device-{name}")
+        # Only touched from the event loop thread
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, func: Callable, *args) -> Any:
+        """Runs func(*args) on the device thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    async def coalesce(self, key: Hashable, func: Callable, *args) -> Any:
+        """
+        Like run(), but callers that ask for the same key while a call is in flight share its result
+        instead of querying the device again.
+        """
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self.run(func, *args))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shielded, so a cancelled request doesn't cancel the call for the others
+        return await asyncio.shield(future)
+
+    def shutdown(self):
+        """Stops accepting work, a call that is already running finishes in the background."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
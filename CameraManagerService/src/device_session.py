@@ -0,0 +1,109 @@
+import time
+import logging
+import threading
+from typing import Optional
+from linuxpy.video.device import Device
+
+logger = logging.getLogger("V4L2Commands")
+
+
+class DeviceSession:
+    """
+    Keeps one open file descriptor per camera and shares it between callers.
+    The device is opened on first use, reference counted while in use and closed after it was idle for
+    'idle_timeout' seconds. Callers are serialized, so only one of them talks to the device at a time.
+    A single idle timer is armed at a time, frequent short uses only move its deadline.
+    After an OSError the device is closed once the outermost user released it, nested uses fail until then.
+
+    Usage:
+        with session as cam:
+            cam.controls[...]
+    """
+    def __init__(self, device_path: str, idle_timeout: float = 10.0):
+        self.device_path: str = device_path
+        self.idle_timeout: float = idle_timeout
+        self._device: Optional[Device] = None
+        self._refs: int = 0
+        self._broken: bool = False
+        self._last_used: float = 0.0
+        self._lock = threading.RLock()
+        self._idle_timer: Optional[threading.Timer] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._device is not None
+
+    def __enter__(self) -> Device:
+        self._lock.acquire()
+        try:
+            if self._broken:
+                raise OSError(f"{self.device_path} failed, it's reopened once its current user is done")
+            if self._device is None:
+                device = Device(self.device_path)
+                device.open()
+                self._device = device
+        except BaseException:
+            self._lock.release()
+            raise
+        self._refs += 1
+        return self._device
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self._refs -= 1
+            if exc_type is not None and issubclass(exc_type, OSError) and not self._broken:
+                # The camera was probably unplugged, the next user has to reopen it
+                logger.warning(f"Closing {self.device_path} after error: {exc}")
+                self._broken = True
+            if self._refs > 0:
+                return
+            if self._broken:
+                self._broken = False
+                self._cancel_idle_timer()
+                self._close_device()
+            else:
+                self._last_used = time.monotonic()
+                if self._idle_timer is None:
+                    self._start_idle_timer(self.idle_timeout)
+        finally:
+            self._lock.release()
+
+    def close(self):
+        """Closes the device right away, e.g. when the camera was unplugged."""
+        with self._lock:
+            self._cancel_idle_timer()
+            self._close_device()
+
+    def _close_if_idle(self):
+        with self._lock:
+            if self._idle_timer is not threading.current_thread():
+                # Cancelled or replaced meanwhile
+                return
+            self._idle_timer = None
+            if self._refs > 0:
+                # Re-armed when the current user is done
+                return
+            remaining = self._last_used + self.idle_timeout - time.monotonic()
+            if remaining > 0:
+                self._start_idle_timer(remaining)
+            else:
+                self._close_device()
+
+    def _close_device(self):
+        device, self._device = self._device, None
+        if device is None:
+            return
+        try:
+            device.close()
+        except OSError as e:
+            logger.warning(f"Failed to close {self.device_path}: {e}")
+
+    def _start_idle_timer(self, timeout: float):
+        self._idle_timer = threading.Timer(timeout, self._close_if_idle)
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+
+    def _cancel_idle_timer(self):
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
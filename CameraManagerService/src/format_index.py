@@ -0,0 +1,59 @@
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+
+class FrameMode(NamedTuple):
+    """One supported combination of pixel format, resolution and frame rate."""
+    pixel_format: str
+    width: int
+    height: int
+    fps: int
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+
+class FormatIndex:
+    """
+    The supported modes of a camera with integer sizes, built once from the get_supported_formats table.
+    The modes of every pixel format are sorted from the largest resolution down and from the highest fps down,
+    so the first mode that fits a query is the best one.
+    """
+    def __init__(self, formats: Dict[str, Dict[str, List[int]]]):
+        by_format: Dict[str, List[FrameMode]] = {}
+        for pixel_format, resolutions in formats.items():
+            modes = by_format.setdefault(pixel_format.upper(), [])
+            for resolution, fps_list in resolutions.items():
+                width, height = (int(size) for size in resolution.split("x"))
+                modes.extend(FrameMode(pixel_format, width, height, int(fps)) for fps in fps_list)
+        
+        sort_key = lambda mode: (-mode.pixels, -mode.fps, -mode.width)
+        self._by_format: Dict[str, Tuple[FrameMode, ...]] = {
+            pixel_format: tuple(sorted(modes, key=sort_key)) for pixel_format, modes in by_format.items()
+        }
+        self._all: Tuple[FrameMode, ...] = tuple(sorted(
+            (mode for modes in self._by_format.values() for mode in modes), key=sort_key))
+        self._supported: Set[Tuple[str, int, int, int]] = {
+            (mode.pixel_format.upper(), mode.width, mode.height, mode.fps) for mode in self._all
+        }
+
+    def modes(self, pixel_format: Optional[str] = None) -> Tuple[FrameMode, ...]:
+        """Returns the modes of a pixel format, or of every format, best first."""
+        if pixel_format is None:
+            return self._all
+        return self._by_format.get(pixel_format.upper(), ())
+
+    def supports(self, pixel_format: str, width: int, height: int, fps: int) -> bool:
+        """Whether the camera can deliver exactly this mode."""
+        return (pixel_format.upper(), width, height, fps) in self._supported
+
+    def best_mode(self, pixel_format: Optional[str] = None, min_fps: int = 0,
+                  max_width: Optional[int] = None, max_height: Optional[int] = None) -> Optional[FrameMode]:
+        """Returns the largest mode with at least 'min_fps' that fits in the given size, at its highest fps."""
+        for mode in self.modes(pixel_format):
+            if mode.fps < min_fps:
+                continue
+            if (max_width is not None and mode.width > max_width) or (max_height is not None and mode.height > max_height):
+                continue
+            return mode
+        return None
@@ -0,0 +1,160 @@
+import os
+import ctypes
+import ctypes.util
+import select
+import struct
+import logging
+import threading
+from typing import Optional
+from . import v4l2_wrapper
+from .manager import CameraManager
+
+logger = logging.getLogger("Hotplug")
+
+# inotify constants from the Linux API (inotify.h)
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class HotplugWatcher:
+    """
+    Keeps the CameraManager in sync with the cameras linked in V4L_BY_PATH.
+    Uses inotify on the directory when available and falls back to polling otherwise.
+    udev removes the by-path directory together with the last camera, so while it's missing
+    the watcher polls until it shows up again.
+    """
+    def __init__(self, manager: CameraManager, watch_dir: Optional[str] = None,
+                 poll_interval: float = 2.0, settle_delay: float = 0.5, use_inotify: bool = True):
+        self.manager = manager
+        self.watch_dir = watch_dir or v4l2_wrapper.V4L_BY_PATH
+        self.poll_interval = poll_interval
+        self.settle_delay = settle_delay    # udev creates the links of a device in a burst
+        self.use_inotify = use_inotify and _libc is not None
+        self._stop = threading.Event()
+        self._wake_r, self._wake_w = -1, -1
+        self._thread: Optional[threading.Thread] = None
+        self._retry = False
+        self._mode: Optional[str] = None
+
+    def start(self):
+        """Starts watching in a background thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._wake_r, self._wake_w = os.pipe()
+        self._thread = threading.Thread(target=self._run, name="camera-hotplug", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the background thread and releases the inotify descriptor."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        os.write(self._wake_w, b"\0")
+        self._thread.join()
+        self._thread = None
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+    def _run(self):
+        while not self._stop.is_set():
+            fd = self._add_watch() if self.use_inotify else None
+            self._log_mode("polling" if fd is None else "inotify")
+            if fd is None:
+                self._sync()
+                self._wait(self.poll_interval)
+                continue
+            try:
+                self._watch(fd)
+            finally:
+                os.close(fd)
+
+    def _log_mode(self, mode: str):
+        """Logs how the directory is watched whenever that changes, e.g. polling while it's missing."""
+        if mode == self._mode:
+            return
+        self._mode = mode
+        logger.info(f"Watching {self.watch_dir} for camera changes ({mode})")
+
+    def _add_watch(self) -> Optional[int]:
+        """Returns an inotify descriptor watching the directory, or None if it can't be watched yet."""
+        if not os.path.isdir(self.watch_dir):
+            return None
+        fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            logger.warning(f"inotify_init1 failed: {os.strerror(ctypes.get_errno())}, falling back to polling")
+            self.use_inotify = False
+            return None
+        if _libc.inotify_add_watch(fd, os.fsencode(self.watch_dir), _WATCH_MASK) < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def _watch(self, fd: int):
+        """Handles inotify events until the directory disappears or the watcher is stopped."""
+        # Anything that changed before the watch was added has to be picked up by a sync
+        self._sync()
+        while not self._stop.is_set():
+            timeout = self.poll_interval if self._retry else None
+            readable, _, _ = select.select([fd, self._wake_r], [], [], timeout)
+            if self._stop.is_set():
+                return
+            if not readable:
+                self._sync()
+                continue
+
+            # Let the burst of events for a (un)plug settle, then handle them with one sync
+            self._wait(self.settle_delay)
+            watch_gone = _drain_events(fd)
+            self._sync()
+            if watch_gone:
+                return
+
+    def _sync(self):
+        try:
+            self._retry = not self.manager.sync_cameras()
+        except Exception as e:
+            logger.error(f"Camera sync failed: {e}")
+            self._retry = True
+
+    def _wait(self, timeout: float):
+        select.select([self._wake_r], [], [], timeout)
+
+
+def _drain_events(fd: int) -> bool:
+    """Reads all pending inotify events, returns True if the watched directory went away."""
+    watch_gone = False
+    while True:
+        try:
+            data = os.read(fd, 4096)
+        except BlockingIOError:
+            return watch_gone
+        offset = 0
+        while offset < len(data):
+            _, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size + name_len
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                watch_gone = True
+
+
+def _load_libc() -> Optional[ctypes.CDLL]:
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+_libc = _load_libc()
@@ -0,0 +1,40 @@
+import threading
+from typing import Dict, Iterable, Optional
+from . import persistence
+
+ID_MAP_FILE = "camera_ids.json"
+
+
+class CameraIdMap:
+    """
+    Persistent binding of by-path device names to camera IDs.
+    A camera keeps its ID across rescans, replugs and restarts as long as it stays on the same USB port.
+    """
+    def __init__(self, file_path: Optional[str] = None):
+        self.file_path: str = file_path or persistence.state_path(ID_MAP_FILE)
+        self._ids: Dict[str, str] = persistence.load_json(self.file_path, {})
+        self._lock = threading.Lock()
+
+    def bind(self, device_names: Iterable[str]) -> Dict[str, str]:
+        """Returns the ID of every device name, new names get the lowest free camN and are saved."""
+        device_names = list(device_names)
+        with self._lock:
+            new_binding = False
+            for device_name in device_names:
+                if device_name not in self._ids:
+                    self._ids[device_name] = self._next_free_id()
+                    new_binding = True
+            if new_binding:
+                persistence.save_json(self.file_path, self._ids)
+            return {name: self._ids[name] for name in device_names}
+
+    def get_id(self, device_name: str) -> str:
+        """Returns the ID bound to a device name, binding it if needed."""
+        return self.bind([device_name])[device_name]
+
+    def _next_free_id(self) -> str:
+        taken_ids = set(self._ids.values())
+        i = 1
+        while f"cam{i}" in taken_ids:
+            i += 1
+        return f"cam{i}"
@@ -26,6 +26,7 @@ def setup_logging():
             "V4L2Commands": {"handlers": ["default"], "level": "INFO", "propagate": False},
             "CameraManager": {"handlers": ["default"], "level": "INFO", "propagate": False},
             "Camera": {"handlers": ["default"], "level": "INFO", "propagate": False},
+            "Hotplug": {"handlers": ["default"], "level": "INFO", "propagate": False},
             # Uvicorn loggers
             "uvicorn": {"handlers": ["default"], "level": "INFO", "propagate": False},
             "uvicorn.error": {"handlers": ["default"], "level": "INFO", "propagate": False},
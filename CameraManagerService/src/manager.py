@@ -1,38 +1,239 @@
+import os
+import math
+import time
 import logging
-from typing import Dict, Any, List, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
 from .camera import Camera
+from .id_map import CameraIdMap
+from .capability_cache import CapabilityCache
+from .snapshot import JsonSnapshot, join_json_array
 from .v4l2_wrapper import get_device_paths_and_names
 
 logger = logging.getLogger("CameraManager")
 
+PROBE_WORKERS = 8       # Cameras probed at the same time during discovery
+PROBE_TIMEOUT = 10.0    # Seconds a single camera may take to open and enumerate
+RETRY_MIN = 1.0         # Seconds before a sync probes a camera that failed to set up again, doubled for every failure
+RETRY_MAX = 60.0
+
+class _FailedProbe(NamedTuple):
+    cam_id: str
+    error: str
+    link: Optional[Tuple[int, int]]     # The by-path link the probe failed on, see _link_id()
+    retry_at: float                     # time.monotonic() after which a sync probes it again
+    backoff: float
+
 class CameraManager:
-    """Discovers and manages all V4L2 cameras on the system."""
-    def __init__(self):
+    """
+    Discovers and manages all V4L2 cameras on the system.
+    A single instance lives for the whole process and is shared between request threads.
+    """
+    def __init__(self, id_map: Optional[CameraIdMap] = None, capability_cache: Optional[CapabilityCache] = None,
+                 probe_timeout: float = PROBE_TIMEOUT):
         self.cameras: Dict[str, Camera] = {}
+        # Errors of the cameras that couldn't be set up in the last discovery or sync, by camera ID
+        self.discovery_errors: Dict[str, str] = {}
+        self.probe_timeout: float = probe_timeout
+        self.id_map: CameraIdMap = id_map or CameraIdMap()
+        self.capability_cache: CapabilityCache = capability_cache or CapabilityCache()
+        self._paths_by_id: Dict[str, str] = {}
+        self._ids_by_path: Dict[str, str] = {}
+        self._list_snapshot: Optional[JsonSnapshot] = None
+        self._list_parts: List[JsonSnapshot] = []
+        # The cameras that failed to set up, by path
+        self._failed: Dict[str, _FailedProbe] = {}
+        self._lock = threading.RLock()
+        # Held for a whole discovery or sync, so concurrent scans can't set up two Camera objects for one device
+        self._scan_lock = threading.Lock()
         self.discover_cameras()
 
     def discover_cameras(self):
-        """Discovers all connected cameras and populate the cameras list."""
-        self.cameras.clear()
-        
-        discovered_paths, discovered_names = get_device_paths_and_names()
-        if not discovered_names:
-            logger.warning("No camera devices found.")
-            return
+        """
+        Discovers all connected cameras and replaces the cameras dict.
+        The scan runs without holding the lock, so readers keep getting the old cameras until it's done.
+        Cameras that failed to set up before are probed again right away.
+        """
+        with self._scan_lock:
+            discovered_paths, discovered_names = get_device_paths_and_names()
+            self._failed = {}
+            if not discovered_names:
+                logger.warning("No camera devices found.")
+                self.discovery_errors = {}
+                self._replace_cameras({})
+                return
+            
+            cam_ids = self.id_map.bind(discovered_names)
+            candidates = [(cam_ids[cam_name], cam_path, cam_name)
+                          for cam_path, cam_name in zip(discovered_paths, discovered_names, strict=True)]
+            cameras, errors = self._probe_cameras(candidates)
+            self._record_failures(candidates, errors)
+            self._replace_cameras(cameras)
+
+    def sync_cameras(self) -> bool:
+        """
+        Adds newly connected cameras and removes the unplugged ones.
+        Cameras that are still connected keep their objects and IDs.
+        A camera that failed to set up is probed again once its backoff passed or its by-path link was recreated.
+        Returns False while a camera couldn't be set up, so the caller can retry later.
+        """
+        with self._scan_lock:
+            discovered_paths, discovered_names = get_device_paths_and_names()
+            discovered = dict(zip(discovered_paths, discovered_names, strict=True))
+            
+            with self._lock:
+                known_paths = {cam.path: cam_id for cam_id, cam in self.cameras.items()}
+            
+            # Unplugged cameras don't need a retry
+            self._failed = {path: failure for path, failure in self._failed.items() if path in discovered}
+            removed_ids = [cam_id for path, cam_id in known_paths.items() if path not in discovered]
+            added_paths = [path for path in discovered_paths if path not in known_paths and self._should_probe(path)]
+            if not removed_ids and not added_paths:
+                self.discovery_errors = {failure.cam_id: failure.error for failure in self._failed.values()}
+                return not self._failed
+            
+            cam_ids = self.id_map.bind(discovered[path] for path in added_paths)
+            candidates = [(cam_ids[discovered[cam_path]], cam_path, discovered[cam_path]) for cam_path in added_paths]
+            new_cameras, errors = self._probe_cameras(candidates)
+            self._record_failures(candidates, errors)
+            
+            with self._lock:
+                removed_cameras = [self.cameras[cam_id] for cam_id in removed_ids]
+                cameras = {cam_id: cam for cam_id, cam in self.cameras.items() if cam_id not in removed_ids}
+                cameras.update(new_cameras)
+                self._set_cameras(cameras)
         
-        for i, (cam_path, cam_name) in enumerate(zip(discovered_paths, discovered_names, strict=True), 1):
-            cam_id = f"cam{i}"
-            camera = Camera(cam_id, cam_path, cam_name)
-            if not camera.controls or not camera.formats:
-                logger.error(f"{cam_id} controls or formats is missing")
+        for camera in removed_cameras:
+            camera.close()
+            logger.info(f"Camera {camera.id} disconnected")
+        for cam_id, camera in new_cameras.items():
+            logger.info(f"Camera {cam_id} connected: {camera.path}")
+        return not self._failed
+
+    def _should_probe(self, cam_path: str) -> bool:
+        failure = self._failed.get(cam_path)
+        return failure is None or time.monotonic() >= failure.retry_at or _link_id(cam_path) != failure.link
+
+    def _record_failures(self, candidates: List[Tuple[str, str, str]], errors: Dict[str, str]):
+        """Remembers the probed candidates that failed, with a backoff that doubles while the same link keeps failing."""
+        now = time.monotonic()
+        for cam_id, cam_path, _ in candidates:
+            if cam_id not in errors:
+                self._failed.pop(cam_path, None)
                 continue
+            link = _link_id(cam_path)
+            previous = self._failed.get(cam_path)
+            backoff = min(previous.backoff * 2, RETRY_MAX) if previous and previous.link == link else RETRY_MIN
+            self._failed[cam_path] = _FailedProbe(cam_id, errors[cam_id], link, now + backoff, backoff)
+        self.discovery_errors = {failure.cam_id: failure.error for failure in self._failed.values()}
 
-            self.cameras[cam_id] = camera
+    def _probe_cameras(self, candidates: List[Tuple[str, str, str]]) -> Tuple[Dict[str, Camera], Dict[str, str]]:
+        """
+        Sets up the Camera objects of (cam_id, path, name) candidates concurrently.
+        A camera that doesn't finish within probe_timeout is reported as an error and skipped,
+        so one wedged USB device can't stall the whole scan.
+        Returns the cameras and the errors by camera ID, both in candidate order.
+        """
+        if not candidates:
+            return {}, {}
+        
+        workers = min(PROBE_WORKERS, len(candidates))
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="camera-probe")
+        futures: List[Future] = [
+            executor.submit(Camera, cam_id, cam_path, cam_name, self.capability_cache)
+            for cam_id, cam_path, cam_name in candidates
+        ]
+        # Candidates beyond the worker count wait for a free worker, so they get extra rounds of time
+        wait(futures, timeout=self.probe_timeout * math.ceil(len(candidates) / workers))
+        executor.shutdown(wait=False, cancel_futures=True)
+        
+        cameras: Dict[str, Camera] = {}
+        errors: Dict[str, str] = {}
+        for (cam_id, cam_path, _), future in zip(candidates, futures):
+            if not future.done():
+                errors[cam_id] = f"Timed out after {self.probe_timeout}s"
+                # Release the device if the probe finishes after all
+                future.add_done_callback(_close_late_camera)
+            elif future.cancelled():
+                errors[cam_id] = "Not probed before the timeout"
+            elif future.exception() is not None:
+                errors[cam_id] = str(future.exception())
+            else:
+                camera = future.result()
+                if not camera.controls or not camera.formats:
+                    errors[cam_id] = "controls or formats is missing"
+                    camera.close()
+                    continue
+                cameras[cam_id] = camera
+        
+        for cam_id, error in errors.items():
+            logger.error(f"Failed to set up {cam_id}: {error}")
+        return cameras, errors
 
     def get_all_cameras(self) -> List[Dict[str, Any]]:
         """Returns a list of all discovered cameras and their data."""
-        return [cam.get_data() for cam in self.cameras.values()]
+        with self._lock:
+            cameras = list(self.cameras.values())
+        return [cam.get_data() for cam in cameras]
+    
+    def get_all_cameras_snapshot(self) -> JsonSnapshot:
+        """Returns get_all_cameras() rendered as JSON, rebuilt only when a camera's snapshot changed."""
+        with self._lock:
+            cameras = list(self.cameras.values())
+        parts = [cam.get_snapshot() for cam in cameras]
+        
+        with self._lock:
+            snapshot = self._list_snapshot
+            if snapshot is None or len(parts) != len(self._list_parts) or \
+                    any(part is not cached for part, cached in zip(parts, self._list_parts)):
+                snapshot = join_json_array(parts)
+                self._list_snapshot = snapshot
+                self._list_parts = parts
+            return snapshot
     
     def get_camera_by_id(self, cam_id: str) -> Optional[Camera]:
         """Finds a camera object by its short ID."""
-        return self.cameras.get(cam_id)
\ No newline at end of file
+        with self._lock:
+            return self.cameras.get(cam_id)
+
+    def get_camera_by_path(self, cam_path: str) -> Optional[Camera]:
+        """Finds a camera object by its by-path device path."""
+        with self._lock:
+            cam_id = self._ids_by_path.get(cam_path)
+            return self.cameras.get(cam_id) if cam_id else None
+
+    def get_camera_path(self, cam_id: str) -> Optional[str]:
+        """Returns the by-path device path of a connected camera."""
+        with self._lock:
+            return self._paths_by_id.get(cam_id)
+
+    def _replace_cameras(self, cameras: Dict[str, Camera]):
+        """Swaps in the result of a full discovery and releases the previous Camera objects."""
+        with self._lock:
+            old_cameras = list(self.cameras.values())
+            self._set_cameras(cameras)
+        for camera in old_cameras:
+            camera.close()
+
+    def _set_cameras(self, cameras: Dict[str, Camera]):
+        """Swaps in a new cameras dict and rebuilds the ID <-> path indexes."""
+        with self._lock:
+            self.cameras = cameras
+            self._paths_by_id = {cam_id: cam.path for cam_id, cam in cameras.items()}
+            self._ids_by_path = {cam.path: cam_id for cam_id, cam in cameras.items()}
+
+
+
+def _link_id(cam_path: str) -> Optional[Tuple[int, int]]:
+    """Identifies a by-path link, udev creates a new one when the camera is plugged in again."""
+    try:
+        stat = os.lstat(cam_path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_ctime_ns
+
+
+def _close_late_camera(future: Future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
@@ -0,0 +1,40 @@
+import os
+import json
+import logging
+from typing import Any
+
+# Directory for state that has to survive restarts (camera IDs, caches, presets)
+STATE_DIR = os.environ.get("CAMERA_MANAGER_STATE_DIR", os.path.expanduser("~/.local/state/camera-manager"))
+
+logger = logging.getLogger("CameraManager")
+
+
+def state_path(file_name: str) -> str:
+    """Returns the path of a state file inside STATE_DIR."""
+    return os.path.join(STATE_DIR, file_name)
+
+
+def load_json(file_path: str, default: Any) -> Any:
+    """Loads a JSON state file, returns 'default' if it's missing or unreadable."""
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not load {file_path}, starting empty: {e}")
+        return default
+
+
+def save_json(file_path: str, data: Any) -> bool:
+    """Writes a compact JSON state file atomically, so a crash never leaves a half written file."""
+    tmp_path = f"{file_path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, file_path)
+        return True
+    except OSError as e:
+        logger.error(f"Could not save {file_path}: {e}")
+        return False
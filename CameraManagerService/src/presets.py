@@ -0,0 +1,43 @@
+import threading
+from typing import Any, Dict, Optional
+from . import persistence
+
+PRESETS_FILE = "presets.json"
+
+
+class PresetStore:
+    """
+    Named control presets per camera, e.g. a day and a night profile.
+    Presets are keyed by the stable camera ID, so they stay with the camera on the same USB port.
+    """
+    def __init__(self, file_path: Optional[str] = None):
+        self.file_path: str = file_path or persistence.state_path(PRESETS_FILE)
+        self._presets: Dict[str, Dict[str, Dict[str, Any]]] = persistence.load_json(self.file_path, {})
+        self._lock = threading.Lock()
+
+    def list(self, cam_id: str) -> Dict[str, Dict[str, Any]]:
+        """Returns the presets of a camera by name."""
+        with self._lock:
+            return dict(self._presets.get(cam_id, {}))
+
+    def get(self, cam_id: str, name: str) -> Optional[Dict[str, Any]]:
+        """Returns the control values of a preset, or None if it doesn't exist."""
+        with self._lock:
+            return self._presets.get(cam_id, {}).get(name)
+
+    def save(self, cam_id: str, name: str, controls: Dict[str, Any]):
+        """Creates or replaces a preset."""
+        with self._lock:
+            self._presets.setdefault(cam_id, {})[name] = dict(controls)
+            persistence.save_json(self.file_path, self._presets)
+
+    def delete(self, cam_id: str, name: str) -> Optional[Dict[str, Any]]:
+        """Removes a preset, returns its control values or None if it didn't exist."""
+        with self._lock:
+            camera_presets = self._presets.get(cam_id, {})
+            controls = camera_presets.pop(name, None)
+            if controls is not None:
+                if not camera_presets:
+                    del self._presets[cam_id]
+                persistence.save_json(self.file_path, self._presets)
+            return controls
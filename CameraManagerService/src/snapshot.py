@@ -0,0 +1,34 @@
+import json
+import hashlib
+from typing import Any, Iterable, NamedTuple
+
+
+class JsonSnapshot(NamedTuple):
+    """A pre-rendered JSON response body and its ETag."""
+    body: bytes
+    etag: str
+
+
+def render_json(data: Any) -> JsonSnapshot:
+    """Serializes 'data' once, so it can be served many times without re-encoding."""
+    body = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return JsonSnapshot(body, _etag(body))
+
+
+def join_json_array(snapshots: Iterable[JsonSnapshot]) -> JsonSnapshot:
+    """Builds a JSON array snapshot from already rendered elements."""
+    body = b"[" + b",".join(snapshot.body for snapshot in snapshots) + b"]"
+    return JsonSnapshot(body, _etag(body))
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Checks an If-None-Match header value against an ETag."""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
@@ -1,17 +1,43 @@
 import os
+import time
+import heapq
 import logging
-from typing import Dict, Any, List, Tuple
+import functools
+import contextlib
+from typing import Dict, Any, List, NamedTuple, Tuple, Optional, Union, Iterable
 from enum import IntFlag
+from linuxpy.ioctl import ioctl
+from linuxpy.video import raw
 from linuxpy.video.device import(
     Device,
     MenuControl, 
     IntegerControl,
     BooleanControl
 )
+from .capability_cache import CapabilityCache
+from .device_session import DeviceSession
+from .control_model import ControlMetadata, ControlValue, compose_controls
 
 V4L_BY_PATH = "/dev/v4l/by-path/"
 logger = logging.getLogger("V4L2Commands")
 
+# The device functions take a device path (opened and closed per call), a DeviceSession or an already open Device
+DeviceSource = Union[str, DeviceSession, Device]
+
+# Upper bound for the controls to settle during a reset, and how often their flags are polled meanwhile
+RESET_SETTLE_TIMEOUT = 0.5
+SETTLE_POLL_INTERVAL = 0.01
+
+# Auto/manual pairs of UVC cameras, writing the auto control can change the value and INACTIVE flag of the manual ones
+CONTROL_DEPENDENCIES: Dict[str, Tuple[str, ...]] = {
+    "auto_exposure": ("exposure_time_absolute", "exposure_dynamic_framerate", "gain", "iris_absolute"),
+    "exposure_dynamic_framerate": ("exposure_time_absolute",),
+    "white_balance_automatic": ("white_balance_temperature", "white_balance_red_component", "white_balance_blue_component"),
+    "white_balance_temperature_auto": ("white_balance_temperature",),
+    "focus_automatic_continuous": ("focus_absolute", "focus_relative"),
+    "hue_automatic": ("hue",),
+}
+
 def get_device_paths_and_names() -> Tuple[List[str], List[str]]:
     """Returns a list of camera device paths and a list of camera names."""
     device_paths: List[str] = []
@@ -20,155 +46,285 @@ def get_device_paths_and_names() -> Tuple[List[str], List[str]]:
         return [],[]
     
     # Device names are dependant on USB port!
-    device_names = [p for p in os.listdir(V4L_BY_PATH) if p.startswith('platform-xhci-hcd.') and 'video-index0' in p]
-    device_paths = sorted([os.path.join(V4L_BY_PATH, f) for f in device_names])
+    device_names = sorted(p for p in os.listdir(V4L_BY_PATH) if p.startswith('platform-xhci-hcd.') and 'video-index0' in p)
+    device_paths = [os.path.join(V4L_BY_PATH, f) for f in device_names]
     return device_paths, device_names
 
 
-def get_supported_formats(device_path: str) -> Dict[str, Dict[str, List[int]]]:
+def get_supported_formats(device: DeviceSource, cache: Optional[CapabilityCache] = None) -> Dict[str, Dict[str, List[int]]]:
     """
     Returns a structured dictionary of all supported pixel formats, their available resolutions,
     and the unique frame rates for each resolution.
+    With a cache the frame sizes are only enumerated the first time a device is seen.
     """
+    with _open(device) as cam:
+        if cache is None:
+            return _read_supported_formats(cam)
+        
+        device_name = os.path.basename(_device_path(device))
+        identity = get_device_identity(cam)
+        formats_data = cache.get(device_name, identity)
+        if formats_data is None:
+            formats_data = _read_supported_formats(cam)
+            cache.put(device_name, identity, formats_data)
+        return formats_data
+
+
+def get_device_identity(cam: Device) -> List[str]:
+    """Returns the driver, card and bus info of an open device."""
+    return [cam.info.driver, cam.info.card, cam.info.bus_info]
+
+
+def _read_supported_formats(cam: Device) -> Dict[str, Dict[str, List[int]]]:
+    """Enumerates every frame size and interval of an open device."""
     formats_data = {}
-    with Device(device_path) as cam:
-        for frame_info in cam.info.frame_sizes:
-            format_name = frame_info.pixel_format.name
-            resolution_key = f"{frame_info.width}x{frame_info.height}"
-            fps = int(frame_info.max_fps)
-
-            # If we haven't seen this format before, add it
-            if format_name not in formats_data:
-                formats_data[format_name] = {}
-            
-            # If we haven't seen this resolution for this format, add it
-            if resolution_key not in formats_data[format_name]:
-                formats_data[format_name][resolution_key] = []
-
-            # Add the FPS to the list only if it's not already there
-            if fps not in formats_data[format_name][resolution_key]:
-                formats_data[format_name][resolution_key].append(fps)
-                formats_data[format_name][resolution_key].sort(reverse=True)
+    for frame_info in cam.info.frame_sizes:
+        format_name = frame_info.pixel_format.name
+        resolution_key = f"{frame_info.width}x{frame_info.height}"
+        fps = int(frame_info.max_fps)
+
+        # If we haven't seen this format before, add it
+        if format_name not in formats_data:
+            formats_data[format_name] = {}
+        
+        # If we haven't seen this resolution for this format, add it
+        if resolution_key not in formats_data[format_name]:
+            formats_data[format_name][resolution_key] = []
+
+        # Add the FPS to the list only if it's not already there
+        if fps not in formats_data[format_name][resolution_key]:
+            formats_data[format_name][resolution_key].append(fps)
+            formats_data[format_name][resolution_key].sort(reverse=True)
                 
     return formats_data
 
 
-def get_controls(device_path: str) -> Dict[str, Any]:
+def get_controls(device: DeviceSource) -> Dict[str, Any]:
     """Reads all camera controls and returns them as a dictionary."""
-    control_dict = {}
-    with Device(device_path) as cam:
-        for control in cam.controls.values():
-            # Create a dictionary for the current control's properties
-            current_control = {
-                "value": control.value,
-                "default": control.default,
-                "type": control.__class__.__name__,
-                "flags": _get_flag_names(control.flags)
-            }
-            
-            if isinstance(control, IntegerControl):
-                current_control['min'] = control.minimum
-                current_control['max'] = control.maximum
-                current_control['step'] = control.step
-                
-            elif isinstance(control, MenuControl):
-                menu_options = {}
-                for index, option_name in control.items():
-                    menu_options[index] = option_name
-                current_control['menu'] = menu_options
+    with _open(device) as cam:
+        return compose_controls(read_control_metadata(cam), read_control_values(cam))
 
-            snake_case_name = control.name.lower().replace(' ', '_').replace(',', '')
-            control_dict[snake_case_name] = current_control
-    return control_dict
 
+def read_control_metadata(device: DeviceSource) -> Dict[str, ControlMetadata]:
+    """Reads the static properties (type, default, range, menu) of every control, only needed once per device."""
+    metadata = {}
+    with _open(device) as cam:
+        for control in cam.controls.values():
+            metadata[_snake_case(control.name)] = _read_metadata(control)
+    return metadata
 
-def set_control(device_path: str, control_name: str, value: Any) -> bool:
-    """Set a specific control value of the camera device."""
-    with Device(device_path) as cam:
-        try:
-            control = cam.controls[control_name]
-            
-            if V4L2ControlFlags.INACTIVE in V4L2ControlFlags(control.flags):
-                logger.warning(f"{control.name} couldn't be set because it has inactive flag")
-            elif isinstance(control, (MenuControl, BooleanControl)) or (control.minimum <= value <= control.maximum):
-                control.value = value
-                return True
-            else:
-                logger.error(f"{control_name} can not be set to {value}, range: {control.minimum}...{control.maximum}")
-            
-            return False
-            
-        except KeyError:
-            logger.error(f"Control '{control_name}' not found.")
-            return False
-        except Exception as e:
-            logger.error(f"{control_name} could not be set to {value}: {e}")
-            return False
-
-def default_all_controls(device_path: str) -> List[str]:
-    """Sets all controls to default values, handling control dependencies"""
-    failed_to_set : List[str] = []
-    with Device(device_path) as cam:
+
+def read_control_values(device: DeviceSource, control_names: Optional[Iterable[str]] = None) -> Dict[str, ControlValue]:
+    """Reads the current value and flags of the given controls, or of every control."""
+    if control_names is not None:
+        control_names = set(control_names)
+    values = {}
+    with _open(device) as cam:
         for control in cam.controls.values():
-            try:
-                # Skip these since default auto values
-                if control.name == "Exposure Time, Absolute" or control.name == "White Balance Temperature":
-                    continue
-                else:
-                    control.set_to_default()
-            except Exception as err:
-                logger.error(f"{control.name} didn't default: {str(err)}")
-                failed_to_set.append(control.name)
-    return failed_to_set
+            control_name = _snake_case(control.name)
+            if control_names is None or control_name in control_names:
+                values[control_name] = _read_value(cam, control)
+    return values
 
 
-""" def default_all_controls(device_path: str) -> List[str]:
-    failed_to_set: List[str] = []
+def refresh_controls(device: DeviceSource, written: Iterable[str], values: Dict[str, ControlValue]) -> Dict[str, ControlValue]:
+    """
+    Returns a copy of 'values' where only the controls that could have changed after writing 'written' are re-read:
+    the written controls, their dependents in CONTROL_DEPENDENCIES and every control flagged volatile.
+    Falls back to a full read when a written control has the update flag but no known dependents.
+    """
+    to_read = set()
+    for control_name in written:
+        to_read.add(control_name)
+        dependents = CONTROL_DEPENDENCIES.get(control_name)
+        if dependents is not None:
+            to_read.update(dependents)
+        elif control_name in values and "update" in values[control_name].flags:
+            return read_control_values(device)
     
-    with Device(device_path) as cam:
-        auto_controls = []
-        manual_controls = []
-        
-        for control in cam.controls.values():
-            if any(keyword in control.name.lower() for keyword in 
-                   ['auto', 'automatic']):
-                auto_controls.append(control)
-                logger.info(f"Auto controls: {auto_controls}")
-            else:
-                manual_controls.append(control)
+    for control_name, state in values.items():
+        if "volatile" in state.flags:
+            to_read.add(control_name)
+    
+    refreshed = dict(values)
+    refreshed.update(read_control_values(device, to_read))
+    return refreshed
+
+
+def _read_metadata(control) -> ControlMetadata:
+    """Reads the static properties of one control."""
+    control_type = control.__class__.__name__
+    if isinstance(control, IntegerControl):
+        return ControlMetadata(control.name, control_type, control.default,
+                               minimum=control.minimum, maximum=control.maximum, step=control.step)
+    
+    elif isinstance(control, MenuControl):
+        menu_options = {}
+        for index, option_name in control.items():
+            menu_options[index] = option_name
+        return ControlMetadata(control.name, control_type, control.default, menu=menu_options)
+    
+    return ControlMetadata(control.name, control_type, control.default)
+
+
+def _read_value(cam: Device, control) -> ControlValue:
+    """Reads the current value and flags of one control."""
+    return ControlValue(control.value, decode_flags(_query_flags(cam, control)).names)
+
+
+def set_control(device: DeviceSource, control_name: str, value: Any) -> bool:
+    """Set a specific control value of the camera device."""
+    with _open(device) as cam:
+        return _set_control(cam, control_name, value)
+
+
+def set_controls(device: DeviceSource, controls: Dict[str, Any]) -> Dict[str, bool]:
+    """
+    Sets several controls with a single device open, returns whether each control was set.
+    Auto controls are written before the controls they affect, so a manual value isn't rejected as inactive.
+    """
+    with _open(device) as cam:
+        return {control_name: _set_control(cam, control_name, controls[control_name])
+                for control_name in _dependency_order(tuple(controls))}
+
+
+def _set_control(cam: Device, control_name: str, value: Any) -> bool:
+    try:
+        control = cam.controls[control_name]
         
-        # Reset automatic controls first
-        for control in auto_controls:
-            try:
-                if V4L2ControlFlags.INACTIVE in V4L2ControlFlags(control.flags):
-                    logger.warning(f"{control.name} didn't change due to inactive flag")
-                    continue
-                control.set_to_default()
-                logger.info(f"Reset automatic control: {control.name}")
-            except Exception as err:
-                logger.error(f"{control.name} didn't default: {str(err)}")
-                failed_to_set.append(control.name)
+        if decode_flags(_query_flags(cam, control)).inactive:
+            logger.warning(f"{control.name} couldn't be set because it has inactive flag")
+        elif isinstance(control, (MenuControl, BooleanControl)) or (control.minimum <= value <= control.maximum):
+            control.value = value
+            return True
+        else:
+            logger.error(f"{control_name} can not be set to {value}, range: {control.minimum}...{control.maximum}")
         
-        import time
-        time.sleep(0.5)
+        return False
         
-        # Reset manual controls
-        for control in manual_controls:
+    except KeyError:
+        logger.error(f"Control '{control_name}' not found.")
+        return False
+    except Exception as e:
+        logger.error(f"{control_name} could not be set to {value}: {e}")
+        return False
+
+def reset_controls(device: DeviceSource, metadata: Dict[str, ControlMetadata], values: Dict[str, ControlValue],
+                   settle_timeout: float = RESET_SETTLE_TIMEOUT) -> Tuple[List[str], List[str]]:
+    """
+    Sets every control that differs from its default back to the default, returns the failed and the written controls.
+    Auto controls are written before the controls they affect, which are then re-read once their flags settled.
+    Controls left inactive by their auto control are skipped, they are driven by the camera.
+    """
+    failed_to_set : List[str] = []
+    written : List[str] = []
+    deadline = time.monotonic() + settle_timeout
+    with _open(device) as cam:
+        controls = {_snake_case(control.name): control for control in cam.controls.values()}
+        current = dict(values)
+        for control_name in _dependency_order(tuple(controls)):
+            control = controls[control_name]
+            control_metadata = metadata.get(control_name)
+            state = current.get(control_name)
+            if control_metadata is None or (state is not None and state.value == control_metadata.default):
+                continue
+            
+            if not decode_flags(_query_flags(cam, control)).writable:
+                continue
             try:
-                if V4L2ControlFlags.INACTIVE in V4L2ControlFlags(control.flags):
-                    logger.warning(f"{control.name} didn't change due to inactive flag")
-                    continue
-                control.set_to_default()
-                logger.info(f"Reset manual control: {control.name}")
+                control.value = control_metadata.default
+                written.append(control_name)
             except Exception as err:
                 logger.error(f"{control.name} didn't default: {str(err)}")
-                failed_to_set.append(control.name)
+                failed_to_set.append(control_name)
+                continue
+            
+            dependents = [controls[name] for name in CONTROL_DEPENDENCIES.get(control_name, ()) if name in controls]
+            if dependents:
+                current.update(_wait_for_settle(cam, dependents, deadline))
+    return failed_to_set, written
+
+
+@functools.lru_cache(maxsize=64)
+def _dependency_order(control_names: Tuple[str, ...]) -> Tuple[str, ...]:
+    """
+    Orders the controls so every auto control comes before the controls it affects, auto controls first.
+    The result is cached, so it's a tuple callers can't change.
+    """
+    present = set(control_names)
+    blockers = {name: 0 for name in control_names}
+    for auto_control, dependents in CONTROL_DEPENDENCIES.items():
+        if auto_control in present:
+            for dependent in dependents:
+                if dependent in present:
+                    blockers[dependent] += 1
     
-    return failed_to_set """
+    priority = {name: (name not in CONTROL_DEPENDENCIES, index) for index, name in enumerate(control_names)}
+    ready = [priority[name] + (name,) for name in control_names if blockers[name] == 0]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        *_, name = heapq.heappop(ready)
+        order.append(name)
+        for dependent in CONTROL_DEPENDENCIES.get(name, ()):
+            if dependent in present:
+                blockers[dependent] -= 1
+                if blockers[dependent] == 0:
+                    heapq.heappush(ready, priority[dependent] + (dependent,))
+    return tuple(order)
+
+
+def _wait_for_settle(cam: Device, controls: List, deadline: float) -> Dict[str, ControlValue]:
+    """
+    Polls the flags of the controls until two reads agree or the deadline passed, then reads their values.
+    The camera may need a moment to hand the controls over after an auto control was written.
+    """
+    previous = None
+    while True:
+        flags = [_query_flags(cam, control) for control in controls]
+        if flags == previous or time.monotonic() >= deadline:
+            break
+        previous = flags
+        time.sleep(SETTLE_POLL_INTERVAL)
+    return {_snake_case(control.name): ControlValue(control.value, decode_flags(control_flags).names)
+            for control, control_flags in zip(controls, flags)}
     
     
 # ---------- Helper Functions ---------------------
 
+def _open(device: DeviceSource):
+    """Returns a context manager that yields an open Device, reusing the session's or caller's descriptor if possible."""
+    if isinstance(device, DeviceSession):
+        return device
+    if isinstance(device, str):
+        return Device(device)
+    return contextlib.nullcontext(device)
+
+
+def _device_path(device: DeviceSource) -> str:
+    if isinstance(device, DeviceSession):
+        return device.device_path
+    if isinstance(device, str):
+        return device
+    return str(device.filename)
+
+
+def _snake_case(control_name: str) -> str:
+    return control_name.lower().replace(' ', '_').replace(',', '')
+
+
+def _query_flags(cam: Device, control) -> int:
+    """
+    Re-queries the current flags of a control.
+    linuxpy only reads them when the controls are enumerated, but a session keeps the device open
+    while flags like INACTIVE change at runtime (e.g. after toggling an auto control).
+    """
+    query = raw.v4l2_query_ext_ctrl(id=control.id)
+    ioctl(cam, raw.IOC.QUERY_EXT_CTRL, query)
+    control.flags = raw.ControlFlag(query.flags)
+    return query.flags
+
+
 class V4L2ControlFlags(IntFlag):
     """These values are from the official Linux V4L2 API (videodev2.h: https://gist.github.com/JulesThuillier/bc7d1a852a7dd070af2072d946e20eed)"""
     DISABLED = 0x0001
@@ -181,13 +337,36 @@ class V4L2ControlFlags(IntFlag):
     VOLATILE = 0x0080
 
 
-def _get_flag_names(flag_value: int) -> List[str]:
-    """Convert the int flag value to human readable strings."""
-    active_flags = []
-    if not flag_value:
-        return []
+class DecodedFlags(NamedTuple):
+    """The names of the set V4L2ControlFlags and the flags the control functions check."""
+    names: Tuple[str, ...]
+    disabled: bool
+    read_only: bool
+    update: bool
+    inactive: bool
+    volatile: bool
+    writable: bool
+
+
+def _decode_flags(flag_value: int) -> DecodedFlags:
+    """Decodes a flag value with the enum, only used to build _FLAG_TABLE."""
+    flags = V4L2ControlFlags(flag_value)
+    names = tuple(flag.name.lower() for flag in V4L2ControlFlags if flag in flags)
+    return DecodedFlags(
+        names=names,
+        disabled=V4L2ControlFlags.DISABLED in flags,
+        read_only=V4L2ControlFlags.READ_ONLY in flags,
+        update=V4L2ControlFlags.UPDATE in flags,
+        inactive=V4L2ControlFlags.INACTIVE in flags,
+        volatile=V4L2ControlFlags.VOLATILE in flags,
+        writable=not flags & (V4L2ControlFlags.DISABLED | V4L2ControlFlags.READ_ONLY | V4L2ControlFlags.INACTIVE),
+    )
+
+
+# Every combination of the 8 flags decoded once, the higher bits (e.g. HAS_PAYLOAD) aren't reported
+_FLAG_TABLE: Tuple[DecodedFlags, ...] = tuple(_decode_flags(flag_value) for flag_value in range(0x100))
+
 
-    for flag in V4L2ControlFlags:
-        if flag in V4L2ControlFlags(flag_value):
-            active_flags.append(flag.name.lower())
-    return active_flags
\ No newline at end of file
+def decode_flags(flag_value: int) -> DecodedFlags:
+    """Returns the decoded flags of a control from the precomputed table."""
+    return _FLAG_TABLE[flag_value & 0xFF]
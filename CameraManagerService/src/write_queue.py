@@ -0,0 +1,85 @@
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger("Camera")
+
+# Minimum time between two batches written to the same camera
+WRITE_INTERVAL = 0.05
+
+
+class _Waiter:
+    """A caller of submit() waiting for its controls to be applied."""
+    __slots__ = ("future", "names", "remaining", "failed")
+
+    def __init__(self, future: asyncio.Future, names: Set[str]):
+        self.future = future
+        self.names = names
+        self.remaining = set(names)
+        self.failed: List[str] = []
+
+
+class WriteQueue:
+    """
+    Coalesces the control writes of one camera, e.g. while a slider in the client is dragged.
+    Pending writes to the same control keep only the latest value and are applied in batches, at most one
+    batch every 'interval' seconds. Callers return once their value, or a newer one, was applied.
+    """
+    def __init__(self, camera, interval: float = WRITE_INTERVAL):
+        self.camera = camera
+        self.interval: float = interval
+        self._pending: Dict[str, Any] = {}
+        self._waiters: Dict[str, List[_Waiter]] = {}
+        self._worker: Optional[asyncio.Task] = None
+        self._last_write: float = float("-inf")
+
+    async def submit(self, controls: Dict[str, Any]) -> List[str]:
+        """Queues the new control values, returns the names of the controls that couldn't be set."""
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), set(controls))
+        self._pending.update(controls)
+        for name in controls:
+            self._waiters.setdefault(name, []).append(waiter)
+
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._run())
+        return await waiter.future
+
+    async def _run(self):
+        while self._pending:
+            delay = self._last_write + self.interval - time.monotonic()
+            if delay > 0:
+                # Values submitted in the meantime are written with this batch
+                await asyncio.sleep(delay)
+
+            batch, self._pending = self._pending, {}
+            waiters = {id(w): w for name in batch for w in self._waiters.pop(name, [])}
+            try:
+                failed = await self.camera.executor.run(self.camera.update_controls, batch)
+            except asyncio.CancelledError:
+                # Closing the camera cancels the batches still queued on its executor
+                error = RuntimeError(f"Camera {self.camera.id} was closed")
+                logger.error(f"Failed to write {list(batch)} to camera {self.camera.id}: {error}")
+                _fail(list(waiters.values()) + [w for queued in self._waiters.values() for w in queued], error)
+                self._pending, self._waiters = {}, {}
+                if asyncio.current_task().cancelling():
+                    raise
+                return
+            except Exception as e:
+                logger.error(f"Failed to write {list(batch)} to camera {self.camera.id}: {e}")
+                _fail(waiters.values(), e)
+                continue
+            finally:
+                self._last_write = time.monotonic()
+
+            for waiter in waiters.values():
+                waiter.remaining.difference_update(batch)
+                waiter.failed.extend(name for name in failed if name in waiter.names)
+                if not waiter.remaining and not waiter.future.done():
+                    waiter.future.set_result(waiter.failed)
+
+
+def _fail(waiters, error: BaseException):
+    for waiter in waiters:
+        if not waiter.future.done():
+            waiter.future.set_exception(error)
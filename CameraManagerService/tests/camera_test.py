@@ -1,30 +1,44 @@
+import asyncio
+import json
 import pytest
 from unittest.mock import patch
 from src.camera import Camera
+from src.control_model import ControlMetadata, ControlValue
 
 
 @pytest.fixture
 def mock_v4l2():
-    with patch("src.camera.get_controls") as mock_get_controls, \
+    with patch("src.camera.read_control_metadata") as mock_read_metadata, \
+         patch("src.camera.read_control_values") as mock_read_values, \
          patch("src.camera.get_supported_formats") as mock_get_supported_formats, \
-         patch("src.camera.set_control") as mock_set_control, \
-         patch("src.camera.default_all_controls") as mock_default_all_controls:
+         patch("src.camera.set_controls") as mock_set_controls, \
+         patch("src.camera.refresh_controls") as mock_refresh_controls, \
+         patch("src.camera.DeviceSession") as mock_session, \
+         patch("src.camera.reset_controls") as mock_reset_controls:
         
-        mock_get_controls.return_value = {
-            "brightness": {"value": 5, "type": "IntegerControl"},
-            "contrast": {"value": 10, "type": "IntegerControl"}
+        mock_read_metadata.return_value = {
+            "brightness": ControlMetadata("Brightness", "IntegerControl", 0, minimum=-64, maximum=64, step=1),
+            "contrast": ControlMetadata("Contrast", "IntegerControl", 32, minimum=0, maximum=64, step=1)
+        }
+        mock_read_values.return_value = {
+            "brightness": ControlValue(5, ()),
+            "contrast": ControlValue(10, ())
         }
         mock_get_supported_formats.return_value = {
             "MJPEG": {"640x480": [30]}
         }
-        mock_set_control.return_value = True
-        mock_default_all_controls.return_value = []
+        mock_refresh_controls.side_effect = lambda session, written, controls: dict(controls)
+        mock_set_controls.side_effect = lambda session, controls: {name: True for name in controls}
+        mock_reset_controls.return_value = ([], [])
 
         yield {
-            "get_controls": mock_get_controls,
+            "read_control_metadata": mock_read_metadata,
+            "read_control_values": mock_read_values,
             "get_supported_formats": mock_get_supported_formats,
-            "set_control": mock_set_control,
-            "default_all_controls": mock_default_all_controls
+            "set_controls": mock_set_controls,
+            "refresh_controls": mock_refresh_controls,
+            "session": mock_session,
+            "reset_controls": mock_reset_controls
         }
 
 
@@ -54,13 +68,103 @@ def test_update_controls_success(mock_v4l2):
     failed = cam.update_controls({"brightness": 7, "contrast": 8})
 
     assert failed == []
-    assert mock_v4l2["set_control"].call_count == 2
+    # All controls are written in a single batch through the camera's session
+    mock_v4l2["set_controls"].assert_called_once_with(cam.session, {"brightness": 7, "contrast": 8})
+    # Only the written controls are read back instead of every control
+    assert list(mock_v4l2["refresh_controls"].call_args.args[1]) == ["brightness", "contrast"]
+    mock_v4l2["read_control_values"].assert_called_once()
+    mock_v4l2["read_control_metadata"].assert_called_once()
 
 def test_update_controls_partial_failure(mock_v4l2):
-    mock_v4l2["set_control"].side_effect = [True, False]
+    mock_v4l2["set_controls"].side_effect = None
+    mock_v4l2["set_controls"].return_value = {"brightness": True, "contrast": False}
 
     cam = Camera("cam1", "/dev/video0", "platform-xhci-hcd.1-usb")
     failed = cam.update_controls({"brightness": 5, "contrast": 3})
 
     assert failed == ["contrast"]
-    assert mock_v4l2["set_control"].call_count == 2
\ No newline at end of file
+    assert mock_v4l2["set_controls"].call_count == 1
+
+
+def test_close_releases_session(mock_v4l2):
+    cam = Camera("cam1", "/dev/video0", "platform-xhci-hcd.1-usb")
+    cam.close()
+    cam.session.close.assert_called_once()
+
+
+def test_controls_composed_from_metadata_and_values(mock_v4l2):
+    cam = Camera("cam1", "/dev/video0", "platform-xhci-hcd.1-usb")
+    assert cam.controls["brightness"] == {
+        "value": 5, "default": 0, "type": "IntegerControl", "flags": (), "min": -64, "max": 64, "step": 1
+    }
+    assert cam.controls is cam.controls
+
+    mock_v4l2["refresh_controls"].side_effect = \
+        lambda session, written, values: {**values, "brightness": ControlValue(7, ())}
+    cam.update_controls({"brightness": 7})
+    assert cam.controls["brightness"]["value"] == 7
+    assert cam.controls["contrast"]["value"] == 10
+
+
+def test_snapshot_cached_until_values_change(mock_v4l2):
+    cam = Camera("cam1", "/dev/video0", "platform-xhci-hcd.1-usb")
+    snapshot = cam.get_snapshot()
+    assert cam.get_snapshot() is snapshot
+    assert json.loads(snapshot.body)["controls"]["brightness"]["value"] == 5
+
+    mock_v4l2["refresh_controls"].side_effect = \
+        lambda session, written, values: {**values, "brightness": ControlValue(7, ())}
+    cam.update_controls({"brightness": 7})
+    new_snapshot = cam.get_snapshot()
+    assert new_snapshot.etag != snapshot.etag
+    assert json.loads(new_snapshot.body)["controls"]["brightness"]["value"] == 7
+
+
+def test_read_controls_refreshes_values(mock_v4l2):
+    cam = Camera("cam1", "/dev/video0", "platform-xhci-hcd.1-usb")
+    snapshot = cam.get_snapshot()
+
+    mock_v4l2["read_control_values"].return_value = {
+        **mock_v4l2["read_control_values"].return_value, "brightness": ControlValue(9, ())
+    }
+    controls = cam.read_controls()
+    assert controls["brightness"]["value"] == 9
+    assert cam.get_snapshot() is not snapshot
+
+
+def test_close_shuts_down_executor(mock_v4l2):
+    cam = Camera("cam1", "/dev/video0", "platform-xhci-hcd.1-usb")
+    cam.close()
+    with pytest.raises(RuntimeError):
+        asyncio.run(cam.executor.run(lambda: None))
+
+
+def test_reset_refreshes_written_controls(mock_v4l2):
+    mock_v4l2["reset_controls"].return_value = (["contrast"], ["brightness"])
+    cam = Camera("cam1", "/dev/video0", "platform-xhci-hcd.1-usb")
+
+    failed = cam.reset_all_controls()
+
+    assert failed == ["contrast"]
+    mock_v4l2["reset_controls"].assert_called_once_with(cam.session, cam.control_metadata, cam.control_values)
+    assert mock_v4l2["refresh_controls"].call_args.args[1] == ["brightness"]
+    mock_v4l2["read_control_values"].assert_called_once()
+
+
+def test_apply_controls_writes_only_differences(mock_v4l2):
+    cam = Camera("cam1", "/dev/video0", "platform-xhci-hcd.1-usb")
+
+    assert cam.apply_controls({"brightness": 5, "contrast": 12}) == []
+    mock_v4l2["set_controls"].assert_called_once_with(cam.session, {"contrast": 12})
+
+    mock_v4l2["set_controls"].reset_mock()
+    assert cam.apply_controls({"brightness": 5, "contrast": 10}) == []
+    mock_v4l2["set_controls"].assert_not_called()
+
+
+def test_get_control_values_skips_inactive(mock_v4l2):
+    mock_v4l2["read_control_values"].return_value = {
+        **mock_v4l2["read_control_values"].return_value, "contrast": ControlValue(10, ("inactive",))
+    }
+    cam = Camera("cam1", "/dev/video0", "platform-xhci-hcd.1-usb")
+    assert cam.get_control_values() == {"brightness": 5}
@@ -0,0 +1,22 @@
+from src.capability_cache import CapabilityCache
+
+IDENTITY = ["uvcvideo", "3D USB Camera: 3D USB Camera", "usb-xhci-hcd.1-1.1"]
+FORMATS = {"MJPEG": {"3840x1080": [60, 30]}, "YUYV": {"1280x480": [10, 5]}}
+
+
+def test_cache_miss_on_unknown_device(tmp_path):
+    cache = CapabilityCache(str(tmp_path / "caps.json"))
+    assert cache.get("usb-0:1.1", IDENTITY) is None
+
+
+def test_cache_persists_across_instances(tmp_path):
+    file_path = str(tmp_path / "caps.json")
+    CapabilityCache(file_path).put("usb-0:1.1", IDENTITY, FORMATS)
+    assert CapabilityCache(file_path).get("usb-0:1.1", IDENTITY) == FORMATS
+
+
+def test_cache_invalidated_by_identity_change(tmp_path):
+    cache = CapabilityCache(str(tmp_path / "caps.json"))
+    cache.put("usb-0:1.1", IDENTITY, FORMATS)
+    other_camera = ["uvcvideo", "HD USB Camera", "usb-xhci-hcd.1-1.1"]
+    assert cache.get("usb-0:1.1", other_camera) is None
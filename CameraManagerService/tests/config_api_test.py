@@ -1,7 +1,12 @@
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import MagicMock, patch
-from src.config_api import app, get_camera_manager
+from src.config_api import app, get_camera_manager, get_preset_store
+from src.snapshot import render_json
+from src.device_executor import DeviceExecutor
+from src.write_queue import WriteQueue
+from src.presets import PresetStore
+from src.format_index import FormatIndex
 
 @pytest.fixture
 def mock_camera_manager():
@@ -9,19 +14,35 @@ def mock_camera_manager():
     mock_camera = MagicMock()
     mock_camera.id = "cam1"
     mock_camera.get_data.return_value = {"id": "cam1", "controls": {}, "formats": {}}
+    mock_camera.get_snapshot.return_value = render_json(mock_camera.get_data.return_value)
     mock_camera.reset_all_controls.return_value = []
     mock_camera.update_controls.return_value = []
+    mock_camera.read_controls.return_value = {"brightness": {"value": 5}}
+    mock_camera.executor = DeviceExecutor("cam1")
+    mock_camera.write_queue = WriteQueue(mock_camera, interval=0)
+    mock_camera.control_metadata = {"brightness": MagicMock(), "contrast": MagicMock()}
+    mock_camera.get_control_values.return_value = {"brightness": 5, "contrast": 32}
+    mock_camera.apply_controls.return_value = []
+    mock_camera.format_index = FormatIndex({"MJPEG": {"3840x1080": [30, 15], "1280x480": [60, 30]}})
+    mock_camera.controls = {"brightness": {"value": 5}}
 
     mock_manager = MagicMock()
     mock_manager.get_all_cameras.return_value = [mock_camera.get_data.return_value]
+    mock_manager.get_all_cameras_snapshot.return_value = render_json(mock_manager.get_all_cameras.return_value)
     mock_manager.get_camera_by_id.return_value = mock_camera
 
     return mock_manager
 
 
 @pytest.fixture
-def test_client(mock_camera_manager):
+def preset_store(tmp_path):
+    return PresetStore(str(tmp_path / "presets.json"))
+
+
+@pytest.fixture
+def test_client(mock_camera_manager, preset_store):
     app.dependency_overrides[get_camera_manager] = lambda: mock_camera_manager
+    app.dependency_overrides[get_preset_store] = lambda: preset_store
     yield TestClient(app)
     app.dependency_overrides.clear()
 
@@ -85,4 +106,131 @@ def test_update_camera_controls_failure(test_client, mock_camera_manager):
 def test_update_camera_controls_empty(test_client):
     response = test_client.patch("/cam1/controls", json={"controls": {}})
     assert response.status_code == 400
-    assert "No controls specified" in response.json()["detail"]
\ No newline at end of file
+    assert "No controls specified" in response.json()["detail"]
+
+
+def test_rescan_cameras(test_client, mock_camera_manager):
+    response = test_client.post("/rescan")
+    assert response.status_code == 200
+    mock_camera_manager.discover_cameras.assert_called_once()
+    assert response.json()[0]["id"] == "cam1"
+
+
+def test_rescan_ignores_if_none_match(test_client, mock_camera_manager):
+    etag = test_client.get("/").headers["etag"]
+    response = test_client.post("/rescan", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["id"] == "cam1"
+
+
+def test_lifespan_creates_single_manager():
+    with patch("src.config_api.CameraManager") as mock_manager_class:
+        mock_manager_class.return_value.get_all_cameras_snapshot.return_value = render_json([])
+        with TestClient(app) as client:
+            client.get("/")
+            client.get("/")
+        mock_manager_class.assert_called_once()
+
+
+def test_list_cameras_etag(test_client, mock_camera_manager):
+    response = test_client.get("/")
+    etag = response.headers["etag"]
+    assert etag == mock_camera_manager.get_all_cameras_snapshot.return_value.etag
+
+    response = test_client.get("/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+def test_get_camera_data_etag_changed(test_client, mock_camera_manager):
+    mock_camera = mock_camera_manager.get_camera_by_id.return_value
+    etag = test_client.get("/cam1").headers["etag"]
+
+    mock_camera.get_snapshot.return_value = render_json({"id": "cam1", "controls": {"brightness": {}}, "formats": {}})
+    response = test_client.get("/cam1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert "brightness" in response.json()["controls"]
+
+
+def test_discovery_errors(test_client, mock_camera_manager):
+    mock_camera_manager.discovery_errors = {"cam2": "Timed out after 10.0s"}
+    response = test_client.get("/discovery/errors")
+    assert response.status_code == 200
+    assert response.json() == {"cam2": "Timed out after 10.0s"}
+
+
+def test_read_camera_controls(test_client, mock_camera_manager):
+    mock_camera = mock_camera_manager.get_camera_by_id.return_value
+    response = test_client.get("/cam1/controls")
+    assert response.status_code == 200
+    assert response.json() == {"cam_id": "cam1", "controls": {"brightness": {"value": 5}}}
+    mock_camera.read_controls.assert_called_once()
+
+
+def test_read_camera_controls_not_found(test_client, mock_camera_manager):
+    mock_camera_manager.get_camera_by_id.return_value = None
+    response = test_client.get("/cam9/controls")
+    assert response.status_code == 404
+
+
+def test_save_preset_with_current_values(test_client, preset_store):
+    response = test_client.put("/cam1/presets/day", json={})
+    assert response.status_code == 200
+    assert response.json() == {"name": "day", "controls": {"brightness": 5, "contrast": 32}}
+    assert preset_store.get("cam1", "day") == {"brightness": 5, "contrast": 32}
+
+
+def test_save_preset_unknown_control(test_client, preset_store):
+    response = test_client.put("/cam1/presets/night", json={"controls": {"zoom": 3}})
+    assert response.status_code == 400
+    assert preset_store.get("cam1", "night") is None
+
+
+def test_list_and_delete_presets(test_client, preset_store):
+    preset_store.save("cam1", "night", {"brightness": 40})
+    assert test_client.get("/cam1/presets").json() == {"night": {"brightness": 40}}
+
+    response = test_client.delete("/cam1/presets/night")
+    assert response.status_code == 200
+    assert response.json() == {"name": "night", "controls": {"brightness": 40}}
+    assert test_client.get("/cam1/presets").json() == {}
+    assert test_client.delete("/cam1/presets/night").status_code == 404
+
+
+def test_apply_preset(test_client, mock_camera_manager, preset_store):
+    mock_camera = mock_camera_manager.get_camera_by_id.return_value
+    preset_store.save("cam1", "night", {"brightness": 40, "contrast": 10})
+
+    response = test_client.post("/cam1/presets/night/apply")
+    assert response.status_code == 200
+    assert response.json()["cam_id"] == "cam1"
+    mock_camera.apply_controls.assert_called_once_with({"brightness": 40, "contrast": 10})
+
+
+def test_apply_preset_failure(test_client, mock_camera_manager, preset_store):
+    mock_camera_manager.get_camera_by_id.return_value.apply_controls.return_value = ["contrast"]
+    preset_store.save("cam1", "night", {"brightness": 40, "contrast": 10})
+    assert test_client.post("/cam1/presets/night/apply").status_code == 500
+
+
+def test_apply_preset_not_found(test_client):
+    assert test_client.post("/cam1/presets/missing/apply").status_code == 404
+
+
+def test_list_modes(test_client):
+    response = test_client.get("/cam1/modes", params={"pixel_format": "mjpeg"})
+    assert response.status_code == 200
+    assert response.json()[0] == {"pixel_format": "MJPEG", "width": 3840, "height": 1080, "fps": 30}
+    assert len(response.json()) == 4
+
+
+def test_best_mode(test_client):
+    response = test_client.get("/cam1/modes/best", params={"pixel_format": "MJPEG", "min_fps": 30, "max_width": 2000})
+    assert response.status_code == 200
+    assert response.json() == {"pixel_format": "MJPEG", "width": 1280, "height": 480, "fps": 60}
+
+
+def test_best_mode_no_match(test_client):
+    response = test_client.get("/cam1/modes/best", params={"min_fps": 120})
+    assert response.status_code == 404
@@ -0,0 +1,29 @@
+import pytest
+from src.control_model import ControlMetadata, ControlValue, compose_controls
+
+
+def test_metadata_is_immutable():
+    metadata = ControlMetadata("Brightness", "IntegerControl", 0, minimum=-64, maximum=64, step=1)
+    with pytest.raises(AttributeError):
+        metadata.default = 5
+    assert not hasattr(metadata, "__dict__")
+
+
+def test_compose_integer_and_menu():
+    metadata = {
+        "brightness": ControlMetadata("Brightness", "IntegerControl", 0, minimum=-64, maximum=64, step=1),
+        "power_line_frequency": ControlMetadata("Power Line Frequency", "MenuControl", 1, menu={0: "Disabled", 1: "50 Hz"}),
+        "white_balance_automatic": ControlMetadata("White Balance, Automatic", "BooleanControl", True),
+    }
+    values = {
+        "brightness": ControlValue(10, ("slider",)),
+        "power_line_frequency": ControlValue(0, ()),
+        "white_balance_automatic": ControlValue(False, ()),
+    }
+
+    controls = compose_controls(metadata, values)
+
+    assert controls["brightness"] == {"value": 10, "default": 0, "type": "IntegerControl", "flags": ("slider",),
+                                      "min": -64, "max": 64, "step": 1}
+    assert controls["power_line_frequency"]["menu"] == {0: "Disabled", 1: "50 Hz"}
+    assert controls["white_balance_automatic"] == {"value": False, "default": True, "type": "BooleanControl", "flags": ()}
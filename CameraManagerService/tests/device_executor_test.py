@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import time
+import pytest
+from src.device_executor import DeviceExecutor
+
+
+@pytest.fixture
+def executor():
+    executor = DeviceExecutor("cam1")
+    yield executor
+    executor.shutdown()
+
+
+def test_run_returns_result_off_the_loop_thread(executor):
+    result = asyncio.run(executor.run(lambda x: (x * 2, threading.current_thread().name), 4))
+    assert result[0] == 8
+    assert result[1].startswith("device-cam1")
+
+
+def test_run_serializes_calls(executor):
+    active = []
+    overlaps = []
+
+    def work():
+        active.append(1)
+        overlaps.append(len(active))
+        time.sleep(0.01)
+        active.pop()
+
+    async def main():
+        await asyncio.gather(*(executor.run(work) for _ in range(5)))
+
+    asyncio.run(main())
+    assert overlaps == [1] * 5
+
+
+def test_coalesce_shares_in_flight_call(executor):
+    calls = []
+
+    def read():
+        calls.append(1)
+        time.sleep(0.02)
+        return {"brightness": 5}
+
+    async def main():
+        return await asyncio.gather(*(executor.coalesce("read", read) for _ in range(10)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(result == {"brightness": 5} for result in results)
+
+
+def test_coalesce_runs_again_after_completion(executor):
+    calls = []
+
+    async def main():
+        await executor.coalesce("read", calls.append, 1)
+        await executor.coalesce("read", calls.append, 2)
+
+    asyncio.run(main())
+    assert calls == [1, 2]
+
+
+def test_coalesce_shares_exceptions(executor):
+    def fail():
+        time.sleep(0.01)
+        raise OSError("unplugged")
+
+    async def main():
+        return await asyncio.gather(*(executor.coalesce("read", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, OSError) for result in results)
@@ -0,0 +1,97 @@
+import time
+import threading
+import pytest
+from unittest.mock import patch
+from src.device_session import DeviceSession
+
+
+@pytest.fixture
+def mock_device():
+    with patch("src.device_session.Device") as mock_dev:
+        yield mock_dev
+
+
+def test_device_opened_once_for_several_uses(mock_device):
+    session = DeviceSession("/dev/video0", idle_timeout=10)
+    with session as cam:
+        with session as nested_cam:
+            assert nested_cam is cam
+    with session:
+        pass
+
+    mock_device.assert_called_once_with("/dev/video0")
+    mock_device.return_value.open.assert_called_once()
+    assert session.is_open
+    session.close()
+    mock_device.return_value.close.assert_called_once()
+
+
+def test_idle_close(mock_device):
+    session = DeviceSession("/dev/video0", idle_timeout=0.01)
+    with session:
+        pass
+
+    deadline = time.monotonic() + 2
+    while session.is_open and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not session.is_open
+    mock_device.return_value.close.assert_called_once()
+
+
+def test_idle_timer_cancelled_while_in_use(mock_device):
+    session = DeviceSession("/dev/video0", idle_timeout=0.01)
+    with session:
+        pass
+    with session:
+        time.sleep(0.05)
+        assert session.is_open
+    session.close()
+
+
+def test_device_error_closes_session(mock_device):
+    session = DeviceSession("/dev/video0")
+    with pytest.raises(OSError):
+        with session:
+            raise OSError("No such device")
+
+    assert not session.is_open
+    with session:
+        pass
+    assert mock_device.return_value.open.call_count == 2
+    session.close()
+
+
+def test_one_idle_timer_for_many_uses(mock_device):
+    session = DeviceSession("/dev/video0", idle_timeout=0.05)
+    with patch("src.device_session.threading.Timer", wraps=threading.Timer) as timer:
+        for _ in range(100):
+            with session:
+                pass
+        assert timer.call_count == 1
+
+        # The timer waits for the idle time after the last use
+        deadline = time.monotonic() + 2
+        while session.is_open and time.monotonic() < deadline:
+            time.sleep(0.01)
+    assert not session.is_open
+
+
+def test_nested_error_closes_after_outer_use(mock_device):
+    session = DeviceSession("/dev/video0")
+    with session as cam:
+        with pytest.raises(OSError):
+            with session:
+                raise OSError("No such device")
+        # The outer user keeps the device, nobody else gets it
+        assert session.is_open
+        cam.close.assert_not_called()
+        with pytest.raises(OSError):
+            with session:
+                pass
+
+    assert not session.is_open
+    mock_device.return_value.close.assert_called_once()
+    with session:
+        pass
+    assert mock_device.return_value.open.call_count == 2
+    session.close()
@@ -0,0 +1,37 @@
+from src.format_index import FormatIndex, FrameMode
+
+FORMATS = {
+    "MJPEG": {"3840x1080": [60, 30, 15], "2560x720": [60, 30], "1280x480": [60, 30]},
+    "YUYV": {"3840x1080": [1], "1280x480": [10, 5]},
+}
+
+
+def test_modes_sorted_by_pixels_and_fps():
+    modes = FormatIndex(FORMATS).modes("MJPEG")
+    assert modes[0] == FrameMode("MJPEG", 3840, 1080, 60)
+    assert modes[-1] == FrameMode("MJPEG", 1280, 480, 30)
+    assert [mode.pixels for mode in modes] == sorted((mode.pixels for mode in modes), reverse=True)
+    assert all(isinstance(mode.width, int) and isinstance(mode.height, int) for mode in modes)
+
+
+def test_modes_of_all_formats():
+    index = FormatIndex(FORMATS)
+    assert len(index.modes()) == 10
+    assert index.modes("h264") == ()
+
+
+def test_best_mode():
+    index = FormatIndex(FORMATS)
+    assert index.best_mode("MJPEG", min_fps=30) == FrameMode("MJPEG", 3840, 1080, 60)
+    assert index.best_mode("MJPEG", min_fps=30, max_width=3000) == FrameMode("MJPEG", 2560, 720, 60)
+    assert index.best_mode("yuyv", min_fps=5) == FrameMode("YUYV", 1280, 480, 10)
+    assert index.best_mode("MJPEG", max_height=400) is None
+    assert index.best_mode("YUYV", min_fps=30) is None
+
+
+def test_supports():
+    index = FormatIndex(FORMATS)
+    assert index.supports("MJPEG", 3840, 1080, 30)
+    assert index.supports("mjpeg", 1280, 480, 60)
+    assert not index.supports("MJPEG", 3840, 1080, 25)
+    assert not index.supports("YUYV", 2560, 720, 5)
@@ -0,0 +1,187 @@
+import os
+import time
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+from src.manager import CameraManager
+from src.hotplug import HotplugWatcher
+
+
+def _make_camera(cam_id, cam_path, cam_name, capability_cache=None):
+    camera = MagicMock()
+    camera.id = cam_id
+    camera.path = cam_path
+    camera.name = cam_name
+    camera.controls = {"brightness": {}}
+    camera.formats = {"MJPEG": {"640x480": [30]}}
+    return camera
+
+
+def _plug(by_path, port):
+    name = f"platform-xhci-hcd.1-usb-0:1.{port}:1.0-video-index0"
+    os.symlink("/dev/null", os.path.join(by_path, name))
+    return os.path.join(by_path, name)
+
+
+def _wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def by_path(tmp_path):
+    by_path_dir = tmp_path / "by-path"
+    by_path_dir.mkdir()
+    with patch("src.v4l2_wrapper.V4L_BY_PATH", str(by_path_dir)), \
+         patch("src.persistence.STATE_DIR", str(tmp_path / "state")), \
+         patch("src.manager.Camera", side_effect=_make_camera):
+        yield str(by_path_dir)
+
+
+@pytest.fixture(params=[True, False], ids=["inotify", "polling"])
+def watcher_factory(request):
+    watchers = []
+
+    def factory(manager, watch_dir):
+        watcher = HotplugWatcher(manager, watch_dir, poll_interval=0.05, settle_delay=0.01, use_inotify=request.param)
+        watcher.start()
+        watchers.append(watcher)
+        return watcher
+
+    yield factory
+    for watcher in watchers:
+        watcher.stop()
+
+
+def test_sync_keeps_ids_of_unchanged_cameras(by_path):
+    path1 = _plug(by_path, 1)
+    path2 = _plug(by_path, 2)
+    manager = CameraManager()
+    cam2 = manager.get_camera_by_id("cam2")
+
+    os.remove(path1)
+    assert manager.sync_cameras() is True
+    assert manager.get_camera_by_id("cam1") is None
+    assert manager.get_camera_by_id("cam2") is cam2
+
+    _plug(by_path, 3)
+    manager.sync_cameras()
+    assert manager.get_camera_by_id("cam3").path.endswith("1.3:1.0-video-index0")
+    assert manager.get_camera_by_id("cam2") is cam2
+    assert path2 == cam2.path
+
+    # A replugged camera gets its old ID back
+    _plug(by_path, 1)
+    manager.sync_cameras()
+    assert manager.get_camera_by_id("cam1").path == path1
+
+
+def test_sync_reports_failed_camera(by_path):
+    manager = CameraManager()
+    _plug(by_path, 1)
+    with patch("src.manager.Camera", side_effect=OSError("Permission denied")):
+        assert manager.sync_cameras() is False
+    assert manager.cameras == {}
+
+
+def test_failed_camera_is_retried_after_backoff_or_replug(by_path):
+    manager = CameraManager()
+    path1 = _plug(by_path, 1)
+    failing = MagicMock(side_effect=OSError("Permission denied"))
+    with patch("src.manager.Camera", failing):
+        assert manager.sync_cameras() is False
+        # Within the backoff the camera isn't probed again, its error is still reported
+        assert manager.sync_cameras() is False
+        assert failing.call_count == 1
+        assert manager.discovery_errors == {"cam1": "Permission denied"}
+
+        # Plugging it in again creates a new link
+        os.remove(path1)
+        time.sleep(0.01)
+        _plug(by_path, 1)
+        assert manager.sync_cameras() is False
+        assert failing.call_count == 2
+
+    with patch("src.manager.time.monotonic", return_value=time.monotonic() + 10):
+        assert manager.sync_cameras() is True
+    assert manager.get_camera_by_id("cam1").path == path1
+    assert manager.discovery_errors == {}
+
+
+def test_concurrent_scans_dont_leak_cameras(by_path):
+    manager = CameraManager()
+    _plug(by_path, 1)
+    _plug(by_path, 2)
+    created = []
+
+    def slow_camera(*args):
+        camera = _make_camera(*args)
+        created.append(camera)
+        time.sleep(0.05)
+        return camera
+
+    with patch("src.manager.Camera", side_effect=slow_camera):
+        scans = [threading.Thread(target=manager.discover_cameras), threading.Thread(target=manager.sync_cameras)]
+        for scan in scans:
+            scan.start()
+        for scan in scans:
+            scan.join()
+
+    assert len(manager.cameras) == 2
+    # Every camera that was set up is either registered or released
+    current = list(manager.cameras.values())
+    for camera in created:
+        assert any(camera is cam for cam in current) or camera.close.called
+
+
+def test_watcher_adds_and_removes_cameras(by_path, watcher_factory):
+    manager = CameraManager()
+    watcher_factory(manager, by_path)
+
+    path1 = _plug(by_path, 1)
+    _plug(by_path, 2)
+    assert _wait_for(lambda: len(manager.cameras) == 2)
+    cam2 = manager.get_camera_by_id("cam2")
+
+    os.remove(path1)
+    assert _wait_for(lambda: "cam1" not in manager.cameras)
+    assert manager.get_camera_by_id("cam2") is cam2
+
+
+def test_watcher_logs_polling_while_directory_missing(tmp_path, caplog):
+    manager = MagicMock()
+    manager.sync_cameras.return_value = True
+    watch_dir = tmp_path / "by-path"
+    watcher = HotplugWatcher(manager, str(watch_dir), poll_interval=0.02, use_inotify=True)
+
+    with caplog.at_level("INFO", logger="Hotplug"):
+        watcher.start()
+        try:
+            assert _wait_for(lambda: "(polling)" in caplog.text)
+            if watcher.use_inotify:
+                watch_dir.mkdir()
+                assert _wait_for(lambda: "(inotify)" in caplog.text)
+        finally:
+            watcher.stop()
+    assert caplog.text.count("(polling)") == 1
+
+
+def test_watcher_survives_directory_removal(by_path, watcher_factory):
+    manager = CameraManager()
+    watcher_factory(manager, by_path)
+
+    path1 = _plug(by_path, 1)
+    assert _wait_for(lambda: len(manager.cameras) == 1)
+
+    # udev removes the by-path directory together with the last camera
+    os.remove(path1)
+    os.rmdir(by_path)
+    assert _wait_for(lambda: len(manager.cameras) == 0)
+
+    os.mkdir(by_path)
+    _plug(by_path, 1)
+    assert _wait_for(lambda: len(manager.cameras) == 1)
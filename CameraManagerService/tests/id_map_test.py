@@ -0,0 +1,23 @@
+import json
+from src.id_map import CameraIdMap
+
+
+def test_bind_assigns_ids_in_order(tmp_path):
+    id_map = CameraIdMap(str(tmp_path / "ids.json"))
+    assert id_map.bind(["usb-0:1.1", "usb-0:1.3"]) == {"usb-0:1.1": "cam1", "usb-0:1.3": "cam2"}
+
+
+def test_ids_persist_across_instances(tmp_path):
+    file_path = str(tmp_path / "ids.json")
+    CameraIdMap(file_path).bind(["usb-0:1.1", "usb-0:1.3"])
+
+    id_map = CameraIdMap(file_path)
+    assert id_map.get_id("usb-0:1.3") == "cam2"
+    assert id_map.get_id("usb-0:1.2") == "cam3"
+    assert json.loads((tmp_path / "ids.json").read_text())["usb-0:1.2"] == "cam3"
+
+
+def test_corrupt_file_starts_empty(tmp_path):
+    file_path = tmp_path / "ids.json"
+    file_path.write_text("{not json")
+    assert CameraIdMap(str(file_path)).get_id("usb-0:1.1") == "cam1"
@@ -1,11 +1,15 @@
+import json
+import threading
 import pytest
 from unittest.mock import patch, MagicMock
 from src.manager import CameraManager
+from src.snapshot import render_json
 
 
 @pytest.fixture
-def mock_discovery():
+def mock_discovery(tmp_path):
     with patch("src.manager.get_device_paths_and_names") as mock_get_paths, \
+         patch("src.persistence.STATE_DIR", str(tmp_path)), \
          patch("src.manager.Camera") as mock_camera_class:
         
         mock_get_paths.return_value = (
@@ -15,16 +19,20 @@ def mock_discovery():
 
         # Mock Camera object instances with controls/formats
         mock_cam1 = MagicMock()
+        mock_cam1.path = "/dev/video0"
         mock_cam1.controls = {"brightness": {}}
         mock_cam1.formats = {"MJPEG": {"640x480": [30]}}
         mock_cam1.get_data.return_value = {"id": "cam1"}
 
         mock_cam2 = MagicMock()
+        mock_cam2.path = "/dev/video1"
         mock_cam2.controls = {"contrast": {}}
         mock_cam2.formats = {"YUYV": {"1280x720": [30]}}
         mock_cam2.get_data.return_value = {"id": "cam2"}
 
-        mock_camera_class.side_effect = [mock_cam1, mock_cam2]
+        # Cameras are probed concurrently, so hand out the mocks by camera ID instead of call order
+        mock_cameras = {"cam1": mock_cam1, "cam2": mock_cam2}
+        mock_camera_class.side_effect = lambda cam_id, *args: mock_cameras[cam_id]
 
         yield {
             "get_device_paths_and_names": mock_get_paths,
@@ -68,4 +76,80 @@ def test_get_camera_by_id(mock_discovery):
 def test_get_invalid_camera(mock_discovery):
     manager = CameraManager()
     invalid = manager.get_camera_by_id("invalid")
-    assert invalid is None
\ No newline at end of file
+    assert invalid is None
+
+
+def test_ids_are_stable_across_restarts(mock_discovery):
+    CameraManager()
+
+    # cam1 is unplugged while the service is down, cam2 must keep its ID
+    mock_discovery["get_device_paths_and_names"].return_value = (
+        ["/dev/video1"], ["platform-xhci-hcd.1-usb-1"]
+    )
+    manager = CameraManager()
+    assert list(manager.cameras) == ["cam2"]
+    assert mock_discovery["Camera"].call_args.args[0] == "cam2"
+
+
+def test_path_indexes(mock_discovery):
+    manager = CameraManager()
+    assert manager.get_camera_path("cam2") == "/dev/video1"
+    assert manager.get_camera_by_path("/dev/video0") == mock_discovery["cam1"]
+    assert manager.get_camera_by_path("/dev/video9") is None
+    assert manager.get_camera_path("cam9") is None
+
+
+def test_all_cameras_snapshot(mock_discovery):
+    mock_discovery["cam1"].get_snapshot.return_value = render_json({"id": "cam1"})
+    mock_discovery["cam2"].get_snapshot.return_value = render_json({"id": "cam2"})
+    manager = CameraManager()
+
+    snapshot = manager.get_all_cameras_snapshot()
+    assert json.loads(snapshot.body) == [{"id": "cam1"}, {"id": "cam2"}]
+    assert manager.get_all_cameras_snapshot() is snapshot
+
+    mock_discovery["cam2"].get_snapshot.return_value = render_json({"id": "cam2", "changed": True})
+    new_snapshot = manager.get_all_cameras_snapshot()
+    assert new_snapshot.etag != snapshot.etag
+    assert json.loads(new_snapshot.body)[1]["changed"] is True
+
+
+def test_discovery_reports_failed_camera(mock_discovery):
+    def make_camera(cam_id, *args):
+        if cam_id == "cam1":
+            raise OSError("Device or resource busy")
+        return mock_discovery["cam2"]
+    mock_discovery["Camera"].side_effect = make_camera
+
+    manager = CameraManager()
+    assert list(manager.cameras) == ["cam2"]
+    assert manager.discovery_errors == {"cam1": "Device or resource busy"}
+
+
+def test_discovery_wedged_camera_times_out(mock_discovery):
+    release = threading.Event()
+
+    def make_camera(cam_id, *args):
+        if cam_id == "cam1":
+            release.wait(5)
+        return mock_discovery[cam_id]
+    mock_discovery["Camera"].side_effect = make_camera
+
+    manager = CameraManager(probe_timeout=0.1)
+    release.set()
+
+    assert list(manager.cameras) == ["cam2"]
+    assert "Timed out" in manager.discovery_errors["cam1"]
+
+
+def test_discovery_probes_concurrently(mock_discovery):
+    barrier = threading.Barrier(2, timeout=2)
+
+    def make_camera(cam_id, *args):
+        # Only passes if both cameras are being probed at the same time
+        barrier.wait()
+        return mock_discovery[cam_id]
+    mock_discovery["Camera"].side_effect = make_camera
+
+    manager = CameraManager()
+    assert list(manager.cameras) == ["cam1", "cam2"]
@@ -0,0 +1,37 @@
+import json
+from src.presets import PresetStore
+
+
+def test_save_and_get(tmp_path):
+    store = PresetStore(str(tmp_path / "presets.json"))
+    store.save("cam1", "night", {"brightness": 40, "gain": 80})
+    assert store.get("cam1", "night") == {"brightness": 40, "gain": 80}
+    assert store.get("cam2", "night") is None
+
+
+def test_presets_persist_across_instances(tmp_path):
+    file_path = tmp_path / "presets.json"
+    PresetStore(str(file_path)).save("cam1", "day", {"brightness": 0})
+
+    store = PresetStore(str(file_path))
+    assert store.list("cam1") == {"day": {"brightness": 0}}
+    # Stored compact
+    assert file_path.read_text() == json.dumps({"cam1": {"day": {"brightness": 0}}}, separators=(",", ":"))
+
+
+def test_delete(tmp_path):
+    file_path = tmp_path / "presets.json"
+    store = PresetStore(str(file_path))
+    store.save("cam1", "day", {"brightness": 0})
+
+    assert store.delete("cam1", "day") == {"brightness": 0}
+    assert store.delete("cam1", "day") is None
+    assert store.list("cam1") == {}
+    assert json.loads(file_path.read_text()) == {}
+
+
+def test_list_returns_copy(tmp_path):
+    store = PresetStore(str(tmp_path / "presets.json"))
+    store.save("cam1", "day", {"brightness": 0})
+    store.list("cam1").clear()
+    assert store.get("cam1", "day") == {"brightness": 0}
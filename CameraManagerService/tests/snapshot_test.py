@@ -0,0 +1,22 @@
+import json
+from src.snapshot import render_json, join_json_array, etag_matches
+
+
+def test_render_json_roundtrip():
+    snapshot = render_json({"id": "cam1", "controls": {"menu": {0: "Disabled"}}, "flags": ("slider",)})
+    assert json.loads(snapshot.body) == {"id": "cam1", "controls": {"menu": {"0": "Disabled"}}, "flags": ["slider"]}
+    assert snapshot.etag.startswith('"') and snapshot.etag.endswith('"')
+    assert render_json({"id": "cam1"}).etag != render_json({"id": "cam2"}).etag
+
+
+def test_join_json_array():
+    snapshot = join_json_array([render_json({"id": "cam1"}), render_json({"id": "cam2"})])
+    assert json.loads(snapshot.body) == [{"id": "cam1"}, {"id": "cam2"}]
+    assert json.loads(join_json_array([]).body) == []
+
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('"xyz", W/"abc"', '"abc"')
+    assert etag_matches('*', '"abc"')
+    assert not etag_matches('"xyz"', '"abc"')
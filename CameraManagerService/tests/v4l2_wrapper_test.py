@@ -1,11 +1,15 @@
+import time
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, PropertyMock
 import src.v4l2_wrapper as v4l2
+from src.device_session import DeviceSession
+from src.control_model import ControlMetadata, ControlValue
 
 
 @pytest.fixture
 def mock_device():
-    with patch("src.v4l2_wrapper.Device") as mock_dev:
+    with patch("src.v4l2_wrapper.Device") as mock_dev, \
+         patch("src.v4l2_wrapper._query_flags", side_effect=lambda cam, control: control.flags):
         yield mock_dev
 
 
@@ -53,8 +57,277 @@ def test_set_control_invalid_name(mock_device):
 
 
 def test_empty_flag_name():
-    assert v4l2._get_flag_names(0) == []
+    assert v4l2.decode_flags(0).names == ()
     
     
 def test_inactive_and_disabled_flag():
-    assert v4l2._get_flag_names(17) == ['disabled', 'inactive']
\ No newline at end of file
+    assert v4l2.decode_flags(17).names == ('disabled', 'inactive')
+
+
+def _enum_flag_names(flag_value):
+    """The flag decoding before the lookup table."""
+    return [flag.name.lower() for flag in v4l2.V4L2ControlFlags if flag in v4l2.V4L2ControlFlags(flag_value)]
+
+
+def test_flag_table_matches_enum_decoding():
+    for flag_value in list(range(0x100)) + [0x110, 0x0210, 0x1ff]:
+        decoded = v4l2.decode_flags(flag_value)
+        assert list(decoded.names) == _enum_flag_names(flag_value)
+        assert decoded.inactive == (v4l2.V4L2ControlFlags.INACTIVE in v4l2.V4L2ControlFlags(flag_value))
+        assert decoded.writable == (not flag_value & 0x15)
+
+
+def test_get_device_paths_and_names_aligned(tmp_path):
+    for name in ["platform-xhci-hcd.1-usb-0:1.3:1.0-video-index0",
+                 "platform-xhci-hcd.1-usb-0:1.1:1.0-video-index0",
+                 "platform-xhci-hcd.1-usb-0:1.1:1.0-video-index1"]:
+        (tmp_path / name).touch()
+
+    with patch("src.v4l2_wrapper.V4L_BY_PATH", str(tmp_path)):
+        paths, names = v4l2.get_device_paths_and_names()
+
+    assert names == ["platform-xhci-hcd.1-usb-0:1.1:1.0-video-index0",
+                     "platform-xhci-hcd.1-usb-0:1.3:1.0-video-index0"]
+    assert [p.rsplit("/", 1)[-1] for p in paths] == names
+
+
+def _frame_size(pixel_format, width, height, fps):
+    frame_info = MagicMock()
+    frame_info.pixel_format.name = pixel_format
+    frame_info.width = width
+    frame_info.height = height
+    frame_info.max_fps = fps
+    return frame_info
+
+
+def test_get_supported_formats(mock_device):
+    instance = mock_device.return_value.__enter__.return_value
+    instance.info.frame_sizes = [
+        _frame_size("MJPEG", 3840, 1080, 30),
+        _frame_size("MJPEG", 3840, 1080, 60),
+        _frame_size("YUYV", 1280, 480, 10),
+    ]
+    assert v4l2.get_supported_formats("dummy") == {
+        "MJPEG": {"3840x1080": [60, 30]},
+        "YUYV": {"1280x480": [10]},
+    }
+
+
+def test_get_supported_formats_cached(mock_device, tmp_path):
+    from src.capability_cache import CapabilityCache
+    instance = mock_device.return_value.__enter__.return_value
+    instance.info.driver = "uvcvideo"
+    instance.info.card = "3D USB Camera"
+    instance.info.bus_info = "usb-xhci-hcd.1-1.1"
+    instance.info.frame_sizes = [_frame_size("MJPEG", 3840, 1080, 30)]
+    cache = CapabilityCache(str(tmp_path / "caps.json"))
+
+    first = v4l2.get_supported_formats("/dev/v4l/by-path/usb-0:1.1", cache)
+
+    # A cache hit must not enumerate the frame sizes again
+    instance.info.frame_sizes = MagicMock(__iter__=MagicMock(side_effect=AssertionError("enumerated")))
+    second = v4l2.get_supported_formats("/dev/v4l/by-path/usb-0:1.1", cache)
+
+    assert first == second == {"MJPEG": {"3840x1080": [30]}}
+
+    # A different camera on the same port is enumerated again
+    instance.info.card = "HD USB Camera"
+    instance.info.frame_sizes = [_frame_size("YUYV", 640, 480, 30)]
+    assert v4l2.get_supported_formats("/dev/v4l/by-path/usb-0:1.1", cache) == {"YUYV": {"640x480": [30]}}
+
+
+def test_set_controls_single_open(mock_device):
+    brightness = MagicMock(flags=0, minimum=0, maximum=10)
+    contrast = MagicMock(flags=0, minimum=0, maximum=10)
+    instance = mock_device.return_value.__enter__.return_value
+    instance.controls = {"brightness": brightness, "contrast": contrast}
+
+    results = v4l2.set_controls("dummy", {"brightness": 5, "contrast": 20, "missing": 1})
+
+    assert results == {"brightness": True, "contrast": False, "missing": False}
+    assert brightness.value == 5
+    mock_device.assert_called_once_with("dummy")
+
+
+def test_functions_reuse_session(mock_device):
+    with patch("src.device_session.Device") as session_device:
+        session_instance = session_device.return_value
+        session_instance.controls = {"brightness": MagicMock(flags=0, minimum=0, maximum=10)}
+        session = DeviceSession("dummy")
+
+        v4l2.set_controls(session, {"brightness": 1})
+        v4l2.set_control(session, "brightness", 2)
+
+        session_instance.open.assert_called_once()
+        mock_device.assert_not_called()
+        session.close()
+
+
+def _control(name, value, flags=0):
+    control = MagicMock(flags=flags, minimum=0, maximum=10000, default=0, value=value)
+    control.name = name
+    return control
+
+
+def _controls_data(controls):
+    return {v4l2._snake_case(c.name): ControlValue(c.value, v4l2.decode_flags(c.flags).names) for c in controls}
+
+
+def test_refresh_controls_reads_written_and_dependents(mock_device):
+    controls = [_control("Brightness", 1), _control("Auto Exposure", 3, flags=0x08),
+                _control("Exposure Time, Absolute", 157), _control("Contrast", 32)]
+    instance = mock_device.return_value.__enter__.return_value
+    instance.controls = {i: c for i, c in enumerate(controls)}
+    cached = _controls_data(controls)
+    for control in controls:
+        control.value = 99
+
+    refreshed = v4l2.refresh_controls("dummy", ["auto_exposure"], cached)
+
+    assert refreshed["auto_exposure"].value == 99
+    assert refreshed["exposure_time_absolute"].value == 99
+    assert refreshed["brightness"] is cached["brightness"]
+    assert refreshed["contrast"] is cached["contrast"]
+
+
+def test_refresh_controls_rereads_volatile(mock_device):
+    controls = [_control("Brightness", 1), _control("Gain", 5, flags=v4l2.V4L2ControlFlags.VOLATILE),
+                _control("Contrast", 32)]
+    instance = mock_device.return_value.__enter__.return_value
+    instance.controls = {i: c for i, c in enumerate(controls)}
+    cached = _controls_data(controls)
+    for control in controls:
+        control.value = 99
+
+    refreshed = v4l2.refresh_controls("dummy", ["brightness"], cached)
+
+    assert refreshed["brightness"].value == 99
+    assert refreshed["gain"].value == 99
+    assert refreshed["contrast"].value == 32
+
+
+def test_refresh_controls_unknown_update_flag_reads_all(mock_device):
+    controls = [_control("Privacy", 0, flags=v4l2.V4L2ControlFlags.UPDATE), _control("Contrast", 32)]
+    instance = mock_device.return_value.__enter__.return_value
+    instance.controls = {i: c for i, c in enumerate(controls)}
+    cached = _controls_data(controls)
+    for control in controls:
+        control.value = 99
+
+    refreshed = v4l2.refresh_controls("dummy", ["privacy"], cached)
+
+    assert refreshed["contrast"].value == 99
+
+
+def test_get_controls(mock_device):
+    brightness = _control("Brightness", 5, flags=v4l2.V4L2ControlFlags.SLIDER)
+    brightness.minimum, brightness.maximum, brightness.step, brightness.default = -64, 64, 1, 0
+    brightness.__class__ = v4l2.IntegerControl
+    instance = mock_device.return_value.__enter__.return_value
+    instance.controls = {1: brightness}
+
+    assert v4l2.get_controls("dummy") == {
+        "brightness": {"value": 5, "default": 0, "type": "IntegerControl", "flags": ("slider",),
+                       "min": -64, "max": 64, "step": 1}
+    }
+    mock_device.assert_called_once()
+
+
+def _metadata(controls):
+    return {v4l2._snake_case(c.name): ControlMetadata(c.name, "IntegerControl", c.default) for c in controls}
+
+
+def test_dependency_order_auto_controls_first():
+    order = v4l2._dependency_order(("brightness", "exposure_time_absolute", "exposure_dynamic_framerate",
+                               "white_balance_temperature", "auto_exposure", "white_balance_automatic"))
+    assert order == ("auto_exposure", "exposure_dynamic_framerate", "white_balance_automatic",
+                     "brightness", "exposure_time_absolute", "white_balance_temperature")
+
+
+def test_set_controls_writes_auto_controls_first(mock_device):
+    exposure, auto_exposure = _control("Exposure Time, Absolute", 157), _control("Auto Exposure", 3)
+    instance = mock_device.return_value.__enter__.return_value
+    instance.controls = {"exposure_time_absolute": exposure, "auto_exposure": auto_exposure}
+    order = []
+    type(exposure).value = PropertyMock(side_effect=lambda v: order.append("exposure_time_absolute"))
+    type(auto_exposure).value = PropertyMock(side_effect=lambda v: order.append("auto_exposure"))
+
+    results = v4l2.set_controls("dummy", {"exposure_time_absolute": 300, "auto_exposure": 1})
+
+    assert results == {"auto_exposure": True, "exposure_time_absolute": True}
+    assert order == ["auto_exposure", "exposure_time_absolute"]
+
+
+def test_reset_controls_writes_only_changed(mock_device):
+    brightness, contrast = _control("Brightness", 10), _control("Contrast", 0)
+    instance = mock_device.return_value.__enter__.return_value
+    instance.controls = {1: brightness, 2: contrast}
+
+    failed, written = v4l2.reset_controls("dummy", _metadata([brightness, contrast]), _controls_data([brightness, contrast]))
+
+    assert (failed, written) == ([], ["brightness"])
+    assert brightness.value == 0
+
+
+def test_reset_controls_skips_dependents_left_inactive(mock_device):
+    auto_exposure = _control("Auto Exposure", 1)
+    auto_exposure.default = 3
+    exposure = _control("Exposure Time, Absolute", 300)
+    exposure.default = 157
+    instance = mock_device.return_value.__enter__.return_value
+    instance.controls = {1: exposure, 2: auto_exposure}
+    cached = _controls_data([exposure, auto_exposure])
+
+    writes = []
+    def write_auto_exposure(value):
+        writes.append(("auto_exposure", value))
+        exposure.flags = v4l2.V4L2ControlFlags.INACTIVE
+    type(auto_exposure).value = PropertyMock(return_value=1, side_effect=write_auto_exposure)
+
+    with patch("src.v4l2_wrapper.time.sleep") as mock_sleep:
+        failed, written = v4l2.reset_controls("dummy", _metadata([exposure, auto_exposure]), cached)
+
+    assert failed == []
+    assert written == ["auto_exposure"]
+    assert writes == [("auto_exposure", 3)]
+    # Flags are polled until they are stable instead of sleeping a fixed time
+    assert mock_sleep.call_count == 1
+
+
+def test_reset_controls_writes_active_dependents_after_auto(mock_device):
+    white_balance_auto = _control("White Balance, Automatic", True)
+    white_balance_auto.default = False
+    temperature = _control("White Balance Temperature", 6500, flags=v4l2.V4L2ControlFlags.INACTIVE)
+    temperature.default = 4600
+    instance = mock_device.return_value.__enter__.return_value
+    instance.controls = {1: temperature, 2: white_balance_auto}
+    cached = _controls_data([temperature, white_balance_auto])
+
+    order = []
+    type(white_balance_auto).value = PropertyMock(
+        return_value=True, side_effect=lambda v: (order.append("auto"), setattr(temperature, "flags", 0)))
+
+    with patch("src.v4l2_wrapper.time.sleep"):
+        failed, written = v4l2.reset_controls("dummy", _metadata([temperature, white_balance_auto]), cached)
+
+    assert failed == []
+    assert written == ["white_balance_automatic", "white_balance_temperature"]
+    assert order == ["auto"]
+    assert temperature.value == 4600
+
+
+def test_reset_controls_bounded_by_timeout(mock_device):
+    auto_exposure = _control("Auto Exposure", 1)
+    auto_exposure.default = 3
+    exposure = _control("Exposure Time, Absolute", 300)
+    instance = mock_device.return_value.__enter__.return_value
+    instance.controls = {1: auto_exposure, 2: exposure}
+    flags = iter(range(1000))
+
+    start = time.monotonic()
+    with patch("src.v4l2_wrapper._query_flags", side_effect=lambda cam, control: next(flags)):
+        failed, written = v4l2.reset_controls("dummy", _metadata([auto_exposure, exposure]),
+                                              _controls_data([auto_exposure, exposure]), settle_timeout=0.05)
+
+    assert written[0] == "auto_exposure"
+    assert time.monotonic() - start < 1
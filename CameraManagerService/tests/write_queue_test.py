@@ -0,0 +1,119 @@
+import time
+import asyncio
+import pytest
+from unittest.mock import MagicMock
+from src.device_executor import DeviceExecutor
+from src.write_queue import WriteQueue
+
+
+@pytest.fixture
+def mock_camera():
+    """A camera whose update_controls records the written batches."""
+    camera = MagicMock()
+    camera.id = "cam1"
+    camera.executor = DeviceExecutor("cam1")
+    camera.batches = []
+
+    def update_controls(controls):
+        camera.batches.append(dict(controls))
+        time.sleep(0.01)
+        return [name for name in controls if name == "broken"]
+
+    camera.update_controls.side_effect = update_controls
+    yield camera
+    camera.executor.shutdown()
+
+
+def test_single_write_applied_immediately(mock_camera):
+    queue = WriteQueue(mock_camera, interval=10)
+    start = time.monotonic()
+    failed = asyncio.run(queue.submit({"brightness": 5}))
+    assert failed == []
+    assert mock_camera.batches == [{"brightness": 5}]
+    assert time.monotonic() - start < 1
+
+
+def test_pending_writes_coalesced_last_wins(mock_camera):
+    queue = WriteQueue(mock_camera, interval=0.05)
+
+    async def burst():
+        return await asyncio.gather(*(queue.submit({"brightness": value}) for value in range(20)))
+
+    results = asyncio.run(burst())
+    assert results == [[]] * 20
+    assert mock_camera.batches == [{"brightness": 19}]
+
+
+def test_slider_drag_bounded_batches(mock_camera):
+    queue = WriteQueue(mock_camera, interval=0.05)
+
+    async def drag():
+        writes = []
+        for value in range(40):
+            writes.append(asyncio.ensure_future(queue.submit({"brightness": value})))
+            await asyncio.sleep(0.005)
+        return await asyncio.gather(*writes)
+
+    results = asyncio.run(drag())
+    assert results == [[]] * 40
+    assert len(mock_camera.batches) <= 8
+    assert mock_camera.batches[-1] == {"brightness": 39}
+
+
+def test_batches_merge_different_controls(mock_camera):
+    queue = WriteQueue(mock_camera, interval=0.05)
+
+    async def main():
+        first = asyncio.ensure_future(queue.submit({"brightness": 1}))
+        await asyncio.sleep(0)
+        return await asyncio.gather(first, queue.submit({"contrast": 2}), queue.submit({"brightness": 3, "gain": 4}))
+
+    asyncio.run(main())
+    assert mock_camera.batches == [{"brightness": 1}, {"contrast": 2, "brightness": 3, "gain": 4}]
+
+
+def test_batches_rate_limited(mock_camera):
+    queue = WriteQueue(mock_camera, interval=0.05)
+
+    async def main():
+        await queue.submit({"brightness": 1})
+        start = time.monotonic()
+        await queue.submit({"brightness": 2})
+        return time.monotonic() - start
+
+    assert asyncio.run(main()) >= 0.04
+
+
+def test_failures_reported_to_callers_of_the_control(mock_camera):
+    queue = WriteQueue(mock_camera, interval=0)
+
+    async def main():
+        return await asyncio.gather(queue.submit({"broken": 1, "brightness": 2}), queue.submit({"contrast": 3}))
+
+    failed_first, failed_second = asyncio.run(main())
+    assert failed_first == ["broken"]
+    assert failed_second == []
+
+
+def test_write_exception_propagates(mock_camera):
+    mock_camera.update_controls.side_effect = OSError("unplugged")
+    queue = WriteQueue(mock_camera, interval=0)
+    with pytest.raises(OSError):
+        asyncio.run(queue.submit({"brightness": 1}))
+
+
+def test_camera_closed_while_write_queued(mock_camera):
+    queue = WriteQueue(mock_camera, interval=0)
+
+    async def main():
+        # Another job keeps the executor busy, the write waits behind it
+        busy = asyncio.ensure_future(mock_camera.executor.run(time.sleep, 0.1))
+        write = asyncio.ensure_future(queue.submit({"brightness": 1}))
+        await asyncio.sleep(0.01)
+        mock_camera.executor.shutdown()
+        with pytest.raises(RuntimeError, match="cam1 was closed"):
+            await asyncio.wait_for(write, 2)
+        await busy
+
+    asyncio.run(main())
+    assert mock_camera.batches == []
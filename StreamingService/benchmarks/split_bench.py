@@ -0,0 +1,85 @@
+"""
+CPU time and throughput of splitting recorded stereo MJPEG frames into both eyes,
+with the ffmpeg decode, crop and re-encode of the transcode split mode versus the lossless crop of the lossless mode.
+
+Record sample frames on the device, e.g. 300 frames of the left camera:
+    ffmpeg -f v4l2 -input_format mjpeg -framerate 30 -video_size 3840x1080 -i /dev/video0 -c:v copy -frames:v 300 stereo.mjpeg
+
+Run from the StreamingService directory:
+    python -m benchmarks.split_bench stereo.mjpeg --width 3840 --height 1080
+"""
+import time
+import shutil
+import argparse
+import resource
+import subprocess
+from src import mjpeg_crop
+from src.mjpeg_crop import JpegFrameReader, StereoCropper
+from src.pipeline import FFMPEG, stereo_split_graph
+
+
+def _children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _report(name: str, frames: int, elapsed: float, cpu: float) -> str:
+    return (f"{name}: {frames / elapsed:7.1f} frames/s, {cpu / frames * 1000:6.2f} ms CPU per frame, "
+            f"{cpu / elapsed * 100:5.0f}% of a core while running")
+
+
+def bench_transcode(path: str, width: int, height: int, frames: int) -> str:
+    """The split stage of the transcode mode, with both eyes encoded to the null muxer instead of the devices."""
+    command = [
+        FFMPEG, "-loglevel", "error", "-f", "mjpeg", "-i", path,
+        "-filter_complex", stereo_split_graph(width, height),
+        "-map", "[leftout]", "-c:v", "mjpeg", "-q:v", "1", "-f", "null", "-",
+        "-map", "[rightout]", "-c:v", "mjpeg", "-q:v", "1", "-f", "null", "-",
+    ]
+    cpu = _children_cpu()
+    start = time.perf_counter()
+    subprocess.run(command, check=True)
+    elapsed = time.perf_counter() - start
+    return _report("transcode", frames, elapsed, _children_cpu() - cpu)
+
+
+def bench_lossless(samples, width: int, height: int) -> str:
+    """The frame splitting and lossless crop of the lossless mode, the ffmpeg copies around it hardly use CPU."""
+    cropper = StereoCropper(width, height)
+    cpu = time.process_time()
+    start = time.perf_counter()
+    for frame in samples:
+        cropper.crop(frame)
+    elapsed = time.perf_counter() - start
+    return _report("lossless ", len(samples), elapsed, time.process_time() - cpu)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares the split modes on recorded MJPEG frames.")
+    parser.add_argument("path", help="Concatenated MJPEG frames, e.g. recorded with ffmpeg -c:v copy")
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=1080)
+    args = parser.parse_args()
+
+    with open(args.path, "rb") as stream:
+        start = time.perf_counter()
+        samples = list(JpegFrameReader(stream))
+        split_time = time.perf_counter() - start
+    if not samples:
+        raise SystemExit(f"No JPEG frames in {args.path}")
+    print(f"{len(samples)} frames of {args.width}x{args.height}, "
+          f"{sum(map(len, samples)) / len(samples) / 1024:.0f} KiB on average")
+    print(f"frame splitting: {len(samples) / split_time:7.1f} frames/s")
+
+    if shutil.which(FFMPEG):
+        print(bench_transcode(args.path, args.width, args.height, len(samples)))
+    else:
+        print(f"transcode: skipped, {FFMPEG} not found")
+    if mjpeg_crop.available():
+        print(bench_lossless(samples, args.width, args.height))
+    else:
+        print("lossless:  skipped, PyTurboJPEG or libjpeg-turbo not installed")
+
+
+if __name__ == "__main__":
+    main()
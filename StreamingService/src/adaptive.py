@@ -0,0 +1,112 @@
+import time
+import logging
+import threading
+from typing import Dict, Optional, Set
+from .models import SplitMode
+from .pipeline import CameraPipeline
+from .quality import step_down
+from .readiness import FirstFrameProbe
+from .registry import StreamRegistry
+
+logger = logging.getLogger("StreamManager")
+
+# Rolling speed of the split below which it's falling behind the camera, 1.0 is real time
+MIN_SPEED = 0.97
+# Seconds the split has to stay behind before the quality is stepped down
+SLOW_FOR = 5.0
+CHECK_INTERVAL = 1.0
+
+
+class AdaptiveQuality:
+    """
+    Steps the quality profile of a camera down while its split can't keep up with the camera in real time,
+    for the cameras whose stream settings enable 'adaptive'. Both eyes of the camera follow the new profile.
+    The quality isn't stepped up again on its own, reconfiguring the stream sets it again.
+    The profiles don't change the lossless split, a slow one is only logged.
+    """
+    def __init__(self, registry: StreamRegistry, min_speed: float = MIN_SPEED, slow_for: float = SLOW_FOR,
+                 interval: float = CHECK_INTERVAL):
+        self.registry = registry
+        self.min_speed = min_speed
+        self.slow_for = slow_for
+        self.interval = interval
+        # Since when the split of a camera is behind, by proxy device
+        self._slow_since: Dict[str, float] = {}
+        # The slow lossless splits that were logged, until they catch up again
+        self._reported: Set[str] = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Starts checking the cameras every 'interval' seconds."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="adaptive-quality", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def check(self, now: Optional[float] = None):
+        """Checks the speed of every adaptive camera's split once, steps down the ones behind for too long."""
+        now = time.monotonic() if now is None else now
+        for pipeline in self.registry.pipelines.all():
+            settings = pipeline.settings
+            speed = _split_speed(pipeline)
+            if settings is None or not settings.adaptive or speed is None or speed >= self.min_speed:
+                self._slow_since.pop(pipeline.proxy_vdev, None)
+                self._reported.discard(pipeline.proxy_vdev)
+                continue
+
+            slow_since = self._slow_since.setdefault(pipeline.proxy_vdev, now)
+            if now - slow_since < self.slow_for:
+                continue
+            if settings.split_mode == SplitMode.LOSSLESS:
+                # Stepping down would restart the stream for nothing
+                if pipeline.proxy_vdev not in self._reported:
+                    self._reported.add(pipeline.proxy_vdev)
+                    logger.warning(f"The lossless split of {pipeline.proxy_vdev} runs at {speed:.2f}x, "
+                                   f"the quality profiles don't change it")
+                continue
+            self._slow_since.pop(pipeline.proxy_vdev)
+            self._step_down(pipeline, speed)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Failed to check the stream speed: {e}")
+
+    def _step_down(self, pipeline: CameraPipeline, speed: float):
+        quality = step_down(pipeline.settings.quality)
+        if quality is None:
+            logger.warning(f"The split of {pipeline.proxy_vdev} runs at {speed:.2f}x at the lowest quality")
+            return
+        stream_manager = next((stream_manager for stream_manager in self.registry.streams()
+                               if stream_manager.pipeline is pipeline), None)
+        if stream_manager is None:
+            return
+
+        logger.warning(f"The split of {pipeline.proxy_vdev} runs at {speed:.2f}x, "
+                       f"stepping the quality down from {pipeline.settings.quality} to {quality}")
+        try:
+            self.registry.reconfigure(stream_manager, stream_manager.settings.model_copy(update={"quality": quality}))
+        except RuntimeError as e:
+            logger.error(f"Failed to step the quality of {pipeline.proxy_vdev} down: {e}")
+
+
+def _split_speed(pipeline: CameraPipeline) -> Optional[float]:
+    """The rolling speed of the camera's split stage, the last of its shared stages."""
+    stages = list(pipeline.stages)
+    if not stages:
+        return None
+    probe = stages[-1].probe
+    if not isinstance(probe, FirstFrameProbe) or probe.reader is None:
+        return None
+    return probe.reader.metrics()["speed"]
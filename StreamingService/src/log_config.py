@@ -24,6 +24,8 @@ def setup_logging():
             # App loggers
             "StreamingAPI": {"handlers": ["default"], "level": "INFO", "propagate": False},
             "StreamManager": {"handlers": ["default"], "level": "INFO", "propagate": False},
+            "Supervisor": {"handlers": ["default"], "level": "INFO", "propagate": False},
+            "ProcessLog": {"handlers": ["default"], "level": "INFO", "propagate": False},
             # Uvicorn loggers
             "uvicorn": {"handlers": ["default"], "level": "INFO", "propagate": False},
             "uvicorn.error": {"handlers": ["default"], "level": "INFO", "propagate": False},
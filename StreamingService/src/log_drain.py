@@ -0,0 +1,218 @@
+import os
+import time
+import logging
+import selectors
+import threading
+import subprocess
+from collections import deque
+from typing import IO, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("ProcessLog")
+
+# Lines kept per process for diagnostics
+MAX_LINES = 200
+# Lines per second and process forwarded to the logger, bursts up to LOG_BURST lines pass right away
+LOG_RATE = 10.0
+LOG_BURST = 50
+# A line that's longer than this is cut, so a process writing without newlines can't grow the buffer
+MAX_LINE_LENGTH = 4096
+
+
+class ProcessLog:
+    """
+    The output of one process: the last lines it wrote, and the handlers its stdout lines are passed to instead.
+    Lines are forwarded to the logger at a limited rate, the number of skipped lines is logged once it allows again.
+    """
+    def __init__(self, name: str, pid: int, max_lines: int = MAX_LINES, rate: float = LOG_RATE,
+                 burst: int = LOG_BURST):
+        self.name = name
+        self.pid = pid
+        self.rate = rate
+        self.burst = burst
+        self.closed = threading.Event()
+        self._lines: Deque[str] = deque(maxlen=max_lines)
+        self._stdout_handlers: List[Callable[[str], None]] = []
+        self._tokens: float = burst
+        self._last_refill: float = time.monotonic()
+        self._suppressed: int = 0
+        self._lock = threading.Lock()
+
+    def on_stdout(self, handler: Callable[[str], None]):
+        """Passes the stdout lines to 'handler' instead of keeping and logging them, e.g. ffmpeg's progress."""
+        self._stdout_handlers.append(handler)
+
+    def tail(self, count: Optional[int] = None) -> List[str]:
+        """Returns the last 'count' lines, all kept lines by default."""
+        with self._lock:
+            lines = list(self._lines)
+        return lines if count is None else lines[-count:]
+
+    def add(self, line: str, stdout: bool = False):
+        if stdout and self._stdout_handlers:
+            for handler in self._stdout_handlers:
+                handler(line)
+            return
+        with self._lock:
+            self._lines.append(line)
+        self._log(line)
+
+    def close(self):
+        if self._suppressed:
+            logger.info(f"[{self.name} {self.pid}] {self._suppressed} lines not logged")
+            self._suppressed = 0
+        self.closed.set()
+
+    def _log(self, line: str):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+        if self._tokens < 1:
+            self._suppressed += 1
+            return
+        self._tokens -= 1
+        if self._suppressed:
+            logger.info(f"[{self.name} {self.pid}] {self._suppressed} lines not logged")
+            self._suppressed = 0
+        logger.info(f"[{self.name} {self.pid}] {line}")
+
+
+class _Pipe:
+    """Read state of one pipe of a process."""
+    def __init__(self, stream: IO[bytes], log: ProcessLog, stdout: bool):
+        self.stream = stream
+        self.log = log
+        self.stdout = stdout
+        self.buffer = b""
+
+
+class LogDrain:
+    """
+    Reads the stdout and stderr pipes of all pipeline processes in one selector thread while they run.
+    A pipe that isn't read blocks its process once the pipe buffer is full, which freezes the stream.
+    """
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._pending: List[_Pipe] = []
+        self._open_pipes: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake_r, self._wake_w = -1, -1
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Starts the drain thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ)
+        self._thread = threading.Thread(target=self._run, name="log-drain", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the drain thread and closes the pipes it was reading."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        os.write(self._wake_w, b"\0")
+        self._thread.join()
+        self._thread = None
+        for key in list(self._selector.get_map().values()):
+            self._selector.unregister(key.fileobj)
+            if isinstance(key.data, _Pipe):
+                self._close(key.data)
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+    def drain(self, process: subprocess.Popen, log: ProcessLog):
+        """Reads the pipes of the process into its log until the process closes them."""
+        pipes = [_Pipe(stream, log, stream is process.stdout) for stream in (process.stdout, process.stderr)
+                 if stream is not None and isinstance(_fileno(stream), int)]
+        if not pipes:
+            log.close()
+            return
+        with self._lock:
+            self._open_pipes[id(log)] = len(pipes)
+            self._pending.extend(pipes)
+        os.write(self._wake_w, b"\0")
+
+    def _run(self):
+        while not self._stop.is_set():
+            for key, _ in self._selector.select():
+                if key.data is None:
+                    self._register_pending()
+                else:
+                    self._read(key.data)
+
+    def _register_pending(self):
+        try:
+            os.read(self._wake_r, 4096)
+        except BlockingIOError:
+            pass
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for pipe in pending:
+            os.set_blocking(pipe.stream.fileno(), False)
+            self._selector.register(pipe.stream.fileno(), selectors.EVENT_READ, pipe)
+
+    def _read(self, pipe: _Pipe):
+        try:
+            data = os.read(pipe.stream.fileno(), 65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+
+        if not data:
+            self._selector.unregister(pipe.stream.fileno())
+            if pipe.buffer:
+                pipe.log.add(pipe.buffer.decode("utf-8", errors="ignore"), pipe.stdout)
+            self._close(pipe)
+            return
+
+        lines, pipe.buffer = _split_lines(pipe.buffer + data)
+        for line in lines:
+            pipe.log.add(line, pipe.stdout)
+
+    def _close(self, pipe: _Pipe):
+        pipe.stream.close()
+        with self._lock:
+            remaining = self._open_pipes.get(id(pipe.log), 1) - 1
+            if remaining:
+                self._open_pipes[id(pipe.log)] = remaining
+            else:
+                self._open_pipes.pop(id(pipe.log), None)
+        if not remaining:
+            pipe.log.close()
+
+
+def _split_lines(data: bytes) -> Tuple[List[str], bytes]:
+    """Splits the complete lines off the data, ffmpeg ends its status lines with a carriage return."""
+    chunks = data.replace(b"\r", b"\n").split(b"\n")
+    rest = chunks.pop()
+    if len(rest) > MAX_LINE_LENGTH:
+        chunks.append(rest[:MAX_LINE_LENGTH])
+        rest = b""
+    return [chunk.decode("utf-8", errors="ignore") for chunk in chunks if chunk.strip()], rest
+
+
+def _fileno(stream: IO[bytes]):
+    try:
+        return stream.fileno()
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+_drain: Optional[LogDrain] = None
+_drain_lock = threading.Lock()
+
+
+def get_log_drain() -> LogDrain:
+    """Returns the process-wide log drain, started on first use."""
+    global _drain
+    with _drain_lock:
+        if _drain is None:
+            _drain = LogDrain()
+            _drain.start()
+        return _drain
@@ -1,151 +1,191 @@
 import logging
 import subprocess
-import time
 import os
-from typing import List
-from .models import StreamSettings, CamType
+import threading
+from typing import Dict, List, Optional
+from .models import StreamSettings, CamType, STREAM_DEVICES
+from .supervisor import Stage, Supervisor, get_supervisor
+from .readiness import PortProbe
+from .quality import eye_output
+from .pipeline import (READY_TIMEOUTS, STOP_TIMEOUT, CameraPipeline, CameraPipelines, SourceConflict,
+                       start_stages, stop_stages, reconfigure_stages, restart_due, spawn, log_exit)
 
 logger = logging.getLogger("StreamManager")
 
+# The binary can be swapped, e.g. for a custom build or a stub in tests
+USTREAMER = os.environ.get("STREAMING_USTREAMER", "ustreamer")
+
 class StreamManager:
+    """
+    The stream of one eye: the ustreamer serving the eye device, on top of the camera's shared proxy and split.
+    Eye streams only share the camera's pipeline if they are given the same CameraPipelines.
+    """
     def __init__(self, stream_settings: StreamSettings = StreamSettings(
         cam=CamType.CAML1,
         cam_path="/dev/v4l/by-id/usb-3D_USB_Camera_3D_USB_Camera_01.00.00-video-index0",
         fps=30,
         width=3840,
         height=1080
-    )):
+    ), supervisor: Optional[Supervisor] = None, ready_timeouts: Optional[Dict[str, float]] = None,
+       pipelines: Optional[CameraPipelines] = None, stop_timeout: float = STOP_TIMEOUT):
         self.settings: StreamSettings = stream_settings
-        self.processes: List[subprocess.Popen] = []
-        
-        if CamType(self.settings.cam) is CamType.CAMR1:
-            self.proxy_vdev = "/dev/video10"   # Virtual device for the full stereo feed
-            self.vdev = "/dev/video11"         # Virtual device for the right eye
-            self.port = 8003                   # Nginx proxies /stream/camr1/ to this port
-            
-        elif CamType(self.settings.cam) is CamType.CAML1:
-            self.proxy_vdev = "/dev/video10"
-            self.vdev = "/dev/video12"
-            self.port = 8004
-        
-        elif CamType(self.settings.cam) is CamType.CAMR2:
-            self.proxy_vdev = "/dev/video14"
-            self.vdev = "/dev/video15"
-            self.port = 8005
-        
-        elif CamType(self.settings.cam) is CamType.CAML2:
-            self.proxy_vdev = "/dev/video14"
-            self.vdev = "/dev/video16"
-            self.port = 8006
-
-        else:
+        self.ready_timeouts: Dict[str, float] = {**READY_TIMEOUTS, **(ready_timeouts or {})}
+        self.stop_timeout: float = stop_timeout
+        self.supervisor: Supervisor = supervisor or get_supervisor()
+        self.pipelines: CameraPipelines = pipelines or CameraPipelines(self.supervisor, self.ready_timeouts,
+                                                                       self.stop_timeout)
+        self.pipeline: Optional[CameraPipeline] = None
+        self._stages: List[Stage] = []
+        self._lock = threading.RLock()
+
+        devices = STREAM_DEVICES.get(CamType(self.settings.cam))
+        if devices is None:
             raise ValueError(f"Cannot determine camera type: {self.settings.cam}")
-    
+        self.proxy_vdev: str = devices.proxy_vdev
+        self.vdev: str = devices.vdev
+        self.port: int = devices.port
+
+
+    @property
+    def stages(self) -> List[Stage]:
+        """The stages the stream runs on in dataflow order, including the shared ones."""
+        with self._lock:
+            if self.pipeline is None:
+                return list(self._stages)
+            return self.pipeline.stages + self._stages
+
+
+    @property
+    def eye_stages(self) -> List[Stage]:
+        """The stages only this stream runs, without the camera's shared ones."""
+        with self._lock:
+            return list(self._stages)
+
+
+    @property
+    def processes(self) -> List[subprocess.Popen]:
+        """The running processes of the stream, in dataflow order."""
+        return [stage.process for stage in self.stages if stage.process is not None]
+
 
     def start_stream(self) -> str:
         """
         Starts streaming processes for the cam in settings.
+        The camera's proxy and split are only started if the other eye isn't streaming already.
+        Every stage is started as soon as the one it reads from is ready.
+        The processes are supervised afterwards, a stage that dies is restarted on its own.
         Returns the stream url.
-        """    
+        """
 
         logger.info(f"Starting stream for {self.settings.cam} on internal port {self.port}")
-        try:
-            # --- Command 1: ffmpeg to proxy the raw camera to a virtual device ---
-            cmd_proxy = [
-                "ffmpeg", "-f", "v4l2", "-input_format", "mjpeg",
-                "-framerate", str(self.settings.fps), "-video_size", str(f"{self.settings.width}x{self.settings.height}"),
-                "-i", self.settings.cam_path,
-                "-c:v", "copy", "-f", "v4l2", self.proxy_vdev
-            ]
-            logger.info(cmd_proxy)
-            proc_proxy = subprocess.Popen(cmd_proxy, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            self.processes.append(proc_proxy)
-            logger.info(f"Started ffmpeg proxy: PID {proc_proxy.pid}")
-            time.sleep(0.4)
-
-            # --- Command 2: ffmpeg to split the stereo feed into mono feed ---
-            mono_width = int(self.settings.width / 2)
-            if 'L' in self.settings.cam.name:
-                # Crop the left half of the video (x=0)
-                crop_filter = f"crop={mono_width}:{self.settings.height}:0:0"
-            elif 'R' in self.settings.cam.name:
-                # Crop the right half of the video (x=mono_width)
-                crop_filter = f"crop={mono_width}:{self.settings.height}:{mono_width}:0"
-            else:
-                raise ValueError(f"Cannot determine crop side from camera name: {self.settings.cam.name}")
-            
-            cmd_split = [
-                "ffmpeg", "-f", "v4l2", "-input_format", "mjpeg",
-                "-framerate", str(self.settings.fps), "-video_size", str(f"{self.settings.width}x{self.settings.height}"),
-                "-i", self.proxy_vdev, "-vf", crop_filter, "-c:v", "mjpeg", "-q:v", "1",      
-                "-f", "v4l2", self.vdev
-            ]
-            logger.info(cmd_split)
-            proc_split = subprocess.Popen(cmd_split, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            self.processes.append(proc_split)
-            logger.info(f"Started ffmpeg split: PID {proc_split.pid}")
-            time.sleep(0.4)
-
-            # --- Commands 3: ustreamer for remote stream ---
-            cmd_ustreamer = [
-                "ustreamer", "-d", self.vdev, "-r", str(f"{mono_width}x{self.settings.height}"),
-                "-m", "MJPEG", "-f", str(self.settings.fps),
-                "--host", "127.0.0.1", "--port", str(self.port), "--tcp-nodelay", "--slowdown"
-            ]
-            logger.info(cmd_ustreamer)
-            proc_ustreamer = subprocess.Popen(cmd_ustreamer, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            self.processes.append(proc_ustreamer)
-            logger.info(f"Started ustreamer on port {self.port}: PID {proc_ustreamer.pid}")
-            self._log_subprocess_errors()
-            
-            hostname = os.uname().nodename
-            return f"https://{hostname}/stream/{self.settings.cam}/stream"
-
-        except Exception as e:
-            logger.error(f"FAILED to start stream. Cleaning up processes. Error: {e}")
-            # If anything fails, terminate all processes
-            for p in self.processes:
-                p.terminate()
-                p.wait()
-            raise RuntimeError(f"Failed to start stream for {self.settings.cam}")
+        with self._lock:
+            pipeline = self.pipelines.get(self.proxy_vdev)
+            acquired = False
+            try:
+                pipeline.acquire(self.settings.cam, self.settings)
+                acquired = True
+                self.pipeline = pipeline
+                start_stages(self._build_stages(), self._stages)
+
+            except SourceConflict as e:
+                # Nothing was started, the other eye keeps streaming
+                logger.error(f"FAILED to start stream for {self.settings.cam}: {e}")
+                raise
+            except Exception as e:
+                logger.error(f"FAILED to start stream. Cleaning up processes. Error: {e}")
+                # If anything fails, terminate all processes
+                stop_stages(self._stages, self.stop_timeout)
+                self._stages.clear()
+                if acquired:
+                    pipeline.release(self.settings.cam)
+                self.pipeline = None
+                raise RuntimeError(f"Failed to start stream for {self.settings.cam}")
+
+            for stage in self._stages:
+                self.supervisor.watch(stage, self._restart_stage)
+
+        hostname = os.uname().nodename
+        return f"https://{hostname}/stream/{self.settings.cam}/stream"
 
 
     def stop_stream(self) -> str:
-        """Stops all the processes related to the stream."""
-        if not self.processes:
-            raise RuntimeError("No running processes to stop.")
+        """
+        Stops the processes of the stream, and the camera's shared ones if the other eye isn't streaming.
+        They're stopped together, within 'stop_timeout' seconds before the remaining ones are killed.
+        """
+        with self._lock:
+            if not self._stages:
+                raise RuntimeError("No running processes to stop.")
 
-        logger.info(f"Stopping stream for {self.settings.cam}")
+            logger.info(f"Stopping stream for {self.settings.cam}")
 
-        for p in self.processes:
-            try:
-                p.terminate()
-                p.wait(5)
-                logger.info(f"Terminated process PID: {p.pid}")
-            except Exception as e:
-                logger.warning(f"Failed to terminate process: {e}")
-        
-        self.processes.clear()
+            for stage in self._stages:
+                self.supervisor.unwatch(stage)
+            self.pipeline.release(self.settings.cam, self._stages)
+            self._stages.clear()
+            self.pipeline = None
         return f"Stopped stream for {self.settings.cam}"
-    
-    
-    def _log_subprocess_errors(self):
+
+
+    def reconfigure(self, stream_settings: StreamSettings) -> List[str]:
         """
-        Check all running processes and log any errors.
+        Applies new settings to the running stream without stopping it.
+        Only the stages whose command changes are restarted, e.g. ustreamer keeps its port open if only the camera
+        device changes. If the camera's shared stages change, the other eye has to be reconfigured as well.
+        Returns the names of the restarted stages.
         """
-        for i, process in enumerate(self.processes):
-            process_name = f"Process-{i}"
-            
-            # Check if process has died
-            if process.poll() is not None:
-                returncode = process.returncode
-                if returncode != 0:
-                    logger.error(f"{process_name} (PID {process.pid}) died with return code {returncode}")
-                    
-                    # Try to read any error output
-                    try:
-                        stderr_output = process.stderr.read().decode('utf-8', errors='ignore')
-                        if stderr_output.strip():
-                            logger.error(f"{process_name} stderr: {stderr_output}")
-                    except:
-                        logger.error(f"Could not read stderr from {process_name}")
\ No newline at end of file
+        if stream_settings.cam != self.settings.cam:
+            raise ValueError(f"Cannot reconfigure the stream for {self.settings.cam} to {stream_settings.cam}")
+
+        with self._lock:
+            if not self._stages:
+                raise RuntimeError("No running processes to reconfigure.")
+
+            logger.info(f"Reconfiguring stream for {self.settings.cam}")
+            old_settings = self.settings
+            restarted = self.pipeline.reconfigure(stream_settings)
+            self.settings = stream_settings
+            try:
+                restarted += reconfigure_stages(self._stages, self._build_stages(), self.supervisor,
+                                                self._restart_stage, self.stop_timeout)
+            except RuntimeError:
+                self.settings = old_settings
+                try:
+                    self.pipeline.reconfigure(old_settings)
+                except RuntimeError as e:
+                    logger.error(f"Failed to restore the shared stages of {self.proxy_vdev}: {e}")
+                raise
+        return restarted
+
+
+    def status(self) -> Dict:
+        """The state, PID and restart count of every stage."""
+        return {"cam": self.settings.cam, "stages": [stage.status() for stage in self.stages]}
+
+
+    def logs(self, lines: Optional[int] = None) -> Dict[str, List[str]]:
+        """The last output lines of every stage, by stage name."""
+        return {stage.name: stage.log.tail(lines) for stage in self.stages if stage.log is not None}
+
+
+    def _build_stages(self) -> List[Stage]:
+        """Builds the commands of the stages only this stream uses."""
+        # The eye feed as the split writes it for the quality profile
+        output = eye_output(self.settings)
+
+        # --- Commands 3: ustreamer for remote stream ---
+        cmd_ustreamer = [
+            USTREAMER, "-d", self.vdev, "-r", str(f"{output.width}x{output.height}"),
+            "-m", "MJPEG", "-f", str(output.fps),
+            "--host", "127.0.0.1", "--port", str(self.port), "--tcp-nodelay", "--slowdown"
+        ]
+        return [Stage("ustreamer", cmd_ustreamer, PortProbe(self.port), self.ready_timeouts["ustreamer"])]
+
+
+    def _restart_stage(self, stage: Stage):
+        """Called by the supervisor after a stage exited, starts only that stage again."""
+        with self._lock:
+            if stage not in self._stages or not restart_due(stage, self.supervisor):
+                return
+            log_exit(stage)
+            spawn(stage)
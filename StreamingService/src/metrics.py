@@ -0,0 +1,78 @@
+from typing import Dict, List, Optional, Tuple
+from .readiness import FirstFrameProbe
+from .registry import StreamRegistry
+from .supervisor import Stage
+
+# Name, type, help and the key in ProgressReader.metrics() of the metrics parsed from the ffmpeg progress
+_PROGRESS_METRICS = [
+    ("streaming_stage_frames_total", "counter", "Frames written since the stage's process started.", "frames"),
+    ("streaming_stage_fps", "gauge", "Frames per second over the last seconds.", "fps"),
+    ("streaming_stage_speed", "gauge", "Processing speed over the last seconds, below 1 is slower than real time.",
+     "speed"),
+    ("streaming_stage_dropped_frames_total", "counter", "Frames dropped since the stage's process started.",
+     "drop_frames"),
+    ("streaming_stage_duplicated_frames_total", "counter", "Frames duplicated since the stage's process started.",
+     "dup_frames"),
+    ("streaming_stage_bitrate_kbps", "gauge", "Output bitrate in kbit/s.", "bitrate_kbps"),
+]
+
+Labels = Dict[str, str]
+
+
+def render_metrics(registry: StreamRegistry) -> str:
+    """
+    Renders the metrics of every running stage in the Prometheus text format.
+    Stages are labelled with the proxy device of their camera, the eye ('' for the stages both eyes share)
+    and the stage name.
+    """
+    stages = _labelled_stages(registry)
+    lines: List[str] = []
+
+    _family(lines, "streaming_camera_target_fps", "gauge", "Frame rate the camera is configured for.",
+            [({"camera": pipeline.proxy_vdev}, pipeline.settings.fps)
+             for pipeline in registry.pipelines.all() if pipeline.settings is not None])
+    _family(lines, "streaming_stage_up", "gauge", "Whether the stage's process is running.",
+            [(labels, 1 if stage.process is not None and stage.process.poll() is None else 0)
+             for labels, stage in stages])
+    _family(lines, "streaming_stage_restarts_total", "counter", "Restarts of the stage by the supervisor.",
+            [(labels, stage.restarts) for labels, stage in stages])
+
+    progress = [(labels, stage.probe.reader.metrics()) for labels, stage in stages
+                if isinstance(stage.probe, FirstFrameProbe) and stage.probe.reader is not None]
+    for name, metric_type, help_text, key in _PROGRESS_METRICS:
+        _family(lines, name, metric_type, help_text, [(labels, metrics[key]) for labels, metrics in progress])
+    return "\n".join(lines) + "\n"
+
+
+def _labelled_stages(registry: StreamRegistry) -> List[Tuple[Labels, Stage]]:
+    stages = []
+    for pipeline in registry.pipelines.all():
+        for stage in list(pipeline.stages):
+            stages.append(({"camera": pipeline.proxy_vdev, "eye": "", "stage": stage.name}, stage))
+    for stream_manager in registry.streams():
+        for stage in stream_manager.eye_stages:
+            stages.append(({"camera": stream_manager.proxy_vdev, "eye": stream_manager.settings.cam,
+                            "stage": stage.name}, stage))
+    return stages
+
+
+def _family(lines: List[str], name: str, metric_type: str, help_text: str,
+            samples: List[Tuple[Labels, Optional[float]]]):
+    samples = [(labels, value) for labels, value in samples if value is not None]
+    if not samples:
+        return
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {metric_type}")
+    for labels, value in samples:
+        label_text = ",".join(f'{key}="{_escape(str(label))}"' for key, label in labels.items())
+        lines.append(f"{name}{{{label_text}}} {_format(value)}")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(value: float) -> str:
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    return str(value)
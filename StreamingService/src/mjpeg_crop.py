@@ -0,0 +1,251 @@
+"""
+Lossless split of a stereo MJPEG feed into both eyes, without decoding and re-encoding the frames.
+
+ffmpeg copies the MJPEG frames of the proxy device to a pipe, every frame is cropped in the DCT domain into its
+left and right half (libjpeg-turbo's lossless transform, the crop has to start at an MCU boundary) and the halves
+are copied to the eye devices by one ffmpeg per eye.
+The progress is reported on stdout like ffmpeg's -progress, so the split stage is probed and measured the same way.
+
+Run as the split stage of the lossless split mode:
+    python mjpeg_crop.py --input /dev/video10 --size 3840x1080 --fps 30 --left /dev/video12 --right /dev/video11
+"""
+import os
+import sys
+import time
+import ctypes
+import signal
+import functools
+import argparse
+import subprocess
+from typing import IO, Iterator, List, Optional
+
+try:
+    from turbojpeg import TurboJPEG
+except ImportError:
+    TurboJPEG = None
+
+SOI = b"\xff\xd8"
+EOI = b"\xff\xd9"
+SOS = 0xDA
+# Markers without a length field
+STANDALONE_MARKERS = {0x01} | set(range(0xD0, 0xD8))
+# The crop has to start at a multiple of the largest MCU width, 16 pixels for 4:2:0 and 4:2:2 subsampling
+MCU_WIDTH = 16
+PROGRESS_INTERVAL = 0.1
+# prctl() option that sends a signal to a process when its parent dies
+PR_SET_PDEATHSIG = 1
+
+
+def available() -> bool:
+    """Whether PyTurboJPEG and the libjpeg-turbo library it loads are installed."""
+    if TurboJPEG is None:
+        return False
+    try:
+        TurboJPEG()
+    except Exception:
+        return False
+    return True
+
+
+class JpegFrameReader:
+    """
+    Splits a stream of concatenated JPEG images into single frames.
+    The segments before the scan are skipped by their length, so an end marker inside e.g. an embedded thumbnail
+    isn't mistaken for the end of the frame. Within the scan 0xFF is always stuffed, only the end marker has 0xFFD9.
+    """
+    def __init__(self, stream: IO[bytes], chunk_size: int = 65536):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self._buffer = bytearray()
+        self._eof = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            frame = self._next_frame()
+            if frame is None:
+                return
+            yield frame
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer += chunk
+        return True
+
+    def _next_frame(self) -> Optional[bytes]:
+        while True:
+            while (start := self._buffer.find(SOI)) < 0:
+                # Keep a trailing 0xFF, it may be the first byte of the next start marker
+                del self._buffer[:max(0, len(self._buffer) - 1)]
+                if not self._fill():
+                    return None
+            del self._buffer[:start]
+
+            scan = self._find_scan()
+            if scan is None:
+                return None
+            if scan < 0:
+                # Not a marker where one belongs, the frame is broken: resynchronize on the next start marker
+                del self._buffer[:1]
+                continue
+
+            while (end := self._buffer.find(EOI, scan)) < 0:
+                scan = max(scan, len(self._buffer) - 1)
+                if not self._fill():
+                    return None
+            frame = bytes(self._buffer[:end + len(EOI)])
+            del self._buffer[:end + len(EOI)]
+            return frame
+
+    def _find_scan(self) -> Optional[int]:
+        """Returns where the scan data of the frame at the start of the buffer begins, -1 if the frame is broken."""
+        position = len(SOI)
+        while True:
+            if position + 4 > len(self._buffer):
+                if not self._fill():
+                    return None
+                continue
+            if self._buffer[position] != 0xFF:
+                return -1
+            marker = self._buffer[position + 1]
+            if marker == 0xFF:
+                # Fill byte
+                position += 1
+            elif marker in STANDALONE_MARKERS:
+                position += 2
+            else:
+                position += 2 + int.from_bytes(self._buffer[position + 2:position + 4], "big")
+                if marker == SOS:
+                    return position
+
+
+class StereoCropper:
+    """Crops stereo MJPEG frames losslessly into their left and right half."""
+    def __init__(self, width: int, height: int):
+        if TurboJPEG is None:
+            raise RuntimeError("The lossless split needs PyTurboJPEG")
+        mono_width = width // 2
+        if mono_width % MCU_WIDTH:
+            raise ValueError(f"The eye width {mono_width} isn't a multiple of the {MCU_WIDTH} pixel MCU width")
+        self._jpeg = TurboJPEG()
+        self._regions = [(0, 0, mono_width, height), (mono_width, 0, mono_width, height)]
+
+    def crop(self, frame: bytes) -> List[bytes]:
+        """Returns the left and the right half of the frame."""
+        return self._jpeg.crop_multiple(frame, self._regions, copynone=True)
+
+
+def reader_command(ffmpeg: str, input_vdev: str, size: str, fps: int) -> List[str]:
+    return [
+        ffmpeg, "-loglevel", "warning", "-f", "v4l2", "-input_format", "mjpeg",
+        "-framerate", str(fps), "-video_size", size, "-i", input_vdev,
+        "-c:v", "copy", "-f", "mjpeg", "pipe:1"
+    ]
+
+
+def writer_command(ffmpeg: str, output_vdev: str, fps: int) -> List[str]:
+    return [
+        ffmpeg, "-loglevel", "warning", "-f", "mjpeg", "-framerate", str(fps), "-i", "pipe:0",
+        "-c:v", "copy", "-f", "v4l2", output_vdev
+    ]
+
+
+def _die_with_parent(libc: ctypes.CDLL, parent_pid: int):
+    """
+    Runs in the readers and writers before they exec: they're killed when this process dies.
+    Stopping the stage can kill it with SIGKILL, which skips its cleanup, the children mustn't keep the devices open.
+    """
+    libc.prctl(PR_SET_PDEATHSIG, signal.SIGKILL)
+    # The parent died before the death signal was set
+    if os.getppid() != parent_pid:
+        os._exit(1)
+
+
+def _report(frames: int, fps: int, dropped: int, final: bool = False):
+    """Writes a progress block like ffmpeg, the output time is the time the written frames cover at 'fps'."""
+    out_time_us = int(frames * 1_000_000 / fps)
+    try:
+        sys.stdout.write(f"frame={frames}\nout_time_us={out_time_us}\ndup_frames=0\ndrop_frames={dropped}\n"
+                         f"progress={'end' if final else 'continue'}\n")
+        sys.stdout.flush()
+    except OSError:
+        pass
+
+
+def run(args: argparse.Namespace) -> int:
+    width, height = (int(value) for value in args.size.split("x"))
+    cropper = StereoCropper(width, height)
+
+    # libc is loaded before forking, the children only call into it
+    die_with_parent = functools.partial(_die_with_parent, ctypes.CDLL(None, use_errno=True), os.getpid())
+    reader = subprocess.Popen(reader_command(args.ffmpeg, args.input, args.size, args.fps), stdout=subprocess.PIPE,
+                              preexec_fn=die_with_parent)
+    writers = [subprocess.Popen(writer_command(args.ffmpeg, vdev, args.fps), stdin=subprocess.PIPE,
+                                preexec_fn=die_with_parent)
+               for vdev in (args.left, args.right)]
+    frames, dropped = 0, 0
+    next_report = time.monotonic()
+    try:
+        for frame in JpegFrameReader(reader.stdout):
+            try:
+                halves = cropper.crop(frame)
+            except Exception as e:
+                dropped += 1
+                print(f"Dropped a frame that couldn't be cropped: {e}", file=sys.stderr, flush=True)
+                continue
+            for writer, half in zip(writers, halves):
+                writer.stdin.write(half)
+                writer.stdin.flush()
+            frames += 1
+            if time.monotonic() >= next_report:
+                _report(frames, args.fps, dropped)
+                next_report = time.monotonic() + PROGRESS_INTERVAL
+        print("The proxy feed ended", file=sys.stderr, flush=True)
+        return 1
+    except BrokenPipeError:
+        print("An eye writer exited", file=sys.stderr, flush=True)
+        return 1
+    finally:
+        _report(frames, args.fps, dropped, final=True)
+        if reader.poll() is None:
+            reader.terminate()
+        # The writers exit once they wrote what's left in their pipes
+        for writer in writers:
+            try:
+                writer.stdin.close()
+            except OSError:
+                pass
+        for process in [reader] + writers:
+            try:
+                process.wait(1)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--ffmpeg", default="ffmpeg")
+    parser.add_argument("--input", required=True, help="The proxy device with the stereo feed")
+    parser.add_argument("--size", required=True, help="The size of the stereo frames, WIDTHxHEIGHT")
+    parser.add_argument("--fps", type=int, required=True)
+    parser.add_argument("--left", required=True, help="The left eye device")
+    parser.add_argument("--right", required=True, help="The right eye device")
+    args = parser.parse_args(argv)
+
+    # Stopping the stage terminates this process, the readers and writers are stopped on the way out.
+    # If it's killed instead, they get SIGKILL from the kernel
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        return run(args)
+    except (RuntimeError, ValueError) as e:
+        print(e, file=sys.stderr, flush=True)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from enum import StrEnum
+from typing import Dict, NamedTuple
 
 class CamType(StrEnum):
     CAMR1 = "camr1"
@@ -7,12 +8,36 @@ class CamType(StrEnum):
     CAMR2 = "camr2"
     CAML2 = "caml2"
 
+class StreamDevices(NamedTuple):
+    proxy_vdev: str     # Virtual device for the full stereo feed, shared by both eyes of a camera
+    vdev: str           # Virtual device for the eye
+    port: int           # Nginx proxies /stream/<cam>/ to this port
+
+STREAM_DEVICES: Dict[CamType, StreamDevices] = {
+    CamType.CAMR1: StreamDevices("/dev/video10", "/dev/video11", 8003),
+    CamType.CAML1: StreamDevices("/dev/video10", "/dev/video12", 8004),
+    CamType.CAMR2: StreamDevices("/dev/video14", "/dev/video15", 8005),
+    CamType.CAML2: StreamDevices("/dev/video14", "/dev/video16", 8006),
+}
+
+class SplitMode(StrEnum):
+    TRANSCODE = "transcode"     # ffmpeg decodes the stereo frames, crops and encodes both eyes again
+    LOSSLESS = "lossless"       # The MJPEG frames are cropped without decoding, needs PyTurboJPEG
+
+class QualityProfile(StrEnum):
+    ARCHIVAL = "archival"           # Full resolution and frame rate at the best MJPEG quality
+    BALANCED = "balanced"           # Full resolution and frame rate, smaller frames
+    LOW_LATENCY = "low_latency"     # Half resolution and frame rate, the least CPU and bandwidth
+
 class StreamSettings(BaseModel):
     cam: CamType
     cam_path: str
     fps: int
     width: int
     height: int
+    split_mode: SplitMode = SplitMode.TRANSCODE
+    quality: QualityProfile = QualityProfile.ARCHIVAL
+    adaptive: bool = False          # Step the quality down while the split can't keep up with the camera
 
 # Create a global shared singleton to share state
 _manager_storage = {
@@ -0,0 +1,391 @@
+import os
+import sys
+import time
+import logging
+import threading
+import subprocess
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from .models import StreamSettings, CamType, SplitMode, STREAM_DEVICES
+from . import mjpeg_crop
+from .quality import QUALITY_PROFILES, eye_output
+from .supervisor import Stage, StageState, Supervisor
+from .readiness import FFMPEG_PROGRESS_ARGS, FirstFrameProbe, wait_ready
+from .log_drain import ProcessLog, get_log_drain
+
+logger = logging.getLogger("StreamManager")
+
+# The binary can be swapped, e.g. for a custom build or a stub in tests
+FFMPEG = os.environ.get("STREAMING_FFMPEG", "ffmpeg")
+
+# Seconds each stage may take to become ready, the camera can be slow to deliver its first frame after a cold boot
+READY_TIMEOUTS: Dict[str, float] = {
+    "ffmpeg proxy": 10.0,
+    "ffmpeg split": 5.0,
+    "mjpeg crop": 5.0,
+    "ustreamer": 5.0,
+}
+
+# Seconds all stages being stopped together get to exit after SIGTERM, before they're killed
+STOP_TIMEOUT = 2.0
+# Seconds all killed processes together get to be reaped, they can be stuck in the kernel, e.g. in a V4L2 driver
+KILL_TIMEOUT = 0.5
+
+# Killed processes that weren't reaped yet
+_unreaped: List[subprocess.Popen] = []
+_unreaped_lock = threading.Lock()
+
+# The settings the shared stages of a camera depend on, both eyes have to agree on them
+SOURCE_FIELDS = ("cam_path", "fps", "width", "height", "split_mode", "quality", "adaptive")
+
+
+class SourceConflict(RuntimeError):
+    """An eye asked for other source settings than the ones the shared stages of its camera are running with."""
+    def __init__(self, proxy_vdev: str, conflicts: Dict[str, Tuple[Any, Any]]):
+        # The running and the requested value, by setting
+        self.conflicts: Dict[str, Tuple[Any, Any]] = conflicts
+        described = ", ".join(f"{field} {running} (requested {requested})"
+                              for field, (running, requested) in conflicts.items())
+        super().__init__(f"{proxy_vdev} is already streaming with other settings: {described}")
+
+
+def check_split_mode(settings: StreamSettings):
+    """Raises ValueError if the split mode of the settings can't run here, so nothing is started for it."""
+    if settings.split_mode != SplitMode.LOSSLESS:
+        return
+    if not mjpeg_crop.available():
+        raise ValueError("The lossless split mode needs PyTurboJPEG and libjpeg-turbo, "
+                         "install them or use the transcode split mode")
+    mono_width = int(settings.width / 2)
+    if mono_width % mjpeg_crop.MCU_WIDTH:
+        raise ValueError(f"The lossless split mode needs an eye width that's a multiple of "
+                         f"{mjpeg_crop.MCU_WIDTH}, not {mono_width}")
+
+
+def stereo_split_graph(width: int, height: int, eye_width: Optional[int] = None, eye_height: Optional[int] = None,
+                       eye_fps: Optional[int] = None) -> str:
+    """
+    The ffmpeg filter graph that decodes a stereo frame once and crops it into [leftout] and [rightout].
+    The eyes are scaled to 'eye_width'x'eye_height' and reduced to 'eye_fps' if given.
+    """
+    mono_width = int(width / 2)
+    eye_filters = ""
+    if eye_width is not None and (eye_width, eye_height) != (mono_width, height):
+        eye_filters += f",scale={eye_width}:{eye_height}"
+    if eye_fps is not None:
+        eye_filters += f",fps={eye_fps}"
+    return (
+        "[0:v]split=2[left][right];"
+        f"[left]crop={mono_width}:{height}:0:0{eye_filters}[leftout];"
+        f"[right]crop={mono_width}:{height}:{mono_width}:0{eye_filters}[rightout]"
+    )
+
+
+def start_stages(stages: List[Stage], started: List[Stage]):
+    """
+    Starts the stages in dataflow order, each one as soon as the stage before it is ready.
+    Every started stage is appended to 'started', so the caller can clean up after a failure.
+    """
+    for stage in stages:
+        logger.info(stage.command)
+        spawn(stage)
+        started.append(stage)
+        logger.info(f"Started {stage.name}: PID {stage.process.pid}")
+        if not wait_ready(stage):
+            raise RuntimeError(f"{stage.name} didn't become ready")
+
+
+def spawn(stage: Stage):
+    """Starts the process of a stage, its output is read by the log drain while it runs."""
+    process = subprocess.Popen(stage.command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stage.process = process
+    stage.log = ProcessLog(stage.name, process.pid)
+    if stage.probe is not None:
+        stage.probe.attach(stage.log)
+    get_log_drain().drain(process, stage.log)
+
+
+def stop_stages(stages: List[Stage], timeout: float = STOP_TIMEOUT):
+    """
+    Stops the processes of the stages, given in dataflow order.
+    All of them are sent SIGTERM at once, readers first, and waited for concurrently: together they get 'timeout'
+    seconds to exit before the remaining ones are killed, and KILL_TIMEOUT seconds more to be reaped,
+    regardless of the number of stages.
+    """
+    processes = [stage.process for stage in reversed(stages) if stage.process is not None]
+    for process in processes:
+        try:
+            process.terminate()
+        except OSError as e:
+            logger.warning(f"Failed to terminate process PID {process.pid}: {e}")
+
+    survivors = []
+    deadline = time.monotonic() + timeout
+    for process in processes:
+        try:
+            process.wait(max(0.0, deadline - time.monotonic()))
+            logger.info(f"Terminated process PID: {process.pid}")
+        except subprocess.TimeoutExpired:
+            survivors.append(process)
+        except Exception as e:
+            logger.warning(f"Failed to terminate process: {e}")
+    _kill(survivors)
+    _reap()
+
+
+def _kill(processes: List[subprocess.Popen]):
+    """Kills all processes at once, then waits for them together for at most KILL_TIMEOUT seconds."""
+    for process in processes:
+        logger.warning(f"Process PID {process.pid} didn't exit after SIGTERM, killing it")
+        try:
+            process.kill()
+        except OSError as e:
+            logger.warning(f"Failed to kill process PID {process.pid}: {e}")
+
+    deadline = time.monotonic() + KILL_TIMEOUT
+    for process in processes:
+        try:
+            process.wait(max(0.0, deadline - time.monotonic()))
+            logger.info(f"Killed process PID: {process.pid}")
+        except subprocess.TimeoutExpired:
+            logger.error(f"Process PID {process.pid} didn't exit after SIGKILL, it's reaped once it does")
+            with _unreaped_lock:
+                _unreaped.append(process)
+        except Exception as e:
+            logger.warning(f"Failed to reap process PID {process.pid}: {e}")
+
+
+def _reap():
+    """Reaps the killed processes that exited since, so they don't stay zombies."""
+    with _unreaped_lock:
+        _unreaped[:] = [process for process in _unreaped if process.poll() is None]
+
+
+def reconfigure_stages(stages: List[Stage], new_stages: List[Stage], supervisor: Supervisor,
+                       restart: Callable[[Stage], None], stop_timeout: float = STOP_TIMEOUT) -> List[str]:
+    """
+    Restarts only the running stages whose command differs from their counterpart in 'new_stages', the others keep
+    running. The changed stages are stopped together and started again in dataflow order.
+    If a stage fails to start, the changed stages are started with their old commands again and RuntimeError is raised.
+    Returns the names of the restarted stages.
+    """
+    changed = [(stage, new_stage) for stage, new_stage in zip(stages, new_stages) if stage.command != new_stage.command]
+    if not changed:
+        return []
+
+    old_stages = [Stage(stage.name, stage.command, stage.probe, stage.ready_timeout) for stage, _ in changed]
+    changed_stages = [stage for stage, _ in changed]
+    for stage in changed_stages:
+        supervisor.unwatch(stage)
+    stop_stages(changed_stages, stop_timeout)
+    for stage, new_stage in changed:
+        _assign(stage, new_stage)
+
+    try:
+        start_stages(changed_stages, [])
+    except Exception as e:
+        logger.error(f"Failed to reconfigure {', '.join(stage.name for stage in changed_stages)}, "
+                     f"restoring the previous commands. Error: {e}")
+        stop_stages(changed_stages, stop_timeout)
+        for stage, old_stage in zip(changed_stages, old_stages):
+            _assign(stage, old_stage)
+        try:
+            start_stages(changed_stages, [])
+        except Exception as restore_error:
+            # Leave it to the supervisor to bring them back
+            logger.error(f"Failed to restore the previous commands: {restore_error}")
+        raise RuntimeError(f"Failed to reconfigure {', '.join(stage.name for stage in changed_stages)}") from e
+    finally:
+        for stage in changed_stages:
+            supervisor.watch(stage, restart)
+
+    return [stage.name for stage in changed_stages]
+
+
+def restart_due(stage: Stage, supervisor: Supervisor) -> bool:
+    """
+    Whether the restart the supervisor asked for is still due, called under the lock of the stage's owner.
+    The supervisor can ask while a reconfigure holds the lock and respawns the stage, which watches it again:
+    a second process would then orphan the reconfigured one.
+    """
+    return supervisor.is_watching(stage) and stage.state == StageState.RESTARTING
+
+
+def _assign(stage: Stage, source: Stage):
+    """Gives a stage the command of another, its process and supervision state stay."""
+    stage.name, stage.command = source.name, source.command
+    stage.probe, stage.ready_timeout = source.probe, source.ready_timeout
+
+
+def log_exit(stage: Stage, lines: int = 20):
+    """Logs the last output of a dead process."""
+    if stage.log is None:
+        return
+    output = stage.log.tail(lines)
+    if output:
+        logger.error(f"{stage.name} (PID {stage.log.pid}) last output:\n" + "\n".join(output))
+
+
+class CameraPipeline:
+    """
+    The stages shared by the eye streams of one physical stereo camera: the ffmpeg proxy of the camera and a single
+    ffmpeg split that decodes the stereo feed once and writes both halves to the eye devices.
+    It's reference counted by the eye streams, started for the first one and stopped after the last one.
+    """
+    def __init__(self, proxy_vdev: str, supervisor: Supervisor, ready_timeouts: Dict[str, float],
+                 stop_timeout: float = STOP_TIMEOUT):
+        self.proxy_vdev: str = proxy_vdev
+        self.supervisor: Supervisor = supervisor
+        self.ready_timeouts: Dict[str, float] = ready_timeouts
+        self.stop_timeout: float = stop_timeout
+        self.settings: Optional[StreamSettings] = None
+        self.stages: List[Stage] = []
+        self.users: Set[CamType] = set()
+        self._lock = threading.RLock()
+
+    def acquire(self, cam: CamType, settings: StreamSettings):
+        """
+        Registers an eye stream, starts the shared stages if it's the first one.
+        Raises SourceConflict if the other eye is streaming with other source settings.
+        """
+        with self._lock:
+            if self.users:
+                conflicts = {field: (getattr(self.settings, field), getattr(settings, field))
+                             for field in SOURCE_FIELDS if getattr(settings, field) != getattr(self.settings, field)}
+                if conflicts:
+                    raise SourceConflict(self.proxy_vdev, conflicts)
+            else:
+                self._start(settings)
+            self.users.add(cam)
+
+    def release(self, cam: CamType, eye_stages: List[Stage] = ()):
+        """
+        Unregisters an eye stream and stops its stages, together with the shared stages after the last eye,
+        so they're all stopped within a single timeout.
+        """
+        with self._lock:
+            self.users.discard(cam)
+            if not self.users and self.stages:
+                logger.info(f"Stopping the shared pipeline of {self.proxy_vdev}")
+                self._stop(eye_stages)
+            else:
+                stop_stages(list(eye_stages), self.stop_timeout)
+
+    def reconfigure(self, settings: StreamSettings) -> List[str]:
+        """
+        Applies new source settings to the running shared stages, restarting only the ones whose command changes.
+        The eyes on the pipeline have to follow the new settings. Returns the names of the restarted stages.
+        """
+        with self._lock:
+            if not self.stages or self._same_source(settings):
+                return []
+            restarted = reconfigure_stages(self.stages, self._build_stages(settings), self.supervisor,
+                                           self._restart_stage, self.stop_timeout)
+            self.settings = settings
+            return restarted
+
+    def _start(self, settings: StreamSettings):
+        self.settings = settings
+        try:
+            start_stages(self._build_stages(settings), self.stages)
+        except Exception:
+            self._stop()
+            raise
+        for stage in self.stages:
+            self.supervisor.watch(stage, self._restart_stage)
+
+    def _stop(self, eye_stages: List[Stage] = ()):
+        for stage in self.stages:
+            self.supervisor.unwatch(stage)
+        stop_stages(self.stages + list(eye_stages), self.stop_timeout)
+        self.stages.clear()
+        self.settings = None
+
+    def _same_source(self, settings: StreamSettings) -> bool:
+        return all(getattr(settings, field) == getattr(self.settings, field) for field in SOURCE_FIELDS)
+
+    def _build_stages(self, settings: StreamSettings) -> List[Stage]:
+        """Builds the commands of the shared stages in dataflow order."""
+        video_size = f"{settings.width}x{settings.height}"
+
+        # --- Command 1: ffmpeg to proxy the raw camera to a virtual device ---
+        cmd_proxy = [
+            FFMPEG, "-f", "v4l2", "-input_format", "mjpeg",
+            "-framerate", str(settings.fps), "-video_size", video_size,
+            "-i", settings.cam_path,
+            "-c:v", "copy", "-f", "v4l2", self.proxy_vdev,
+            *FFMPEG_PROGRESS_ARGS
+        ]
+
+        proxy = Stage("ffmpeg proxy", cmd_proxy, FirstFrameProbe("ffmpeg proxy"), self.ready_timeouts["ffmpeg proxy"])
+        if settings.split_mode == SplitMode.LOSSLESS:
+            return [proxy, self._build_lossless_split(settings)]
+
+        # --- Command 2: ffmpeg to split the stereo feed into both mono feeds with a single decode ---
+        # The quality profile sets the encoder quality, the eye resolution and the frame rate
+        left_vdev, right_vdev = self._eye_vdevs()
+        profile = QUALITY_PROFILES[settings.quality]
+        output = eye_output(settings)
+        filter_graph = stereo_split_graph(settings.width, settings.height, output.width, output.height,
+                                          output.fps if output.fps != settings.fps else None)
+        qscale = str(profile.qscale)
+        cmd_split = [
+            FFMPEG, "-f", "v4l2", "-input_format", "mjpeg",
+            "-framerate", str(settings.fps), "-video_size", video_size,
+            "-i", self.proxy_vdev, "-filter_complex", filter_graph,
+            "-map", "[leftout]", "-c:v", "mjpeg", "-q:v", qscale, "-f", "v4l2", left_vdev,
+            "-map", "[rightout]", "-c:v", "mjpeg", "-q:v", qscale, "-f", "v4l2", right_vdev,
+            *FFMPEG_PROGRESS_ARGS
+        ]
+        return [
+            proxy,
+            Stage("ffmpeg split", cmd_split, FirstFrameProbe("ffmpeg split"), self.ready_timeouts["ffmpeg split"]),
+        ]
+
+    def _build_lossless_split(self, settings: StreamSettings) -> Stage:
+        """The split stage of the lossless split mode, it crops the MJPEG frames without decoding them."""
+        check_split_mode(settings)
+
+        # --- Command 2: crop both mono feeds out of the stereo frames, the frames are copied not re-encoded ---
+        left_vdev, right_vdev = self._eye_vdevs()
+        cmd_crop = [
+            sys.executable, mjpeg_crop.__file__, "--ffmpeg", FFMPEG,
+            "--input", self.proxy_vdev, "--size", f"{settings.width}x{settings.height}", "--fps", str(settings.fps),
+            "--left", left_vdev, "--right", right_vdev
+        ]
+        return Stage("mjpeg crop", cmd_crop, FirstFrameProbe("mjpeg crop"), self.ready_timeouts["mjpeg crop"])
+
+    def _eye_vdevs(self):
+        """Returns the left and the right eye device fed from this camera's proxy device."""
+        eyes = {cam.name[-2]: devices.vdev for cam, devices in STREAM_DEVICES.items()
+                if devices.proxy_vdev == self.proxy_vdev}
+        return eyes["L"], eyes["R"]
+
+    def _restart_stage(self, stage: Stage):
+        """Called by the supervisor after a stage exited, starts only that stage again."""
+        with self._lock:
+            if stage not in self.stages or not restart_due(stage, self.supervisor):
+                return
+            log_exit(stage)
+            spawn(stage)
+
+
+class CameraPipelines:
+    """The CameraPipeline of every physical camera, by its proxy device."""
+    def __init__(self, supervisor: Supervisor, ready_timeouts: Dict[str, float], stop_timeout: float = STOP_TIMEOUT):
+        self.supervisor: Supervisor = supervisor
+        self.ready_timeouts: Dict[str, float] = ready_timeouts
+        self.stop_timeout: float = stop_timeout
+        self._pipelines: Dict[str, CameraPipeline] = {}
+        self._lock = threading.Lock()
+
+    def get(self, proxy_vdev: str) -> CameraPipeline:
+        with self._lock:
+            pipeline = self._pipelines.get(proxy_vdev)
+            if pipeline is None:
+                pipeline = CameraPipeline(proxy_vdev, self.supervisor, self.ready_timeouts, self.stop_timeout)
+                self._pipelines[proxy_vdev] = pipeline
+            return pipeline
+
+    def all(self) -> List[CameraPipeline]:
+        with self._lock:
+            return list(self._pipelines.values())
@@ -0,0 +1,82 @@
+import time
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+# Seconds of progress reports the rolling frame rate and speed are computed over
+METRICS_WINDOW = 5.0
+
+
+class ProgressReader:
+    """
+    Parses the -progress output of an ffmpeg process, line by line as the log drain reads it.
+    ffmpeg reports a block of key=value lines ended by a 'progress' line every stats period. The frame rate and speed
+    ffmpeg reports are averaged since its start, so the rolling ones are computed from the last 'window' seconds.
+    """
+    def __init__(self, name: str, window: float = METRICS_WINDOW):
+        self.name = name
+        self.window = window
+        self.frames: int = 0
+        self.first_frame = threading.Event()
+        self.dup_frames: int = 0
+        self.drop_frames: int = 0
+        self.bitrate_kbps: Optional[float] = None
+        self._block: Dict[str, str] = {}
+        # Wall time, frame count and output time in microseconds of every report within the window
+        self._samples: Deque[Tuple[float, int, Optional[int]]] = deque()
+        self._lock = threading.Lock()
+
+    def feed(self, line: str):
+        key, _, value = line.strip().partition("=")
+        if key == "frame" and value.isdigit():
+            self.frames = int(value)
+            if self.frames > 0:
+                self.first_frame.set()
+        if key == "progress":
+            self._report(self._block, time.monotonic())
+            self._block = {}
+        else:
+            self._block[key] = value
+
+    def metrics(self) -> Dict[str, Optional[float]]:
+        """The frame count, rolling frame rate and speed (1.0 is real time), dropped and duplicated frames and bitrate."""
+        with self._lock:
+            fps, speed = None, None
+            if len(self._samples) >= 2:
+                (first_time, first_frame, first_out), (last_time, last_frame, last_out) = self._samples[0], self._samples[-1]
+                elapsed = last_time - first_time
+                if elapsed > 0:
+                    fps = (last_frame - first_frame) / elapsed
+                    if first_out is not None and last_out is not None:
+                        speed = (last_out - first_out) / 1_000_000 / elapsed
+            return {
+                "frames": self.frames,
+                "fps": fps,
+                "speed": speed,
+                "drop_frames": self.drop_frames,
+                "dup_frames": self.dup_frames,
+                "bitrate_kbps": self.bitrate_kbps,
+            }
+
+    def _report(self, block: Dict[str, str], now: float):
+        with self._lock:
+            self.dup_frames = _parse_int(block.get("dup_frames"), self.dup_frames)
+            self.drop_frames = _parse_int(block.get("drop_frames"), self.drop_frames)
+            self.bitrate_kbps = _parse_float(block.get("bitrate", "").removesuffix("kbits/s"))
+            self._samples.append((now, self.frames, _parse_int(block.get("out_time_us"), None)))
+            while len(self._samples) > 2 and now - self._samples[0][0] > self.window:
+                self._samples.popleft()
+
+
+def _parse_int(value: Optional[str], default: Optional[int]) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _parse_float(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except ValueError:
+        return None
@@ -0,0 +1,48 @@
+from typing import Dict, NamedTuple, Optional
+from .models import StreamSettings, QualityProfile, SplitMode
+
+
+class EncoderProfile(NamedTuple):
+    qscale: int         # -q:v of the MJPEG encoder, 1 is the best quality and the largest frames
+    scale: float        # Eye resolution relative to the camera's
+    fps_divisor: int    # Every n-th camera frame is kept
+
+
+QUALITY_PROFILES: Dict[QualityProfile, EncoderProfile] = {
+    QualityProfile.ARCHIVAL: EncoderProfile(qscale=1, scale=1.0, fps_divisor=1),
+    QualityProfile.BALANCED: EncoderProfile(qscale=5, scale=1.0, fps_divisor=1),
+    QualityProfile.LOW_LATENCY: EncoderProfile(qscale=10, scale=0.5, fps_divisor=2),
+}
+
+# From the best quality to the least CPU
+QUALITY_STEPS = [QualityProfile.ARCHIVAL, QualityProfile.BALANCED, QualityProfile.LOW_LATENCY]
+
+
+class EyeOutput(NamedTuple):
+    width: int
+    height: int
+    fps: int
+
+
+def eye_output(settings: StreamSettings) -> EyeOutput:
+    """The resolution and frame rate of each eye's feed, as the split stage writes it for the settings' profile."""
+    mono_width = int(settings.width / 2)
+    profile = QUALITY_PROFILES[settings.quality]
+    # The lossless split copies the camera's frames, it can't change them
+    if settings.split_mode == SplitMode.LOSSLESS:
+        return EyeOutput(mono_width, settings.height, settings.fps)
+    width, height = mono_width, settings.height
+    if profile.scale != 1.0:
+        width, height = _even(width * profile.scale), _even(height * profile.scale)
+    return EyeOutput(width, height, max(1, settings.fps // profile.fps_divisor))
+
+
+def step_down(quality: QualityProfile) -> Optional[QualityProfile]:
+    """The next profile that needs less CPU, None if it's the last one."""
+    index = QUALITY_STEPS.index(quality)
+    return QUALITY_STEPS[index + 1] if index + 1 < len(QUALITY_STEPS) else None
+
+
+def _even(value: float) -> int:
+    # The MJPEG encoder needs even sizes for the subsampled chroma
+    return int(value) // 2 * 2
@@ -0,0 +1,75 @@
+import time
+import socket
+import logging
+import subprocess
+from typing import Optional
+from .supervisor import Stage
+from .log_drain import ProcessLog
+from .progress import ProgressReader
+
+logger = logging.getLogger("StreamManager")
+
+# Arguments that make ffmpeg report its progress as key=value blocks on stdout, every 0.1 seconds
+FFMPEG_PROGRESS_ARGS = ["-progress", "pipe:1", "-nostats", "-stats_period", "0.1"]
+
+
+class ReadinessProbe:
+    """Decides when a stage is ready, so the stage that reads from it can be started."""
+    def attach(self, log: ProcessLog):
+        """Called after every (re)start of the stage's process, before its output is read."""
+
+    def wait(self, process: subprocess.Popen, timeout: float) -> bool:
+        """Waits until the process is ready, returns False if it exited or the timeout passed."""
+        return True
+
+
+class FirstFrameProbe(ReadinessProbe):
+    """An ffmpeg stage is ready once it wrote its first frame to the output device."""
+    def __init__(self, name: str):
+        self.name = name
+        self.reader: Optional[ProgressReader] = None
+        self.log: Optional[ProcessLog] = None
+
+    def attach(self, log: ProcessLog):
+        self.reader = ProgressReader(self.name)
+        self.log = log
+        log.on_stdout(self.reader.feed)
+
+    def wait(self, process: subprocess.Popen, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.reader.first_frame.wait(min(0.05, max(0.0, deadline - time.monotonic()))):
+                return True
+            if self.log.closed.is_set() or process.poll() is not None:
+                return self.reader.first_frame.is_set()
+        return False
+
+
+class PortProbe(ReadinessProbe):
+    """ustreamer is ready once it accepts connections on its port."""
+    def __init__(self, port: int, host: str = "127.0.0.1", interval: float = 0.02):
+        self.port = port
+        self.host = host
+        self.interval = interval
+
+    def wait(self, process: subprocess.Popen, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                return False
+            try:
+                with socket.create_connection((self.host, self.port), timeout=self.interval):
+                    return True
+            except OSError:
+                time.sleep(self.interval)
+        return False
+
+
+def wait_ready(stage: Stage) -> bool:
+    """Waits for the stage's probe, stages without a probe are ready right away."""
+    if stage.probe is None:
+        return True
+    ready = stage.probe.wait(stage.process, stage.ready_timeout)
+    if not ready:
+        logger.error(f"{stage.name} wasn't ready within {stage.ready_timeout}s")
+    return ready
@@ -0,0 +1,115 @@
+import logging
+import threading
+from typing import Dict, List, Optional, Set
+from .manager import StreamManager
+from .models import StreamSettings, CamType
+from .pipeline import READY_TIMEOUTS, STOP_TIMEOUT, SOURCE_FIELDS, CameraPipelines, check_split_mode
+from .supervisor import Supervisor, get_supervisor
+
+logger = logging.getLogger("StreamManager")
+
+
+class StreamRegistry:
+    """
+    The running stream of every camera eye, by CamType. All four eyes can stream at the same time,
+    the two eyes of a physical camera share its proxy and split.
+    """
+    def __init__(self, supervisor: Optional[Supervisor] = None, stop_timeout: float = STOP_TIMEOUT):
+        self.supervisor: Supervisor = supervisor or get_supervisor()
+        self.stop_timeout: float = stop_timeout
+        self.pipelines: CameraPipelines = CameraPipelines(self.supervisor, dict(READY_TIMEOUTS), stop_timeout)
+        self._streams: Dict[CamType, StreamManager] = {}
+        self._starting: Set[CamType] = set()
+        self._lock = threading.Lock()
+
+    def get(self, cam: CamType) -> Optional[StreamManager]:
+        """Returns the running stream of the eye, None if it isn't streaming."""
+        with self._lock:
+            return self._streams.get(cam)
+
+    def start(self, settings: StreamSettings) -> str:
+        """
+        Starts the stream of the eye in settings and returns its url.
+        Raises ValueError if the eye is already streaming or its split mode can't run here, SourceConflict if the other
+        eye of the camera streams with other source settings and RuntimeError if the stream fails to start.
+        """
+        check_split_mode(settings)
+        cam = CamType(settings.cam)
+        with self._lock:
+            # The eye is reserved while it starts, starting takes a while and other eyes mustn't wait for it
+            if cam in self._streams or cam in self._starting:
+                raise ValueError("A stream is already running.")
+            self._starting.add(cam)
+
+        try:
+            stream_manager = StreamManager(settings, supervisor=self.supervisor, pipelines=self.pipelines,
+                                           stop_timeout=self.stop_timeout)
+            url = stream_manager.start_stream()
+            with self._lock:
+                self._streams[cam] = stream_manager
+            return url
+        finally:
+            with self._lock:
+                self._starting.discard(cam)
+
+    def stop(self, stream_manager: StreamManager) -> str:
+        """Stops a stream and removes it from the registry."""
+        self.discard(stream_manager)
+        return stream_manager.stop_stream()
+
+    def reconfigure(self, stream_manager: StreamManager, settings: StreamSettings) -> Dict[str, List[str]]:
+        """
+        Applies new settings to a running stream, restarting only the stages they affect.
+        The other eye of the camera follows the new source settings. Returns the restarted stages by eye.
+        Raises ValueError if the new split mode can't run here.
+        """
+        check_split_mode(settings)
+        restarted = {stream_manager.settings.cam: stream_manager.reconfigure(settings)}
+        with self._lock:
+            others = [other for other in self._streams.values()
+                      if other is not stream_manager and other.pipeline is stream_manager.pipeline]
+        source = {field: getattr(settings, field) for field in SOURCE_FIELDS}
+        for other in others:
+            restarted[other.settings.cam] = other.reconfigure(other.settings.model_copy(update=source))
+        return restarted
+
+    def discard(self, stream_manager: StreamManager) -> bool:
+        """Removes a stream from the registry without stopping it, returns False if it wasn't registered."""
+        with self._lock:
+            for cam, registered in self._streams.items():
+                if registered is stream_manager:
+                    del self._streams[cam]
+                    return True
+            return False
+
+    def status(self) -> Dict[str, Dict]:
+        """The status of every running stream, by eye."""
+        with self._lock:
+            streams = dict(self._streams)
+        return {cam: stream_manager.status() for cam, stream_manager in streams.items()}
+
+    def streams(self) -> List[StreamManager]:
+        """The running streams."""
+        with self._lock:
+            return list(self._streams.values())
+
+    def stop_all(self):
+        """Stops every running stream."""
+        for stream_manager in self.streams():
+            try:
+                self.stop(stream_manager)
+            except RuntimeError as e:
+                logger.warning(f"Failed to stop stream for {stream_manager.settings.cam}: {e}")
+
+
+_registry: Optional[StreamRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_stream_registry() -> StreamRegistry:
+    """Returns the process-wide stream registry, created on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = StreamRegistry()
+        return _registry
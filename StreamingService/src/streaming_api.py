@@ -1,40 +1,147 @@
 import logging
-from fastapi import FastAPI, HTTPException, Depends
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+from fastapi import FastAPI, HTTPException, Depends, Query
+from fastapi.responses import PlainTextResponse
 from .log_config import setup_logging
 from .manager import StreamManager
-from .models import StreamSettings, get_manager_storage
+from .models import StreamSettings, CamType, get_manager_storage
+from .pipeline import SourceConflict
+from .registry import StreamRegistry, get_stream_registry
+from .metrics import render_metrics
+from .adaptive import AdaptiveQuality
 
 setup_logging()
 logger = logging.getLogger("StreamingAPI")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    adaptive_quality = AdaptiveQuality(get_stream_registry())
+    adaptive_quality.start()
+    yield
+    adaptive_quality.stop()
+    # Don't leave the pipelines running without the API that controls them
+    get_stream_registry().stop_all()
+
+
 # python3 -m uvicorn src.streaming_api:app --host 127.0.0.1 --port 8002
 app = FastAPI(
     title="Camera Streaming API",
-    description="An API to configure and watch V4L2 camera streams."
+    description="An API to configure and watch V4L2 camera streams.",
+    lifespan=lifespan
 )
 
 @app.post("/start", response_model=str)
-def start_stream(settings: StreamSettings, manager_storage = Depends(get_manager_storage)):
-    """Configure and start the streaming processes for a specific camera."""
+def start_stream(settings: StreamSettings, manager_storage = Depends(get_manager_storage),
+                 registry: StreamRegistry = Depends(get_stream_registry)):
+    """
+    Configure and start the streaming processes for a specific camera, replacing the stream started here before.
+    Streams started through /streams keep running.
+    """
     if manager_storage["manager"] is not None:
-        stop_stream(manager_storage)
+        stop_stream(manager_storage, registry)
 
-    stream_manager = StreamManager(settings)
-    try:
-        url = stream_manager.start_stream()
-        manager_storage["manager"] = stream_manager
-        return url
-    except RuntimeError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    url = _start_registered(settings, registry)
+    manager_storage["manager"] = registry.get(settings.cam)
+    return url
 
 
 @app.put("/stop", response_model=str)
-def stop_stream(manager_storage = Depends(get_manager_storage)):
+def stop_stream(manager_storage = Depends(get_manager_storage),
+                registry: StreamRegistry = Depends(get_stream_registry)):
     stream_manager: StreamManager = manager_storage["manager"]
     if stream_manager is None:
         raise HTTPException(status_code=400, detail="No active stream to stop.")
 
     try:
-        return stream_manager.stop_stream()
+        return registry.stop(stream_manager)
     finally:
-        manager_storage["manager"] = None
\ No newline at end of file
+        manager_storage["manager"] = None
+
+
+@app.get("/status", response_model=Dict[str, Any])
+def stream_status(manager_storage = Depends(get_manager_storage)):
+    """State, PID and restart count of every process of the active stream."""
+    stream_manager: StreamManager = manager_storage["manager"]
+    if stream_manager is None:
+        raise HTTPException(status_code=404, detail="No active stream.")
+    return stream_manager.status()
+
+
+@app.get("/streams", response_model=Dict[str, Any])
+def list_streams(registry: StreamRegistry = Depends(get_stream_registry)):
+    """Status of every running stream, by camera."""
+    return registry.status()
+
+
+@app.post("/streams/{cam}/start", response_model=str)
+def start_cam_stream(cam: CamType, settings: StreamSettings, registry: StreamRegistry = Depends(get_stream_registry)):
+    """Start the stream of one camera eye, the streams of the other eyes keep running."""
+    if settings.cam != cam:
+        raise HTTPException(status_code=400, detail=f"Settings are for {settings.cam}, not {cam}.")
+    return _start_registered(settings, registry)
+
+
+@app.put("/streams/{cam}/stop", response_model=str)
+def stop_cam_stream(cam: CamType, manager_storage = Depends(get_manager_storage),
+                    registry: StreamRegistry = Depends(get_stream_registry)):
+    """Stop the stream of one camera eye."""
+    stream_manager = _get_registered(cam, registry)
+    if manager_storage["manager"] is stream_manager:
+        manager_storage["manager"] = None
+    return registry.stop(stream_manager)
+
+
+@app.put("/streams/{cam}", response_model=Dict[str, List[str]])
+def reconfigure_cam_stream(cam: CamType, settings: StreamSettings,
+                           registry: StreamRegistry = Depends(get_stream_registry)):
+    """
+    Change the settings of a running stream, only the processes affected by the change are restarted.
+    Returns the restarted processes by camera, the other eye follows changes of the shared camera settings.
+    """
+    if settings.cam != cam:
+        raise HTTPException(status_code=400, detail=f"Settings are for {settings.cam}, not {cam}.")
+    try:
+        return registry.reconfigure(_get_registered(cam, registry), settings)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/streams/{cam}", response_model=Dict[str, Any])
+def cam_stream_status(cam: CamType, registry: StreamRegistry = Depends(get_stream_registry)):
+    """State, PID and restart count of every process of one camera eye's stream."""
+    return _get_registered(cam, registry).status()
+
+
+@app.get("/streams/{cam}/logs", response_model=Dict[str, List[str]])
+def cam_stream_logs(cam: CamType, lines: Optional[int] = Query(None, ge=1),
+                    registry: StreamRegistry = Depends(get_stream_registry)):
+    """The last output lines of every process of one camera eye's stream."""
+    return _get_registered(cam, registry).logs(lines)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics(registry: StreamRegistry = Depends(get_stream_registry)):
+    """Frame rate, speed, dropped and duplicated frames and restarts of every running process, for Prometheus."""
+    return PlainTextResponse(render_metrics(registry), media_type="text/plain; version=0.0.4")
+
+
+def _start_registered(settings: StreamSettings, registry: StreamRegistry) -> str:
+    try:
+        return registry.start(settings)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except SourceConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _get_registered(cam: CamType, registry: StreamRegistry) -> StreamManager:
+    stream_manager = registry.get(cam)
+    if stream_manager is None:
+        raise HTTPException(status_code=404, detail=f"No active stream for {cam}.")
+    return stream_manager
@@ -0,0 +1,234 @@
+import os
+import time
+import select
+import logging
+import threading
+import subprocess
+from enum import StrEnum
+from typing import Callable, Dict, List, Optional
+from .log_drain import ProcessLog
+
+logger = logging.getLogger("Supervisor")
+
+
+class StageState(StrEnum):
+    STOPPED = "stopped"
+    RUNNING = "running"
+    RESTARTING = "restarting"
+
+
+class Stage:
+    """
+    One process of a streaming pipeline and the command it's (re)started with.
+    The optional readiness probe tells when the stages reading from this one can be started.
+    """
+    def __init__(self, name: str, command: List[str], probe=None, ready_timeout: float = 10.0):
+        self.name: str = name
+        self.command: List[str] = command
+        self.probe = probe
+        self.ready_timeout: float = ready_timeout
+        self.process: Optional[subprocess.Popen] = None
+        self.log: Optional[ProcessLog] = None
+        self.state: StageState = StageState.STOPPED
+        self.restarts: int = 0
+        self.last_exit_code: Optional[int] = None
+
+    def status(self) -> Dict:
+        return {
+            "name": self.name,
+            "pid": self.process.pid if self.process is not None else None,
+            "state": self.state,
+            "restarts": self.restarts,
+            "last_exit_code": self.last_exit_code,
+        }
+
+
+class _Watch:
+    """Supervision state of one stage."""
+    def __init__(self, stage: Stage, restart: Callable[[Stage], None]):
+        self.stage = stage
+        self.restart = restart
+        self.pidfd: Optional[int] = None
+        self.started_at: float = time.monotonic()
+        self.backoff: float = 0.0
+        self.restart_at: Optional[float] = None
+
+
+class Supervisor:
+    """
+    Watches the processes of the streaming pipelines and restarts a stage that exited on its own.
+    Exits are noticed through a pidfd per process (polled every 'poll_interval' where pidfds aren't available).
+    A failed stage is restarted after 'min_backoff' seconds, the delay doubles up to 'max_backoff' while the stage
+    keeps failing within 'stable_after' seconds of its start.
+    """
+    def __init__(self, min_backoff: float = 0.1, max_backoff: float = 5.0, stable_after: float = 10.0,
+                 poll_interval: float = 0.5):
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self.poll_interval = poll_interval
+        self._watches: Dict[int, _Watch] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake_r, self._wake_w = -1, -1
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Starts the supervision thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._wake_r, self._wake_w = os.pipe()
+        self._thread = threading.Thread(target=self._run, name="stream-supervisor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the supervision thread, the watched processes keep running."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake()
+        self._thread.join()
+        self._thread = None
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+        with self._lock:
+            for watch in self._watches.values():
+                _close_pidfd(watch)
+
+    def watch(self, stage: Stage, restart: Callable[[Stage], None]):
+        """Supervises the running process of a stage, 'restart' is called to start it again after it exited."""
+        watch = _Watch(stage, restart)
+        watch.pidfd = _open_pidfd(stage.process)
+        stage.state = StageState.RUNNING
+        with self._lock:
+            old_watch = self._watches.pop(id(stage), None)
+            if old_watch is not None:
+                _close_pidfd(old_watch)
+            self._watches[id(stage)] = watch
+        self._wake()
+
+    def unwatch(self, stage: Stage):
+        """Stops supervising a stage, e.g. before it's stopped on purpose."""
+        with self._lock:
+            watch = self._watches.pop(id(stage), None)
+            if watch is not None:
+                _close_pidfd(watch)
+
+    def is_watching(self, stage: Stage) -> bool:
+        with self._lock:
+            return id(stage) in self._watches
+
+    def _wake(self):
+        if self._wake_w >= 0:
+            try:
+                os.write(self._wake_w, b"\0")
+            except OSError:
+                pass
+
+    def _run(self):
+        while not self._stop.is_set():
+            readable = self._wait()
+            if self._stop.is_set():
+                return
+            if self._wake_r in readable:
+                os.read(self._wake_r, 4096)
+
+            now = time.monotonic()
+            with self._lock:
+                watches = list(self._watches.values())
+            for watch in watches:
+                if watch.restart_at is None:
+                    self._check_exit(watch, watch.pidfd in readable, now)
+                elif now >= watch.restart_at:
+                    self._restart(watch)
+
+    def _wait(self) -> List[int]:
+        """Waits until a process exits, a restart is due or the watches changed."""
+        with self._lock:
+            pidfds = [w.pidfd for w in self._watches.values() if w.pidfd is not None and w.restart_at is None]
+            restart_times = [w.restart_at for w in self._watches.values() if w.restart_at is not None]
+            polled = any(w.pidfd is None and w.restart_at is None for w in self._watches.values())
+
+        timeout = self.poll_interval if polled else None
+        if restart_times:
+            until_restart = max(0.0, min(restart_times) - time.monotonic())
+            timeout = until_restart if timeout is None else min(timeout, until_restart)
+        readable, _, _ = select.select(pidfds + [self._wake_r], [], [], timeout)
+        return readable
+
+    def _check_exit(self, watch: _Watch, pidfd_ready: bool, now: float):
+        stage = watch.stage
+        exit_code = stage.process.poll()
+        if exit_code is None:
+            if pidfd_ready:
+                # Not our child after all, fall back to polling
+                with self._lock:
+                    _close_pidfd(watch)
+            return
+
+        with self._lock:
+            if self._watches.get(id(stage)) is not watch:
+                return
+            _close_pidfd(watch)
+            if now - watch.started_at >= self.stable_after:
+                watch.backoff = self.min_backoff
+            else:
+                watch.backoff = min(max(watch.backoff * 2, self.min_backoff), self.max_backoff)
+            watch.restart_at = now + watch.backoff
+            stage.state = StageState.RESTARTING
+            stage.last_exit_code = exit_code
+        logger.error(f"{stage.name} (PID {stage.process.pid}) exited with code {exit_code}, "
+                     f"restarting in {watch.backoff:.1f}s")
+
+    def _restart(self, watch: _Watch):
+        stage = watch.stage
+        try:
+            watch.restart(stage)
+        except Exception as e:
+            logger.error(f"Failed to restart {stage.name}: {e}")
+            with self._lock:
+                watch.backoff = min(max(watch.backoff * 2, self.min_backoff), self.max_backoff)
+                watch.restart_at = time.monotonic() + watch.backoff
+            return
+
+        with self._lock:
+            if self._watches.get(id(stage)) is not watch:
+                # Unwatched while restarting, the stage was stopped on purpose
+                return
+            watch.pidfd = _open_pidfd(stage.process)
+            watch.started_at = time.monotonic()
+            watch.restart_at = None
+            stage.restarts += 1
+            stage.state = StageState.RUNNING
+        logger.info(f"Restarted {stage.name}: PID {stage.process.pid}")
+
+
+def _open_pidfd(process: Optional[subprocess.Popen]) -> Optional[int]:
+    """Returns a descriptor that becomes readable when the process exits, None if pidfds aren't supported."""
+    if process is None or not hasattr(os, "pidfd_open") or not isinstance(process.pid, int):
+        return None
+    try:
+        return os.pidfd_open(process.pid)
+    except OSError:
+        return None
+
+
+def _close_pidfd(watch: _Watch):
+    if watch.pidfd is not None:
+        os.close(watch.pidfd)
+        watch.pidfd = None
+
+
+_supervisor: Optional[Supervisor] = None
+_supervisor_lock = threading.Lock()
+
+
+def get_supervisor() -> Supervisor:
+    """Returns the process-wide supervisor, started on first use."""
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is None:
+            _supervisor = Supervisor()
+            _supervisor.start()
+        return _supervisor
@@ -0,0 +1,99 @@
+import logging
+import pytest
+from unittest.mock import MagicMock
+from src.adaptive import AdaptiveQuality
+from src.models import StreamSettings, CamType, QualityProfile, SplitMode
+from src.registry import StreamRegistry
+
+
+@pytest.fixture
+def registry(mocker):
+    def new_process(command, **kwargs):
+        process = MagicMock()
+        process.pid = 1000
+        process.poll.return_value = None
+        return process
+
+    mocker.patch('src.pipeline.subprocess.Popen', side_effect=new_process)
+    mocker.patch('src.pipeline.wait_ready', return_value=True)
+    return StreamRegistry(supervisor=MagicMock())
+
+
+def _start(registry, adaptive=True, quality=QualityProfile.ARCHIVAL, split_mode=SplitMode.TRANSCODE):
+    for cam in (CamType.CAML1, CamType.CAMR1):
+        registry.start(StreamSettings(cam=cam, cam_path="/dev/video0", fps=30, width=3840, height=1080,
+                                      quality=quality, adaptive=adaptive, split_mode=split_mode))
+    return registry.pipelines.get("/dev/video10")
+
+
+def _set_speed(pipeline, speed):
+    reader = MagicMock()
+    reader.metrics.return_value = {"speed": speed}
+    pipeline.stages[-1].probe.reader = reader
+
+
+def test_steps_down_after_being_slow(registry):
+    pipeline = _start(registry)
+    _set_speed(pipeline, 0.8)
+    adaptive = AdaptiveQuality(registry, slow_for=5.0)
+
+    adaptive.check(now=100.0)
+    adaptive.check(now=104.0)
+    assert pipeline.settings.quality == QualityProfile.ARCHIVAL
+
+    adaptive.check(now=105.0)
+    assert pipeline.settings.quality == QualityProfile.BALANCED
+    # Both eyes follow
+    for cam in (CamType.CAML1, CamType.CAMR1):
+        assert registry.get(cam).settings.quality == QualityProfile.BALANCED
+
+
+def test_recovery_resets_the_timer(registry):
+    pipeline = _start(registry)
+    adaptive = AdaptiveQuality(registry, slow_for=5.0)
+
+    _set_speed(pipeline, 0.8)
+    adaptive.check(now=100.0)
+    _set_speed(pipeline, 1.0)
+    adaptive.check(now=103.0)
+    _set_speed(pipeline, 0.8)
+    adaptive.check(now=106.0)
+    adaptive.check(now=110.0)
+
+    assert pipeline.settings.quality == QualityProfile.ARCHIVAL
+
+
+@pytest.mark.parametrize("adaptive, quality", [(False, QualityProfile.ARCHIVAL),
+                                               (True, QualityProfile.LOW_LATENCY)])
+def test_not_stepped_down(registry, adaptive, quality):
+    pipeline = _start(registry, adaptive=adaptive, quality=quality)
+    _set_speed(pipeline, 0.5)
+    checker = AdaptiveQuality(registry, slow_for=0.0)
+
+    checker.check(now=100.0)
+
+    assert pipeline.settings.quality == quality
+
+
+def test_unknown_speed_ignored(registry):
+    pipeline = _start(registry)
+    _set_speed(pipeline, None)
+    AdaptiveQuality(registry, slow_for=0.0).check(now=100.0)
+    assert pipeline.settings.quality == QualityProfile.ARCHIVAL
+
+
+def test_lossless_split_not_stepped_down(registry, mocker, caplog):
+    mocker.patch("src.pipeline.mjpeg_crop.available", return_value=True)
+    pipeline = _start(registry, split_mode=SplitMode.LOSSLESS)
+    _set_speed(pipeline, 0.5)
+    reconfigure = mocker.spy(registry, "reconfigure")
+    adaptive = AdaptiveQuality(registry, slow_for=5.0)
+
+    with caplog.at_level(logging.WARNING, logger="StreamManager"):
+        for now in (100.0, 105.0, 110.0, 115.0):
+            adaptive.check(now=now)
+
+    reconfigure.assert_not_called()
+    assert pipeline.settings.quality == QualityProfile.ARCHIVAL
+    # Logged once while it stays slow
+    assert len([record for record in caplog.records if "lossless split" in record.message]) == 1
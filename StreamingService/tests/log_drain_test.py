@@ -0,0 +1,79 @@
+import sys
+import subprocess
+import pytest
+from src.log_drain import LogDrain, ProcessLog, _split_lines
+
+
+@pytest.fixture
+def drain():
+    drain = LogDrain()
+    drain.start()
+    yield drain
+    drain.stop()
+
+
+def _run(drain, source, max_lines=200, **log_args):
+    process = subprocess.Popen([sys.executable, "-c", source], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    log = ProcessLog("test", process.pid, max_lines=max_lines, **log_args)
+    return process, log
+
+
+def test_process_writing_more_than_the_pipe_buffer_keeps_running(drain):
+    # 1 MiB on both pipes would block the process after 64 KiB if the pipes weren't read
+    source = "import sys\nfor i in range(8192):\n    print('x' * 127, file=sys.stderr)\n    print('y' * 127)\nprint('done', file=sys.stderr)"
+    process, log = _run(drain, source, max_lines=10)
+    stdout_lines = []
+    log.on_stdout(stdout_lines.append)
+    drain.drain(process, log)
+
+    assert process.wait(5) == 0
+    assert log.closed.wait(5)
+    assert len(stdout_lines) == 8192
+    assert len(log.tail()) == 10
+    assert log.tail(1) == ["done"]
+
+
+def test_stdout_lines_passed_to_handler(drain):
+    process, log = _run(drain, "import sys\nprint('frame=1\\nframe=2')\nprint('error', file=sys.stderr)")
+    stdout_lines = []
+    log.on_stdout(stdout_lines.append)
+    drain.drain(process, log)
+
+    assert log.closed.wait(5)
+    assert stdout_lines == ["frame=1", "frame=2"]
+    assert log.tail() == ["error"]
+
+
+def test_unterminated_last_line_kept(drain):
+    process, log = _run(drain, "import sys\nsys.stderr.write('first\\nlast')")
+    drain.drain(process, log)
+
+    assert log.closed.wait(5)
+    assert log.tail() == ["first", "last"]
+
+
+def test_logging_rate_limited(mocker):
+    mock_logger = mocker.patch("src.log_drain.logger")
+    log = ProcessLog("test", 1, rate=0.0, burst=3)
+
+    for i in range(10):
+        log.add(f"line {i}")
+    log.close()
+
+    assert len(log.tail()) == 10
+    logged = [call.args[0] for call in mock_logger.info.call_args_list]
+    assert logged == ["[test 1] line 0", "[test 1] line 1", "[test 1] line 2", "[test 1] 7 lines not logged"]
+
+
+def test_split_lines():
+    assert _split_lines(b"a\nb\rc\r\nd") == (["a", "b", "c"], b"d")
+    lines, rest = _split_lines(b"x" * 5000)
+    assert lines == ["x" * 4096] and rest == b""
+
+
+def test_process_without_pipes_closed_right_away(drain):
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    log = ProcessLog("test", process.pid)
+    drain.drain(process, log)
+    process.wait()
+    assert log.closed.is_set()
@@ -3,6 +3,7 @@ import subprocess
 from unittest.mock import MagicMock
 from src.manager import StreamManager
 from src.models import StreamSettings, CamType
+from src.supervisor import StageState
 
 @pytest.mark.parametrize("cam_type, expected_port, expected_proxy, expected_vdev", [
     (CamType.CAMR1, 8003, "/dev/video10", "/dev/video11"),
@@ -35,7 +36,11 @@ class TestStreamManagerActions:
         # Create a mock process object that Popen will return
         mock_process = MagicMock()
         mock_process.pid = 1234
+        # Still running, otherwise the supervisor restarts it
+        mock_process.poll.return_value = None
         mock_popen.return_value = mock_process
+        # The mocked processes never produce frames, treat every stage as ready
+        mocker.patch('src.pipeline.wait_ready', return_value=True)
         
         yield {
             "popen": mock_popen,
@@ -73,7 +78,12 @@ class TestStreamManagerActions:
         # 2. Check the ffmpeg split command
         cmd_split = calls[1].args[0]
         assert cmd_split[0] == "ffmpeg"
-        assert cmd_split[12] == "crop=1920:1080:0:0"  # <-- Left crop (x=0)
+        # One split feeds both eyes: left crop (x=0) and right crop (x=1920)
+        assert cmd_split[11] == "-filter_complex"
+        assert "[left]crop=1920:1080:0:0[leftout]" in cmd_split[12]
+        assert "[right]crop=1920:1080:1920:0[rightout]" in cmd_split[12]
+        assert cmd_split[cmd_split.index("[leftout]") + 7] == "/dev/video12"
+        assert cmd_split[cmd_split.index("[rightout]") + 7] == "/dev/video11"
 
         # 3. Check the ustreamer command
         cmd_ustreamer = calls[2].args[0]
@@ -134,4 +144,122 @@ class TestStreamManagerActions:
         manager = StreamManager()
         
         with pytest.raises(RuntimeError, match="No running processes to stop."):
-            manager.stop_stream()
\ No newline at end of file
+            manager.stop_stream()
+
+    def test_stages_supervised_and_restarted_alone(self, mock_process):
+        """
+        Verify that every stage is handed to the supervisor and a restart only starts the failed stage again.
+        """
+        supervisor = MagicMock()
+        manager = StreamManager(supervisor=supervisor)
+        manager.start_stream()
+        assert supervisor.watch.call_count == 3
+
+        split_stage = manager.stages[1]
+        restart = supervisor.watch.call_args_list[1].args[1]
+        # The supervisor saw the split exit
+        split_stage.state = StageState.RESTARTING
+        restart(split_stage)
+
+        mock_popen = mock_process["popen"]
+        assert mock_popen.call_count == 4
+        assert mock_popen.call_args_list[3].args[0] == split_stage.command
+
+        manager.stop_stream()
+        assert supervisor.unwatch.call_count == 3
+        restart(split_stage)
+        assert mock_popen.call_count == 4
+
+
+    def test_restart_skipped_for_stages_reconfigure_replaced(self, mock_process):
+        """
+        Verify that a restart the supervisor asked for while a reconfigure respawned the stage doesn't start
+        a second process for it.
+        """
+        supervisor = MagicMock()
+        supervisor.watch.side_effect = lambda stage, restart: setattr(stage, "state", StageState.RUNNING)
+        manager = StreamManager(supervisor=supervisor)
+        manager.start_stream()
+        _, split, ustreamer = manager.stages
+        # Both exited, their restarts wait for the lock the reconfigure holds
+        split.state = ustreamer.state = StageState.RESTARTING
+
+        manager.reconfigure(manager.settings.model_copy(update={"fps": 15}))
+        mock_popen = mock_process["popen"]
+        assert mock_popen.call_count == 6
+
+        manager.pipeline._restart_stage(split)
+        manager._restart_stage(ustreamer)
+        assert mock_popen.call_count == 6
+
+
+    def test_reconfigure_restarts_only_changed_stages(self, mock_process):
+        """
+        Verify that changing the camera device only restarts the proxy, the split and ustreamer keep running.
+        """
+        supervisor = MagicMock()
+        manager = StreamManager(supervisor=supervisor)
+        manager.start_stream()
+        proxy, split, ustreamer = manager.stages
+        mock_popen = mock_process["popen"]
+        mock_process["process"].terminate.reset_mock()
+
+        new_settings = manager.settings.model_copy(update={"cam_path": "/dev/video2"})
+        restarted = manager.reconfigure(new_settings)
+
+        assert restarted == ["ffmpeg proxy"]
+        assert mock_popen.call_count == 4
+        assert "/dev/video2" in mock_popen.call_args_list[3].args[0]
+        assert mock_process["process"].terminate.call_count == 1
+        assert manager.stages == [proxy, split, ustreamer]
+        assert manager.settings == new_settings
+        supervisor.watch.assert_called_with(proxy, manager.pipeline._restart_stage)
+
+
+    def test_reconfigure_fps_restarts_every_stage_in_order(self, mock_process):
+        """
+        Verify that a frame rate change restarts all stages, upstream first.
+        """
+        manager = StreamManager(supervisor=MagicMock())
+        manager.start_stream()
+
+        restarted = manager.reconfigure(manager.settings.model_copy(update={"fps": 15}))
+
+        assert restarted == ["ffmpeg proxy", "ffmpeg split", "ustreamer"]
+        commands = [call.args[0] for call in mock_process["popen"].call_args_list[3:]]
+        assert [command[0] for command in commands] == ["ffmpeg", "ffmpeg", "ustreamer"]
+        assert all("15" in command for command in commands)
+
+
+    def test_reconfigure_unchanged_settings(self, mock_process):
+        manager = StreamManager(supervisor=MagicMock())
+        manager.start_stream()
+
+        assert manager.reconfigure(manager.settings.model_copy()) == []
+        assert mock_process["popen"].call_count == 3
+
+
+    def test_reconfigure_failure_restores_previous_commands(self, mock_process):
+        """
+        Verify that a stage failing with the new settings is started with its old command again.
+        """
+        manager = StreamManager(supervisor=MagicMock())
+        manager.start_stream()
+        old_settings = manager.settings
+        old_command = manager.stages[0].command
+        mock_popen = mock_process["popen"]
+        mock_popen.side_effect = [subprocess.SubprocessError("no such device"), mock_process["process"]]
+
+        with pytest.raises(RuntimeError, match="Failed to reconfigure ffmpeg proxy"):
+            manager.reconfigure(old_settings.model_copy(update={"cam_path": "/dev/missing"}))
+
+        assert mock_popen.call_args_list[-1].args[0] == old_command
+        assert manager.stages[0].command == old_command
+        assert manager.settings == old_settings
+        assert manager.pipeline.settings == old_settings
+
+
+    def test_reconfigure_not_running(self):
+        manager = StreamManager()
+        with pytest.raises(RuntimeError, match="No running processes to reconfigure."):
+            manager.reconfigure(manager.settings)
@@ -0,0 +1,53 @@
+import pytest
+from unittest.mock import MagicMock
+from src.metrics import render_metrics
+from src.models import StreamSettings, CamType
+from src.registry import StreamRegistry
+
+
+@pytest.fixture
+def registry(mocker):
+    def new_process(command, **kwargs):
+        process = MagicMock()
+        process.pid = 1000
+        process.poll.return_value = None
+        return process
+
+    mocker.patch('src.pipeline.subprocess.Popen', side_effect=new_process)
+    mocker.patch('src.pipeline.wait_ready', return_value=True)
+    return StreamRegistry(supervisor=MagicMock())
+
+
+def _settings(cam):
+    return StreamSettings(cam=cam, cam_path="/dev/video0", fps=30, width=3840, height=1080)
+
+
+def test_metrics_of_running_stages(registry):
+    registry.start(_settings(CamType.CAML1))
+    registry.start(_settings(CamType.CAMR1))
+    split = registry.pipelines.get("/dev/video10").stages[1]
+    split.restarts = 2
+    for line in ["frame=90", "out_time_us=3000000", "drop_frames=4", "dup_frames=0", "bitrate=N/A", "progress=continue"]:
+        split.probe.reader.feed(line)
+
+    text = render_metrics(registry)
+
+    assert 'streaming_camera_target_fps{camera="/dev/video10"} 30' in text
+    assert 'streaming_stage_up{camera="/dev/video10",eye="",stage="ffmpeg split"} 1' in text
+    assert 'streaming_stage_up{camera="/dev/video10",eye="caml1",stage="ustreamer"} 1' in text
+    assert 'streaming_stage_up{camera="/dev/video10",eye="camr1",stage="ustreamer"} 1' in text
+    assert 'streaming_stage_restarts_total{camera="/dev/video10",eye="",stage="ffmpeg split"} 2' in text
+    assert 'streaming_stage_frames_total{camera="/dev/video10",eye="",stage="ffmpeg split"} 90' in text
+    assert 'streaming_stage_dropped_frames_total{camera="/dev/video10",eye="",stage="ffmpeg split"} 4' in text
+    assert "# TYPE streaming_stage_restarts_total counter" in text
+    # A single report isn't enough for a rate, and ffmpeg didn't know the bitrate
+    assert "streaming_stage_fps" not in text
+    assert "streaming_stage_bitrate_kbps" not in text
+    # Shared stages are only reported once per metric
+    samples = [line for line in text.splitlines() if not line.startswith("#")]
+    assert len(samples) == len(set(samples))
+    assert text.count('stage="ffmpeg proxy"') == 5
+
+
+def test_metrics_without_streams(registry):
+    assert render_metrics(registry) == "\n"
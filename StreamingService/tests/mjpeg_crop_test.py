@@ -0,0 +1,188 @@
+import io
+import os
+import sys
+import time
+import signal
+import argparse
+import subprocess
+import pytest
+from unittest.mock import MagicMock
+from src import mjpeg_crop
+from src.mjpeg_crop import JpegFrameReader
+from src.models import StreamSettings, CamType, SplitMode
+from src.pipeline import CameraPipeline, READY_TIMEOUTS
+
+
+def _segment(marker, payload):
+    return bytes([0xFF, marker]) + (len(payload) + 2).to_bytes(2, "big") + payload
+
+
+def _jpeg(index):
+    """A frame with the structure of a JPEG: an end marker in the APP1 payload and stuffed bytes in the scan."""
+    return (b"\xff\xd8"
+            + _segment(0xE0, b"JFIF\x00")
+            + _segment(0xE1, b"thumbnail \xff\xd8\xff\xd9")
+            + _segment(0xDB, bytes(65))
+            + _segment(0xDA, b"\x03\x01\x00\x02\x11\x03\x11\x00\x3f\x00")
+            + bytes([index]) * 100 + b"\xff\x00" + b"\xff\xd0" + bytes([index]) * 50
+            + b"\xff\xd9")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 65536])
+def test_frames_split_from_stream(chunk_size):
+    frames = [_jpeg(i) for i in range(5)]
+    stream = io.BytesIO(b"garbage\xff" + frames[0] + frames[1] + b"\x00\x00" + b"".join(frames[2:]))
+
+    assert list(JpegFrameReader(stream, chunk_size)) == frames
+
+
+def test_broken_frame_skipped():
+    broken = b"\xff\xd8\x00\x11 no marker here"
+    stream = io.BytesIO(_jpeg(1) + broken + _jpeg(2))
+
+    assert list(JpegFrameReader(stream, 16)) == [_jpeg(1), _jpeg(2)]
+
+
+def test_truncated_last_frame_dropped():
+    stream = io.BytesIO(_jpeg(1) + _jpeg(2)[:-20])
+    assert list(JpegFrameReader(stream)) == [_jpeg(1)]
+
+
+class HalvingCropper:
+    """Stands in for the turbojpeg crop: the halves are the frame with a left and right marker."""
+    def __init__(self, width, height):
+        pass
+
+    def crop(self, frame):
+        return [b"L" + frame, b"R" + frame]
+
+
+@pytest.mark.skipif(not mjpeg_crop.available(), reason="PyTurboJPEG or libjpeg-turbo not installed")
+def test_crop_real_jpeg():
+    image = pytest.importorskip("PIL.Image")
+    stereo = image.new("RGB", (64, 32), (255, 0, 0))
+    stereo.paste((0, 0, 255), (32, 0, 64, 32))
+    frame = io.BytesIO()
+    # 4:2:0 subsampling like the camera's MJPEG, its MCUs are 16x16
+    stereo.save(frame, "JPEG", quality=90, subsampling=2)
+
+    left, right = mjpeg_crop.StereoCropper(64, 32).crop(frame.getvalue())
+
+    for half, color in [(left, (255, 0, 0)), (right, (0, 0, 255))]:
+        decoded = image.open(io.BytesIO(half))
+        decoded.load()
+        assert decoded.size == (32, 32)
+        assert all(abs(a - b) < 16 for a, b in zip(decoded.getpixel((16, 16)), color))
+
+
+def _stub(path, source):
+    path.write_text(f"#!{sys.executable}\n{source}")
+    path.chmod(0o755)
+    return str(path)
+
+
+def test_run_crops_every_frame_to_both_eyes(tmp_path, mocker, capsys):
+    frames = tmp_path / "frames.mjpeg"
+    frames.write_bytes(b"".join(_jpeg(i) for i in range(10)))
+    # Reads the recorded frames like the proxy reader, copies stdin to the output device like the eye writers
+    ffmpeg = _stub(tmp_path / "ffmpeg", f"""
+import sys, shutil
+if "pipe:1" in sys.argv:
+    sys.stdout.buffer.write(open({str(frames)!r}, "rb").read())
+else:
+    with open(sys.argv[-1], "wb") as output:
+        shutil.copyfileobj(sys.stdin.buffer, output)
+""")
+    mocker.patch("src.mjpeg_crop.StereoCropper", HalvingCropper)
+    left, right = tmp_path / "left", tmp_path / "right"
+    args = argparse.Namespace(ffmpeg=ffmpeg, input="/dev/video10", size="3840x1080", fps=30,
+                              left=str(left), right=str(right))
+
+    # The recorded feed ends, in the pipeline the stage would be restarted
+    assert mjpeg_crop.run(args) == 1
+
+    assert left.read_bytes() == b"".join(b"L" + _jpeg(i) for i in range(10))
+    assert right.read_bytes() == b"".join(b"R" + _jpeg(i) for i in range(10))
+    progress = capsys.readouterr().out.splitlines()
+    assert progress[0] == "frame=1"
+    assert progress[-5:] == ["frame=10", "out_time_us=333333", "dup_frames=0", "drop_frames=0", "progress=end"]
+
+
+def _alive(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            # Zombies are dead, only their parent didn't reap them yet
+            return stat.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def test_readers_and_writers_die_with_killed_stage(tmp_path):
+    pids = tmp_path / "pids"
+    pids.mkdir()
+    # The reader and the writers record their PID and hang, like ffmpeg on a stalled device
+    ffmpeg = _stub(tmp_path / "ffmpeg", f"""
+import os, time
+open(os.path.join({str(pids)!r}, str(os.getpid())), "w").close()
+time.sleep(60)
+""")
+    stage = _stub(tmp_path / "stage", f"""
+import sys
+sys.path.insert(0, {os.getcwd()!r})
+from src import mjpeg_crop
+mjpeg_crop.StereoCropper = lambda width, height: None
+sys.exit(mjpeg_crop.main(["--ffmpeg", {ffmpeg!r}, "--input", "/dev/video10", "--size", "3840x1080", "--fps", "30",
+                          "--left", "/dev/video12", "--right", "/dev/video11"]))
+""")
+    process = subprocess.Popen([stage], stdout=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 5
+        while len(os.listdir(pids)) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        children = [int(pid) for pid in os.listdir(pids)]
+        assert len(children) == 3
+
+        # SIGKILL skips the cleanup of the stage
+        process.send_signal(signal.SIGKILL)
+        process.wait()
+
+        deadline = time.monotonic() + 5
+        while any(map(_alive, children)) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert not any(map(_alive, children))
+    finally:
+        process.kill()
+        process.wait()
+
+
+def _pipeline():
+    return CameraPipeline("/dev/video10", MagicMock(), dict(READY_TIMEOUTS))
+
+
+def _settings(width=3840):
+    return StreamSettings(cam=CamType.CAML1, cam_path="/dev/video0", fps=30, width=width, height=1080,
+                          split_mode=SplitMode.LOSSLESS)
+
+
+def test_lossless_split_stage(mocker):
+    mocker.patch("src.pipeline.mjpeg_crop.available", return_value=True)
+
+    proxy, split = _pipeline()._build_stages(_settings())
+
+    assert proxy.name == "ffmpeg proxy"
+    assert split.name == "mjpeg crop"
+    assert split.command[:2] == [sys.executable, mjpeg_crop.__file__]
+    assert split.command[split.command.index("--left") + 1] == "/dev/video12"
+    assert split.command[split.command.index("--right") + 1] == "/dev/video11"
+
+
+def test_lossless_split_needs_turbojpeg(mocker):
+    mocker.patch("src.pipeline.mjpeg_crop.available", return_value=False)
+    with pytest.raises(ValueError, match="PyTurboJPEG"):
+        _pipeline()._build_stages(_settings())
+
+
+def test_lossless_split_needs_mcu_aligned_eyes(mocker):
+    mocker.patch("src.pipeline.mjpeg_crop.available", return_value=True)
+    with pytest.raises(ValueError, match="multiple of 16"):
+        _pipeline()._build_stages(_settings(width=1000))
@@ -0,0 +1,169 @@
+import sys
+import time
+import signal
+import subprocess
+import pytest
+from unittest.mock import MagicMock
+from src.supervisor import Stage
+from src.manager import StreamManager
+from src.models import StreamSettings, CamType
+from src.pipeline import CameraPipelines, KILL_TIMEOUT, READY_TIMEOUTS, SourceConflict, stop_stages
+from src.registry import StreamRegistry
+
+
+@pytest.fixture
+def mock_popen(mocker):
+    """Every Popen call returns a new running process."""
+    def new_process(command, **kwargs):
+        process = MagicMock()
+        process.pid = 1000 + mock.call_count
+        process.poll.return_value = None
+        process.command = command
+        return process
+
+    mock = mocker.patch('src.pipeline.subprocess.Popen', side_effect=new_process)
+    mocker.patch('src.pipeline.wait_ready', return_value=True)
+    return mock
+
+
+@pytest.fixture
+def pipelines():
+    return CameraPipelines(MagicMock(), dict(READY_TIMEOUTS))
+
+
+def _settings(cam, fps=30):
+    return StreamSettings(cam=cam, cam_path="/dev/video0", fps=fps, width=3840, height=1080)
+
+
+def _manager(cam, pipelines, fps=30):
+    return StreamManager(_settings(cam, fps), supervisor=pipelines.supervisor, pipelines=pipelines)
+
+
+def test_eyes_share_proxy_and_split(mock_popen, pipelines):
+    left = _manager(CamType.CAML1, pipelines)
+    right = _manager(CamType.CAMR1, pipelines)
+    left.start_stream()
+    right.start_stream()
+
+    commands = [call.args[0][0] for call in mock_popen.call_args_list]
+    assert commands == ["ffmpeg", "ffmpeg", "ustreamer", "ustreamer"]
+    assert left.processes[:2] == right.processes[:2]
+    assert left.processes[2] is not right.processes[2]
+
+
+def test_shared_stages_stopped_with_last_eye(mock_popen, pipelines):
+    left = _manager(CamType.CAML1, pipelines)
+    right = _manager(CamType.CAMR1, pipelines)
+    left.start_stream()
+    right.start_stream()
+    proxy, split, left_ustreamer = left.processes
+
+    left.stop_stream()
+    left_ustreamer.terminate.assert_called_once()
+    proxy.terminate.assert_not_called()
+    split.terminate.assert_not_called()
+    assert len(right.processes) == 3
+
+    right.stop_stream()
+    proxy.terminate.assert_called_once()
+    split.terminate.assert_called_once()
+    assert pipelines.get("/dev/video10").stages == []
+
+
+def test_other_camera_has_own_pipeline(mock_popen, pipelines):
+    _manager(CamType.CAML1, pipelines).start_stream()
+    _manager(CamType.CAML2, pipelines).start_stream()
+    assert mock_popen.call_count == 6
+
+
+def test_eye_with_other_source_settings_rejected(mock_popen, pipelines):
+    _manager(CamType.CAML1, pipelines).start_stream()
+    right = _manager(CamType.CAMR1, pipelines, fps=15)
+
+    with pytest.raises(SourceConflict, match=r"fps 30 \(requested 15\)") as conflict:
+        right.start_stream()
+    assert conflict.value.conflicts == {"fps": (30, 15)}
+    assert right.processes == []
+    assert pipelines.get("/dev/video10").users == {CamType.CAML1}
+
+
+def test_failed_eye_releases_pipeline(mock_popen, pipelines):
+    mock_popen.side_effect = [MagicMock(), MagicMock(), OSError("ustreamer missing")]
+    left = _manager(CamType.CAML1, pipelines)
+
+    with pytest.raises(RuntimeError):
+        left.start_stream()
+    pipeline = pipelines.get("/dev/video10")
+    assert pipeline.users == set()
+    assert pipeline.stages == []
+
+
+def test_reconfigure_eye_followed_by_other_eye(mock_popen):
+    registry = StreamRegistry(supervisor=MagicMock())
+    registry.start(_settings(CamType.CAML1))
+    registry.start(_settings(CamType.CAMR1))
+    left, right = registry.get(CamType.CAML1), registry.get(CamType.CAMR1)
+
+    restarted = registry.reconfigure(left, _settings(CamType.CAML1, fps=15))
+
+    assert restarted == {CamType.CAML1: ["ffmpeg proxy", "ffmpeg split", "ustreamer"],
+                         CamType.CAMR1: ["ustreamer"]}
+    assert right.settings.fps == 15
+    assert mock_popen.call_count == 8
+
+
+def _stage_with(process, name="stage"):
+    stage = Stage(name, [name])
+    stage.process = process
+    return stage
+
+
+def test_stop_signals_readers_first_then_waits():
+    events = []
+    stages = []
+    for name in ("proxy", "split", "ustreamer"):
+        process = MagicMock()
+        process.terminate.side_effect = lambda name=name: events.append(f"terminate {name}")
+        process.wait.side_effect = lambda timeout, name=name: events.append(f"wait {name}")
+        stages.append(_stage_with(process, name))
+
+    stop_stages(stages)
+
+    assert events == ["terminate ustreamer", "terminate split", "terminate proxy",
+                      "wait ustreamer", "wait split", "wait proxy"]
+
+
+def _unkillable_process(pid):
+    """A process stuck in the kernel, e.g. in a V4L2 driver: it survives SIGTERM and SIGKILL."""
+    def wait(timeout=None):
+        time.sleep(timeout)
+        raise subprocess.TimeoutExpired("stage", timeout)
+
+    process = MagicMock(pid=pid)
+    process.wait.side_effect = wait
+    process.poll.return_value = None
+    return process
+
+
+def test_stop_kills_within_a_single_timeout(mocker):
+    """
+    Stages ignoring SIGTERM are killed once the shared timeout passed, not one timeout per stage,
+    and stages that survive SIGKILL share a single wait for being reaped too.
+    """
+    unreaped = mocker.patch("src.pipeline._unreaped", [])
+    ignore_term = "import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); print(flush=True); time.sleep(60)"
+    processes = [subprocess.Popen([sys.executable, "-c", ignore_term], stdout=subprocess.PIPE) for _ in range(3)]
+    for process in processes:
+        process.stdout.readline()
+    stuck = [_unkillable_process(pid) for pid in range(3)]
+
+    start = time.monotonic()
+    stop_stages([_stage_with(process) for process in processes + stuck], timeout=0.3)
+    elapsed = time.monotonic() - start
+
+    # 0.3 seconds for SIGTERM and KILL_TIMEOUT for SIGKILL, not KILL_TIMEOUT per stuck stage
+    assert elapsed < 0.3 + KILL_TIMEOUT + 0.4
+    assert [process.returncode for process in processes] == [-signal.SIGKILL] * 3
+    for process in stuck:
+        process.kill.assert_called_once()
+    assert unreaped == list(reversed(stuck))
@@ -0,0 +1,59 @@
+import pytest
+from src.progress import ProgressReader
+
+
+def _block(frame, out_time_us, speed="1.00x", drop=0, dup=0, bitrate="2345.6kbits/s"):
+    return [f"frame={frame}", "fps=29.97", f"bitrate={bitrate}", f"out_time_us={out_time_us}",
+            f"dup_frames={dup}", f"drop_frames={drop}", f"speed={speed}", "progress=continue"]
+
+
+def _feed(reader, mocker, blocks):
+    """Feeds progress blocks reported one second apart."""
+    monotonic = mocker.patch("src.progress.time.monotonic")
+    for second, block in enumerate(blocks):
+        monotonic.return_value = 100.0 + second
+        for line in block:
+            reader.feed(line)
+
+
+def test_rolling_metrics(mocker):
+    reader = ProgressReader("ffmpeg split")
+    # Real time for 2 seconds, then the stage falls behind to 20 fps and 2/3 speed
+    _feed(reader, mocker, [_block(0, 0), _block(30, 1_000_000), _block(60, 2_000_000, drop=1, dup=2)])
+
+    metrics = reader.metrics()
+    assert metrics["frames"] == 60
+    assert metrics["fps"] == pytest.approx(30.0)
+    assert metrics["speed"] == pytest.approx(1.0)
+    assert metrics["drop_frames"] == 1
+    assert metrics["dup_frames"] == 2
+    assert metrics["bitrate_kbps"] == pytest.approx(2345.6)
+
+
+def test_old_reports_leave_the_window(mocker):
+    reader = ProgressReader("ffmpeg split", window=2.0)
+    blocks = [_block(30 * i, 1_000_000 * i) for i in range(5)]
+    blocks += [_block(120 + 20 * i, 4_000_000 + 666_667 * i) for i in range(1, 4)]
+    _feed(reader, mocker, blocks)
+
+    metrics = reader.metrics()
+    assert metrics["fps"] == pytest.approx(20.0)
+    assert metrics["speed"] == pytest.approx(0.667, abs=0.001)
+
+
+def test_unknown_values(mocker):
+    reader = ProgressReader("ffmpeg proxy")
+    _feed(reader, mocker, [_block(0, "N/A", bitrate="N/A")])
+
+    metrics = reader.metrics()
+    assert metrics["fps"] is None
+    assert metrics["speed"] is None
+    assert metrics["bitrate_kbps"] is None
+
+
+def test_first_frame():
+    reader = ProgressReader("ffmpeg proxy")
+    reader.feed("frame=0")
+    assert not reader.first_frame.is_set()
+    reader.feed("frame=1")
+    assert reader.first_frame.is_set()
@@ -0,0 +1,58 @@
+import pytest
+from unittest.mock import MagicMock
+from src.manager import StreamManager
+from src.models import StreamSettings, CamType, QualityProfile, SplitMode
+from src.pipeline import CameraPipeline, READY_TIMEOUTS
+from src.quality import eye_output, step_down
+
+
+def _settings(**kwargs):
+    return StreamSettings(cam=CamType.CAML1, cam_path="/dev/video0", fps=30, width=3840, height=1080, **kwargs)
+
+
+@pytest.mark.parametrize("quality, expected", [
+    (QualityProfile.ARCHIVAL, (1920, 1080, 30)),
+    (QualityProfile.BALANCED, (1920, 1080, 30)),
+    (QualityProfile.LOW_LATENCY, (960, 540, 15)),
+])
+def test_eye_output(quality, expected):
+    assert eye_output(_settings(quality=quality)) == expected
+
+
+def test_lossless_split_keeps_the_camera_frames():
+    settings = _settings(quality=QualityProfile.LOW_LATENCY, split_mode=SplitMode.LOSSLESS)
+    assert eye_output(settings) == (1920, 1080, 30)
+
+
+def test_step_down():
+    assert step_down(QualityProfile.ARCHIVAL) == QualityProfile.BALANCED
+    assert step_down(QualityProfile.BALANCED) == QualityProfile.LOW_LATENCY
+    assert step_down(QualityProfile.LOW_LATENCY) is None
+
+
+def _split_command(settings):
+    return CameraPipeline("/dev/video10", MagicMock(), dict(READY_TIMEOUTS))._build_stages(settings)[1].command
+
+
+def test_archival_split_unchanged():
+    command = _split_command(_settings())
+    assert command[command.index("[leftout]") + 4] == "1"
+    assert "scale" not in command[command.index("-filter_complex") + 1]
+
+
+def test_low_latency_split():
+    command = _split_command(_settings(quality=QualityProfile.LOW_LATENCY))
+
+    graph = command[command.index("-filter_complex") + 1]
+    assert "[left]crop=1920:1080:0:0,scale=960:540,fps=15[leftout]" in graph
+    assert "[right]crop=1920:1080:1920:0,scale=960:540,fps=15[rightout]" in graph
+    assert command[command.index("[leftout]") + 4] == "10"
+    assert command[command.index("[rightout]") + 4] == "10"
+
+
+def test_ustreamer_follows_the_profile():
+    manager = StreamManager(_settings(quality=QualityProfile.LOW_LATENCY), supervisor=MagicMock())
+    command = manager._build_stages()[0].command
+
+    assert command[command.index("-r") + 1] == "960x540"
+    assert command[command.index("-f") + 1] == "15"
@@ -0,0 +1,109 @@
+import sys
+import time
+import socket
+import pytest
+from unittest.mock import MagicMock
+from src.manager import StreamManager
+from src.models import StreamSettings, CamType
+
+FFMPEG_STUB = """
+import os, sys, time
+# Writes frame=0 until the simulated device delivers frames, like ffmpeg -progress pipe:1
+time.sleep(float(os.environ.get("STUB_FFMPEG_DELAY", "0")))
+frame = 0
+while True:
+    if os.environ.get("STUB_FFMPEG_FRAMES", "1") == "1":
+        frame += 1
+    print(f"frame={frame}\\nfps=30.00\\nspeed=1.00x\\nprogress=continue", flush=True)
+    time.sleep(0.05)
+"""
+
+USTREAMER_STUB = """
+import os, sys, time, socket
+port = int(sys.argv[sys.argv.index("--port") + 1])
+time.sleep(float(os.environ.get("STUB_USTREAMER_DELAY", "0")))
+server = socket.socket()
+server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+server.bind(("127.0.0.1", port))
+server.listen()
+while True:
+    server.accept()[0].close()
+"""
+
+
+def _write_stub(path, source):
+    path.write_text(f"#!{sys.executable}\n{source}")
+    path.chmod(0o755)
+    return str(path)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def stub_manager(tmp_path, mocker, monkeypatch):
+    mocker.patch("src.pipeline.FFMPEG", _write_stub(tmp_path / "ffmpeg", FFMPEG_STUB))
+    mocker.patch("src.manager.USTREAMER", _write_stub(tmp_path / "ustreamer", USTREAMER_STUB))
+    settings = StreamSettings(cam=CamType.CAML1, cam_path="/dev/video0", fps=30, width=3840, height=1080)
+    manager = StreamManager(settings, supervisor=MagicMock(),
+                            ready_timeouts={"ffmpeg proxy": 3.0, "ffmpeg split": 3.0, "ustreamer": 3.0})
+    manager.port = _free_port()
+    yield manager, monkeypatch
+    if manager.stages:
+        manager.stop_stream()
+
+
+@pytest.mark.parametrize("ffmpeg_delay, ustreamer_delay", [(0.0, 0.0), (0.2, 0.1), (0.6, 0.4)])
+def test_stages_started_when_upstream_ready(stub_manager, ffmpeg_delay, ustreamer_delay):
+    manager, monkeypatch = stub_manager
+    monkeypatch.setenv("STUB_FFMPEG_DELAY", str(ffmpeg_delay))
+    monkeypatch.setenv("STUB_USTREAMER_DELAY", str(ustreamer_delay))
+
+    start = time.monotonic()
+    manager.start_stream()
+    elapsed = time.monotonic() - start
+
+    # Both ffmpeg stages and ustreamer are waited for, without any fixed sleep on top
+    assert elapsed >= 2 * ffmpeg_delay + ustreamer_delay
+    assert elapsed < 2 * ffmpeg_delay + ustreamer_delay + 1.5
+    assert all(p.poll() is None for p in manager.processes)
+    assert len(manager.processes) == 3
+
+
+def test_start_fails_when_stage_never_ready(stub_manager):
+    manager, monkeypatch = stub_manager
+    monkeypatch.setenv("STUB_FFMPEG_FRAMES", "0")
+    manager.ready_timeouts["ffmpeg proxy"] = 0.5
+
+    start = time.monotonic()
+    with pytest.raises(RuntimeError, match="Failed to start stream"):
+        manager.start_stream()
+
+    assert time.monotonic() - start < 2
+    assert manager.processes == []
+
+
+def test_start_fails_when_stage_exits(stub_manager, tmp_path, mocker):
+    manager, _ = stub_manager
+    mocker.patch("src.pipeline.FFMPEG", _write_stub(tmp_path / "ffmpeg-broken", "import sys; sys.exit(1)"))
+
+    start = time.monotonic()
+    with pytest.raises(RuntimeError):
+        manager.start_stream()
+    assert time.monotonic() - start < 2
+
+
+def test_stage_output_kept_for_diagnostics(stub_manager, tmp_path, mocker):
+    manager, _ = stub_manager
+    stub = "import sys\nprint('Input #0, video4linux2', file=sys.stderr, flush=True)\n" + FFMPEG_STUB
+    mocker.patch("src.pipeline.FFMPEG", _write_stub(tmp_path / "ffmpeg-verbose", stub))
+
+    manager.start_stream()
+
+    logs = manager.logs()
+    assert logs["ffmpeg proxy"] == ["Input #0, video4linux2"]
+    # The progress lines are parsed, not kept
+    assert logs["ffmpeg split"] == ["Input #0, video4linux2"]
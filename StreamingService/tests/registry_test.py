@@ -0,0 +1,87 @@
+import threading
+import pytest
+from unittest.mock import MagicMock
+from src.models import StreamSettings, CamType
+from src.registry import StreamRegistry
+
+
+@pytest.fixture
+def registry():
+    return StreamRegistry(supervisor=MagicMock())
+
+
+@pytest.fixture
+def mock_manager_class(mocker):
+    def new_manager(settings, **kwargs):
+        manager = MagicMock()
+        manager.settings = settings
+        manager.start_stream.return_value = f"https://host/stream/{settings.cam}/stream"
+        return manager
+
+    return mocker.patch('src.registry.StreamManager', side_effect=new_manager)
+
+
+def _settings(cam):
+    return StreamSettings(cam=cam, cam_path="/dev/video0", fps=30, width=3840, height=1080)
+
+
+def test_streams_share_the_camera_pipelines(registry, mock_manager_class):
+    registry.start(_settings(CamType.CAML1))
+    registry.start(_settings(CamType.CAMR1))
+
+    for call in mock_manager_class.call_args_list:
+        assert call.kwargs["pipelines"] is registry.pipelines
+        assert call.kwargs["supervisor"] is registry.supervisor
+
+
+def test_eye_reserved_while_starting(registry, mocker):
+    started = threading.Event()
+    release = threading.Event()
+    slow_manager = MagicMock()
+    slow_manager.start_stream.side_effect = lambda: (started.set(), release.wait(), "url")[-1]
+    mocker.patch('src.registry.StreamManager', return_value=slow_manager)
+
+    thread = threading.Thread(target=registry.start, args=(_settings(CamType.CAML1),))
+    thread.start()
+    started.wait()
+    try:
+        with pytest.raises(ValueError):
+            registry.start(_settings(CamType.CAML1))
+        assert registry.get(CamType.CAML1) is None
+    finally:
+        release.set()
+        thread.join()
+    assert registry.get(CamType.CAML1) is slow_manager
+
+
+def test_failed_start_frees_the_eye(registry, mocker):
+    failing = MagicMock()
+    failing.start_stream.side_effect = RuntimeError("Failed to start stream for caml1")
+    mocker.patch('src.registry.StreamManager', return_value=failing)
+
+    with pytest.raises(RuntimeError):
+        registry.start(_settings(CamType.CAML1))
+
+    mocker.patch('src.registry.StreamManager', return_value=MagicMock())
+    registry.start(_settings(CamType.CAML1))
+    assert registry.get(CamType.CAML1) is not None
+
+
+def test_discard_only_removes_the_same_stream(registry, mock_manager_class):
+    registry.start(_settings(CamType.CAML1))
+    assert not registry.discard(MagicMock())
+    assert registry.discard(registry.get(CamType.CAML1))
+    assert registry.get(CamType.CAML1) is None
+
+
+def test_stop_all(registry, mock_manager_class):
+    registry.start(_settings(CamType.CAML1))
+    registry.start(_settings(CamType.CAML2))
+    managers = [registry.get(CamType.CAML1), registry.get(CamType.CAML2)]
+    managers[0].stop_stream.side_effect = RuntimeError("No running processes to stop.")
+
+    registry.stop_all()
+
+    for manager in managers:
+        manager.stop_stream.assert_called_once()
+    assert registry.status() == {}
@@ -1,8 +1,10 @@
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import MagicMock
-from src.streaming_api import app, get_manager_storage
+from src.streaming_api import app, get_manager_storage, get_stream_registry
 from src.models import StreamSettings, CamType
+from src.pipeline import SourceConflict
+from src.registry import StreamRegistry
 from src.streaming_api import StreamManager
 
 client = TestClient(app)
@@ -20,6 +22,8 @@ def override_manager_storage():
 
     # Override the real dependency with a test one
     app.dependency_overrides[get_manager_storage] = get_test_manager_storage
+    test_registry = StreamRegistry(supervisor=MagicMock())
+    app.dependency_overrides[get_stream_registry] = lambda: test_registry
     yield
     app.dependency_overrides.clear()
 
@@ -94,4 +98,189 @@ def test_stop_stream_when_not_running():
     response = client.patch("/stop")
 
     assert response.status_code == 400
-    assert response.json() == {"detail": "No active stream to stop."}
\ No newline at end of file
+    assert response.json() == {"detail": "No active stream to stop."}
+
+def test_stream_status():
+    mock_manager = MagicMock()
+    mock_manager.status.return_value = {"cam": "caml1", "stages": [{"name": "ustreamer", "restarts": 2}]}
+    app.dependency_overrides[get_manager_storage]()["manager"] = mock_manager
+
+    response = client.get("/status")
+
+    assert response.status_code == 200
+    assert response.json()["stages"][0]["restarts"] == 2
+
+
+def test_stream_status_when_not_running():
+    response = client.get("/status")
+    assert response.status_code == 404
+
+
+@pytest.fixture
+def registry():
+    return app.dependency_overrides[get_stream_registry]()
+
+
+@pytest.fixture
+def mock_managers(mocker):
+    """Every StreamManager created by the registry is a new mock, by cam."""
+    managers = {}
+
+    def new_manager(settings, **kwargs):
+        manager = MagicMock()
+        manager.settings = settings
+        manager.start_stream.return_value = f"https://host/stream/{settings.cam}/stream"
+        manager.stop_stream.return_value = f"Stopped stream for {settings.cam}"
+        manager.status.return_value = {"cam": settings.cam, "stages": []}
+        managers[settings.cam] = manager
+        return manager
+
+    mocker.patch('src.registry.StreamManager', side_effect=new_manager)
+    return managers
+
+
+def _cam_settings(settings, cam):
+    return {**settings, "cam": cam}
+
+
+def test_streams_run_concurrently(mock_managers, settings):
+    for cam in CamType:
+        response = client.post(f"/streams/{cam}/start", json=_cam_settings(settings, cam))
+        assert response.status_code == 200
+        assert response.json() == f"https://host/stream/{cam}/stream"
+
+    response = client.get("/streams")
+    assert response.status_code == 200
+    assert set(response.json()) == {cam.value for cam in CamType}
+    for manager in mock_managers.values():
+        manager.stop_stream.assert_not_called()
+
+
+def test_stream_started_twice(mock_managers, settings):
+    client.post("/streams/caml1/start", json=settings)
+
+    response = client.post("/streams/caml1/start", json=settings)
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "A stream is already running."}
+    mock_managers[CamType.CAML1].start_stream.assert_called_once()
+
+
+def test_stream_settings_for_other_cam(mock_managers, settings):
+    response = client.post("/streams/camr1/start", json=settings)
+    assert response.status_code == 400
+    assert mock_managers == {}
+
+
+def test_stream_start_failure_not_registered(mocker, registry, settings):
+    mock_manager = MagicMock()
+    mock_manager.start_stream.side_effect = RuntimeError("Failed to start stream for caml1")
+    mocker.patch('src.registry.StreamManager', return_value=mock_manager)
+
+    response = client.post("/streams/caml1/start", json=settings)
+
+    assert response.status_code == 500
+    assert response.json() == {"detail": "Failed to start stream for caml1"}
+    assert registry.get(CamType.CAML1) is None
+
+
+def test_stream_with_conflicting_source_settings(mocker, registry, settings):
+    mock_manager = MagicMock()
+    mock_manager.start_stream.side_effect = SourceConflict("/dev/video10", {"fps": (30, 15)})
+    mocker.patch('src.registry.StreamManager', return_value=mock_manager)
+
+    response = client.post("/streams/caml1/start", json=settings)
+
+    assert response.status_code == 409
+    assert response.json() == {"detail": "/dev/video10 is already streaming with other settings: fps 30 (requested 15)"}
+    assert registry.get(CamType.CAML1) is None
+
+
+def test_lossless_stream_without_turbojpeg(mocker, mock_managers, settings):
+    mocker.patch("src.pipeline.mjpeg_crop.available", return_value=False)
+
+    response = client.post("/streams/caml1/start", json={**settings, "split_mode": "lossless"})
+
+    assert response.status_code == 400
+    assert "PyTurboJPEG" in response.json()["detail"]
+    assert mock_managers == {}
+
+
+def test_stop_one_stream(mock_managers, registry, settings):
+    client.post("/streams/caml1/start", json=settings)
+    client.post("/streams/camr1/start", json=_cam_settings(settings, "camr1"))
+
+    response = client.put("/streams/caml1/stop")
+
+    assert response.status_code == 200
+    assert response.json() == "Stopped stream for caml1"
+    mock_managers[CamType.CAML1].stop_stream.assert_called_once()
+    mock_managers[CamType.CAMR1].stop_stream.assert_not_called()
+    assert registry.get(CamType.CAML1) is None
+    assert client.get("/streams/camr1").status_code == 200
+
+
+def test_stop_stream_not_running():
+    response = client.put("/streams/caml1/stop")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "No active stream for caml1."}
+
+
+def test_cam_stream_status(mock_managers, settings):
+    client.post("/streams/caml1/start", json=settings)
+
+    response = client.get("/streams/caml1")
+
+    assert response.status_code == 200
+    assert response.json() == {"cam": "caml1", "stages": []}
+    assert client.get("/streams/caml2").status_code == 404
+
+
+def test_legacy_start_keeps_other_streams(mock_managers, settings):
+    client.post("/streams/camr1/start", json=_cam_settings(settings, "camr1"))
+    client.post("/start", json=settings)
+
+    response = client.post("/start", json=_cam_settings(settings, "caml2"))
+
+    assert response.status_code == 200
+    mock_managers[CamType.CAML1].stop_stream.assert_called_once()
+    mock_managers[CamType.CAMR1].stop_stream.assert_not_called()
+    assert set(client.get("/streams").json()) == {"camr1", "caml2"}
+
+
+def test_reconfigure_stream(mock_managers, settings):
+    client.post("/streams/caml1/start", json=settings)
+    mock_managers[CamType.CAML1].reconfigure.return_value = ["ustreamer"]
+
+    response = client.put("/streams/caml1", json={**settings, "fps": 15})
+
+    assert response.status_code == 200
+    assert response.json() == {"caml1": ["ustreamer"]}
+    mock_managers[CamType.CAML1].reconfigure.assert_called_once_with(StreamSettings(**{**settings, "fps": 15}))
+    mock_managers[CamType.CAML1].stop_stream.assert_not_called()
+
+
+def test_reconfigure_stream_not_running(settings):
+    response = client.put("/streams/caml1", json=settings)
+    assert response.status_code == 404
+
+
+def test_stream_logs(mock_managers, settings):
+    client.post("/streams/caml1/start", json=settings)
+    mock_managers[CamType.CAML1].logs.return_value = {"ustreamer": ["-- INFO  [1.0 main] Listening HTTP"]}
+
+    response = client.get("/streams/caml1/logs?lines=5")
+
+    assert response.status_code == 200
+    assert response.json() == {"ustreamer": ["-- INFO  [1.0 main] Listening HTTP"]}
+    mock_managers[CamType.CAML1].logs.assert_called_once_with(5)
+
+
+def test_metrics(mocker):
+    mocker.patch('src.streaming_api.render_metrics', return_value='streaming_stage_up{stage="ustreamer"} 1\n')
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.text == 'streaming_stage_up{stage="ustreamer"} 1\n'
@@ -0,0 +1,115 @@
+import sys
+import time
+import subprocess
+import pytest
+from unittest.mock import MagicMock
+from src.supervisor import Stage, StageState, Supervisor
+
+
+def _spawn(stage):
+    stage.process = subprocess.Popen(stage.command)
+
+
+def _wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def supervisor():
+    supervisor = Supervisor(min_backoff=0.05, max_backoff=0.2, stable_after=1.0, poll_interval=0.05)
+    supervisor.start()
+    yield supervisor
+    supervisor.stop()
+
+
+@pytest.fixture
+def stages():
+    started = []
+    yield started
+    for stage in started:
+        if stage.process.poll() is None:
+            stage.process.kill()
+            stage.process.wait()
+
+
+def _start(stages, command):
+    stage = Stage("test", command)
+    _spawn(stage)
+    stages.append(stage)
+    return stage
+
+
+def test_restarts_stage_that_exited(supervisor, stages):
+    stage = _start(stages, [sys.executable, "-c", "import sys; sys.exit(3)"])
+    restarts = []
+
+    def restart(stage):
+        restarts.append(stage.process.pid)
+        stage.command = [sys.executable, "-c", "import time; time.sleep(10)"]
+        _spawn(stage)
+
+    supervisor.watch(stage, restart)
+    assert _wait_for(lambda: stage.restarts == 1)
+    assert stage.state is StageState.RUNNING
+    assert stage.last_exit_code == 3
+    assert stage.process.poll() is None
+    assert len(restarts) == 1
+
+
+def test_backoff_grows_while_failing(supervisor, stages):
+    stage = _start(stages, [sys.executable, "-c", "pass"])
+    restart_times = []
+
+    def restart(stage):
+        restart_times.append(time.monotonic())
+        _spawn(stage)
+
+    supervisor.watch(stage, restart)
+    assert _wait_for(lambda: len(restart_times) >= 4)
+    supervisor.unwatch(stage)
+    gaps = [b - a for a, b in zip(restart_times, restart_times[1:])]
+    assert gaps[-1] > gaps[0]
+
+
+def test_unwatched_stage_not_restarted(supervisor, stages):
+    stage = _start(stages, [sys.executable, "-c", "import time; time.sleep(0.2)"])
+    restart = MagicMock()
+    supervisor.watch(stage, restart)
+    supervisor.unwatch(stage)
+    stage.process.wait()
+    time.sleep(0.2)
+    restart.assert_not_called()
+
+
+def test_failed_restart_retried(supervisor, stages):
+    stage = _start(stages, [sys.executable, "-c", "pass"])
+    attempts = []
+
+    def restart(stage):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("device busy")
+        stage.command = [sys.executable, "-c", "import time; time.sleep(10)"]
+        _spawn(stage)
+
+    supervisor.watch(stage, restart)
+    assert _wait_for(lambda: stage.restarts == 1)
+    assert len(attempts) == 2
+
+
+def test_polling_without_pidfd(supervisor):
+    process = MagicMock(pid="not a pid")
+    process.poll.return_value = None
+    stage = Stage("test", ["stub"])
+    stage.process = process
+    restarted = []
+    supervisor.watch(stage, lambda stage: restarted.append(stage))
+
+    process.poll.return_value = 1
+    assert _wait_for(lambda: restarted)
+    assert stage.status()["last_exit_code"] == 1